@@ -1,73 +1,161 @@
-from flask import Flask, render_template, session, redirect, request, flash
+from flask import Flask, render_template, session, redirect, request, flash, g
 from models import db, User, Friendship, Log, MemberApplication, News, Collection, Movie, MovieEvent, Photo
-from views_user import user_bp
-from views_admin import admin_bp
-from views_public import public_bp
-from views_movie import movie_bp
-import os
-
-# 创建Flask应用实例
-app = Flask(__name__, instance_path=None)
-
-# --- 应用配置 ---
-# 数据库文件路径 - 明确指定使用主目录的数据库文件
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(os.path.dirname(__file__), 'association.db')
-# 禁止追踪对象修改，提高性能
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# 用于session加密的密钥
-app.config['SECRET_KEY'] = 'your_secret_key'
-# 文件上传目录
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
-
-
-# --- 数据库初始化 ---
-# 在应用上下文中初始化数据库并创建所有表
-with app.app_context():
-    db.init_app(app)
-    db.create_all()
-
-# --- 蓝图注册 ---
-# 将用户、管理员、公共、电影等视图蓝图注册到应用中，实现模块化
-app.register_blueprint(user_bp, url_prefix='/user')
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(public_bp, url_prefix='/public')
-app.register_blueprint(movie_bp, url_prefix='/movie')
+from config import get_config
+from serialization import init_serialization
+from db_config import configure_database, init_database
+from migrations import init_migrations
+from search import init_search
+from cache import init_cache
+from site_stats import init_stats
+from media import init_media
+from tasks import init_tasks
+# 审核通过后创建账号的任务：与蓝图无关，所有进程都要注册
+import members  # noqa: F401
+from ratings import init_ratings
+from recommend import init_recommend
+from social import init_social
+from feed import init_feed
+from monitoring import init_monitoring
+from auth import init_auth, current_user, login_required
+from catalog import init_catalog
+from favorites import init_favorites
+from rankings import init_rankings
+from sqlalchemy.orm import joinedload
+from pagination import keyset_page
+import importlib
+
+# 会员空间每页展示的照片数
+PHOTOS_PER_PAGE = 24
+
+# 视图蓝图：名称 -> (模块, 蓝图变量, URL 前缀)；视图模块在注册时才导入，可用配置 BLUEPRINTS 只注册一部分
+BLUEPRINTS = {
+    'user': ('views_user', 'user_bp', '/user'),
+    'admin': ('views_admin', 'admin_bp', '/admin'),
+    'public': ('views_public', 'public_bp', '/public'),
+    'movie': ('views_movie', 'movie_bp', '/movie'),
+    'media': ('media', 'media_bp', '/media'),
+    'tasks': ('tasks', 'tasks_bp', '/tasks'),
+}
+
+
+def create_app(config=None):
+    """创建并初始化应用实例
+
+    config 为配置名、配置类或覆盖项字典（见 config.py），默认按环境变量 APP_CONFIG 选择。
+    每次调用返回独立的应用，可用不同数据库（如测试用 ``create_app('testing')`` 的内存库）。
+    """
+    # 创建Flask应用实例
+    app = Flask(__name__, instance_path=None)
+
+    # --- 应用配置 ---
+    if isinstance(config, dict):
+        app.config.from_object(get_config())
+        app.config.update(config)
+    else:
+        app.config.from_object(config if isinstance(config, type) else get_config(config))
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError('未设置 SECRET_KEY')
+    # 数据库地址与连接池 - 默认使用主目录的数据库文件，可通过环境变量切换（见 db_config.py）
+    configure_database(app)
+    # 接口 JSON 编码（装有 orjson 时使用）与 ISO-8601 时间格式
+    init_serialization(app)
+
+    # --- 数据库初始化 ---
+    with app.app_context():
+        db.init_app(app)
+        # SQLite 连接 PRAGMA（WAL 等）
+        init_database(db)
+        # 请求耗时、SQL 统计、慢查询日志与 /metrics
+        init_monitoring(app)
+        # 建表、执行未完成的版本迁移与派生数据回填（AUTO_MIGRATE 关闭时跳过，由 db-upgrade 命令执行）
+        init_migrations(app)
+        # 服务端会话与当前用户
+        init_auth(app)
+        # 电影全文索引（FTS5）
+        init_search(app)
+        # 电影评分聚合
+        init_ratings(app)
+        # 电影推荐（相似电影邻居表）
+        init_recommend(app)
+        # 好友关系图与好友推荐
+        init_social(app)
+        # 好友动态（写扩散时间线）
+        init_feed(app)
+        # 电影目录批量导入/导出命令
+        init_catalog(app)
+        # 收藏计数重算命令
+        init_favorites(app)
+        # 排行榜定时刷新与命令
+        init_rankings(app)
+        # 页面与查询缓存
+        init_cache(app)
+        # 站点统计计数器
+        init_stats(app)
+        # 照片上传（超限提示）
+        init_media(app)
+        # 后台任务工作线程
+        init_tasks(app)
+
+    # --- 蓝图注册 ---
+    # 将用户、管理员、公共、电影等视图蓝图注册到应用中，实现模块化
+    register_blueprints(app, app.config.get('BLUEPRINTS'))
+
+    # --- 核心路由 ---
+    for rule, view, methods in CORE_ROUTES:
+        app.add_url_rule(rule, view_func=view, methods=methods)
+    return app
+
+
+def register_blueprints(app, names=None):
+    """导入并注册视图蓝图，names 为 None 时注册全部"""
+    for name in names or BLUEPRINTS:
+        if name not in BLUEPRINTS:
+            raise ValueError(f'未知蓝图: {name}（可选 {", ".join(BLUEPRINTS)}）')
+        module, attr, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(getattr(importlib.import_module(module), attr), url_prefix=url_prefix)
+
+
+def __getattr__(name):
+    # 兼容 ``from app import app`` 与 ``flask --app app``：首次访问时按环境变量创建默认应用
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 # --- 核心路由 ---
-@app.route('/')
 def index():
     """首页"""
     return render_template('index.html', session=session)
 
-@app.route('/login')
 def login_page():
     return render_template('login.html')
 
-@app.route('/register')
 def register_page():
     return render_template('register.html')
 
-@app.route('/dashboard')
+@login_required(redirect_to='/login')
 def dashboard():
     """会员空间"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return redirect('/login')
-    user = User.query.get(user_id)
-    friends = [User.query.get(f.friend_id) for f in Friendship.query.filter_by(user_id=user_id).all()]
-    logs = Log.query.filter_by(user_id=user_id).order_by(Log.created_at.desc()).all()
-    photos = Photo.query.filter_by(user_id=user_id).order_by(Photo.uploaded_at.desc()).all()
-    return render_template('dashboard.html', user=user, friends=friends, logs=logs, photos=photos)
-
-@app.route('/friend_space/<int:friend_id>')
+    user_id = g.user_id
+    user = current_user()
+    friendships = Friendship.query.options(joinedload(Friendship.friend)).filter_by(user_id=user_id).all()
+    friends = [f.friend for f in friendships if f.friend]
+    logs, next_log_cursor = keyset_page(Log.query.filter_by(user_id=user_id), Log.created_at, Log.id,
+                                        request.args.get('log_cursor'))
+    photos, next_photo_cursor = keyset_page(Photo.query.filter_by(user_id=user_id), Photo.uploaded_at, Photo.id,
+                                            request.args.get('photo_cursor'), limit=PHOTOS_PER_PAGE)
+    return render_template('dashboard.html', user=user, friends=friends, logs=logs, photos=photos,
+                           next_log_cursor=next_log_cursor, next_photo_cursor=next_photo_cursor)
+
 def friend_space(friend_id):
     """好友空间"""
     friend = User.query.get(friend_id)
-    logs = Log.query.filter_by(user_id=friend_id, visible=True).order_by(Log.created_at.desc()).all()
-    return render_template('friend_space.html', friend=friend, logs=logs)
+    logs, next_cursor = keyset_page(Log.query.filter_by(user_id=friend_id, visible=True), Log.created_at, Log.id,
+                                    request.args.get('cursor'))
+    return render_template('friend_space.html', friend=friend, logs=logs, next_cursor=next_cursor)
 
-@app.route('/apply', methods=['GET', 'POST'])
 def apply():
     """会员申请"""
     msg = ''
@@ -92,13 +180,11 @@ def apply():
             msg = '申请已提交，等待审核'
     return render_template('apply.html', msg=msg)
 
-@app.route('/admin/apply_admin', methods=['GET'])
 def apply_admin():
     """管理员审核页面"""
     apps = MemberApplication.query.order_by(MemberApplication.created_at.desc()).all()
     return render_template('apply_admin.html', apps=apps)
 
-@app.route('/admin/apply_approve', methods=['POST'])
 def apply_approve():
     """处理会员申请（通过/拒绝）"""
     app_id = request.form.get('id')
@@ -112,7 +198,18 @@ def apply_approve():
         db.session.commit()
     return redirect('/admin/apply_admin')
 
+# (路径, 视图, 方法)
+CORE_ROUTES = [
+    ('/', index, None),
+    ('/login', login_page, None),
+    ('/register', register_page, None),
+    ('/dashboard', dashboard, None),
+    ('/friend_space/<int:friend_id>', friend_space, None),
+    ('/apply', apply, ['GET', 'POST']),
+    ('/admin/apply_admin', apply_admin, ['GET']),
+    ('/admin/apply_approve', apply_approve, ['POST']),
+]
+
 # --- 应用启动 ---
 if __name__ == '__main__':
-    with app.app_context():
-        app.run(debug=True) 
\ No newline at end of file
+    create_app().run(debug=True)
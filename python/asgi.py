@@ -0,0 +1,222 @@
+"""ASGI 入口（生产部署）
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+读多写少的 JSON 接口在事件循环中直接处理，返回与 Flask 视图相同的数据：
+    GET /public/news    GET /movie/movies    GET /movie/search
+查询经 ``AsyncDB`` 执行：装有异步驱动（sqlite → aiosqlite，postgresql → asyncpg）时用 SQLAlchemy 异步引擎，
+否则在专用线程池中用同步引擎执行，等待数据库期间事件循环继续处理其它连接。
+这些请求不经过 Flask 的请求钩子（会话、监控指标、页面缓存），只读公开数据。
+
+其余请求（页面、登录、写操作等）经 WSGI 适配器（a2wsgi 或 asgiref）交给 Flask 应用在线程池中执行。
+
+关闭（SIGTERM / Ctrl+C）时服务器先停止接收新连接、等待进行中的请求结束，
+随后 lifespan shutdown 停止后台任务线程（等当前任务执行完）并释放数据库连接。
+
+环境变量（均可选）:
+    ASGI_DB_THREADS     没有异步驱动时执行查询的线程数（默认 8）
+    ASGI_WSGI_THREADS   转交 Flask 的线程数（默认 16，仅 a2wsgi）
+    SHUTDOWN_TIMEOUT    关闭时等待后台任务的秒数（默认 30）
+"""
+import asyncio
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import create_app
+from db_config import install_sqlite_pragmas
+from models import db, Movie, News
+from serialization import NEWS
+from search import search_statement
+from views_movie import MOVIE_SUMMARY_FIELDS
+import background
+import tasks
+
+flask_app = create_app()
+
+# 同步驱动名 -> (异步驱动名, 需要的模块)
+ASYNC_DRIVERS = {'sqlite': ('sqlite+aiosqlite', 'aiosqlite'), 'postgresql': ('postgresql+asyncpg', 'asyncpg')}
+
+
+class AsyncDB:
+    """在事件循环中执行只读查询，返回行列表"""
+
+    def __init__(self, url, sync_engine, threads=8):
+        self.async_engine = None
+        self.sync_engine = sync_engine
+        self.executor = None
+        url = make_url(url)
+        driver = ASYNC_DRIVERS.get(url.get_backend_name())
+        if driver and importlib.util.find_spec(driver[1]):
+            try:
+                # SQLAlchemy 异步扩展还依赖 greenlet
+                from sqlalchemy.ext.asyncio import create_async_engine
+            except ImportError:
+                create_async_engine = None
+            if create_async_engine:
+                self.async_engine = create_async_engine(url.set(drivername=driver[0]))
+                install_sqlite_pragmas(self.async_engine.sync_engine)
+        if self.async_engine is None:
+            self.executor = ThreadPoolExecutor(threads, thread_name_prefix='asgi-db')
+
+    @property
+    def mode(self):
+        return 'async' if self.async_engine else 'threadpool'
+
+    def _run_sync(self, stmt):
+        with self.sync_engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    async def all(self, stmt):
+        if self.async_engine:
+            async with self.async_engine.connect() as conn:
+                return (await conn.execute(stmt)).all()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._run_sync, stmt)
+
+    async def paginate(self, stmt, page, per_page):
+        """与 Flask-SQLAlchemy 分页一致：返回 (当前页行, 总数)"""
+        count = select(func.count()).select_from(stmt.order_by(None).subquery())
+        rows, total = await asyncio.gather(self.all(stmt.limit(per_page).offset((page - 1) * per_page)),
+                                           self.all(count))
+        return rows, total[0][0]
+
+    async def dispose(self):
+        if self.async_engine:
+            await self.async_engine.dispose()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+
+def _wsgi_adapter(wsgi_app):
+    threads = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+    try:
+        from a2wsgi import WSGIMiddleware
+        return WSGIMiddleware(wsgi_app, workers=threads)
+    except ImportError:
+        pass
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+        return WsgiToAsgi(wsgi_app)
+    except ImportError:
+        raise RuntimeError('ASGI 模式需要安装 a2wsgi 或 asgiref') from None
+
+
+# --- 异步接口 ---
+def _int_arg(args, name, default):
+    """同 request.args.get(name, default, type=int)：缺失或不是整数时取默认值"""
+    try:
+        return int(args[name][0])
+    except (KeyError, ValueError):
+        return default
+
+
+def _summaries(rows):
+    return [dict(zip(MOVIE_SUMMARY_FIELDS, row)) for row in rows]
+
+
+async def news_json(args):
+    page, per_page = _int_arg(args, 'page', 1), _int_arg(args, 'per_page', 10)
+    stmt = NEWS.select().order_by(News.created_at.desc())
+    rows, total = await state.db.paginate(stmt, page, per_page)
+    return {'news': NEWS.dump_all(rows),
+            'total': total, 'page': page, 'per_page': per_page}
+
+
+async def movies_json(args):
+    page = _int_arg(args, 'page', 1)
+    per_page = min(_int_arg(args, 'per_page', 12), 100)
+    stmt = select(*[getattr(Movie, f) for f in MOVIE_SUMMARY_FIELDS]).order_by(Movie.id)
+    rows, total = await state.db.paginate(stmt, page, per_page)
+    return {'movies': _summaries(rows), 'total': total, 'page': page, 'per_page': per_page}
+
+
+async def search_json(args):
+    q = args.get('q', [''])[0]
+    genre = args.get('genre', [''])[0]
+    year = args.get('year', [''])[0]
+    year = int(year) if year.isdigit() else None
+    page = _int_arg(args, 'page', 1)
+    per_page = min(_int_arg(args, 'per_page', 20), 100)
+    stmt = search_statement(q, genre, year, columns=[getattr(Movie, f) for f in MOVIE_SUMMARY_FIELDS])
+    rows, total = await state.db.paginate(stmt, page, per_page)
+    return {'movies': _summaries(rows), 'total': total, 'page': page, 'per_page': per_page}
+
+
+ASYNC_ROUTES = {
+    '/public/news': news_json,
+    '/movie/movies': movies_json,
+    '/movie/search': search_json,
+}
+
+
+class _State:
+    db = None
+    wsgi = None
+
+
+state = _State()
+
+
+def _wants_json(scope):
+    """与 Flask 视图的判断一致：Accept 不接受 HTML 时返回 JSON"""
+    accept = next((v.decode('latin-1') for k, v in scope['headers'] if k == b'accept'), None)
+    return not parse_accept_header(accept, MIMEAccept).accept_html
+
+
+async def _send_json(send, data, status=200):
+    body = (flask_app.json.dumps(data) + '\n').encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _startup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await _shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def _startup():
+    if state.db is None:
+        with flask_app.app_context():
+            state.db = AsyncDB(flask_app.config['SQLALCHEMY_DATABASE_URI'], db.engine,
+                               int(os.environ.get('ASGI_DB_THREADS', 8)))
+        flask_app.logger.info('ASGI 只读接口数据库模式: %s', state.db.mode)
+
+
+async def _shutdown():
+    timeout = float(os.environ.get('SHUTDOWN_TIMEOUT', 30))
+    if not await asyncio.to_thread(tasks.stop_workers, timeout):
+        flask_app.logger.warning('关闭时仍有后台任务未执行完，租约过期后由工作线程重新领取执行')
+    await asyncio.to_thread(background.stop, flask_app, timeout)
+    if state.db is not None:
+        await state.db.dispose()
+        state.db = None
+    with flask_app.app_context():
+        db.engine.dispose()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] in ASYNC_ROUTES \
+            and _wants_json(scope):
+        # 服务器未发送 lifespan 事件时按需初始化
+        _startup()
+        args = parse_qs(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        return await _send_json(send, await ASYNC_ROUTES[scope['path']](args))
+    if state.wsgi is None:
+        state.wsgi = _wsgi_adapter(flask_app)
+    await state.wsgi(scope, receive, send)
@@ -0,0 +1,289 @@
+"""登录会话与当前用户
+
+会话内容保存在服务端，浏览器 cookie 只保存随机会话 id。存储后端可插拔（``SESSION_BACKEND``）：
+    SqlSessionStore     ``server_session`` 表（默认，多进程共享、重启不丢），读取经 cache 后端缓存
+    MemorySessionStore  进程内字典（单进程部署或测试）
+两者都是 Redis 风格的接口（get / set(ex=) / delete），换成 Redis 只需实现同样的方法。
+
+登录时把 user_id 和 role 写入会话，``before_request`` 把它们放到 ``g.user_id`` / ``g.role``，
+``login_required`` / ``role_required`` 据此判断，只做权限判断的视图不再查询 user 表；
+需要用户对象时调用 ``current_user()``，每个请求最多查询一次。
+角色变更后调用 ``revoke_sessions(user_id)`` 使该用户重新登录。
+
+配置项（app.config / 环境变量）:
+    SESSION_BACKEND         sql / memory（默认 sql）
+    SESSION_LIFETIME        会话有效秒数（默认 7 天），剩余不足一半时随请求自动续期
+    SESSION_CACHE_SECONDS   sql 后端读取缓存秒数（默认 60，其它进程注销的会话最多延迟这么久失效）
+    SESSION_SWEEP_INTERVAL  后台清理过期会话的间隔秒数（默认 3600，0 表示不启动清理线程；flask 命令中不启动）
+"""
+import functools
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import flash, g, jsonify, redirect, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, select
+from werkzeug.datastructures import CallbackDict
+
+from models import db, ServerSession, User
+from bulk import upsert
+import cache
+import background
+
+LIFETIME = 7 * 24 * 3600
+CACHE_SECONDS = 60
+SWEEP_INTERVAL = 3600
+
+_serializer = TaggedJSONSerializer()
+
+
+class MemorySessionStore:
+    """进程内会话存储：sid -> (序列化内容, 过期时间戳, user_id)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+        if item is None or item[1] < time.time():
+            return None
+        return _serializer.loads(item[0])
+
+    def set(self, sid, data, ex):
+        with self._lock:
+            self._data[sid] = (_serializer.dumps(data), time.time() + ex, data.get('user_id'))
+
+    def delete(self, *sids):
+        with self._lock:
+            for sid in sids:
+                self._data.pop(sid, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            sids = [sid for sid, item in self._data.items() if item[2] == user_id]
+        self.delete(*sids)
+        return len(sids)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, item in self._data.items() if item[1] < now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SqlSessionStore:
+    """数据库会话存储；使用独立连接读写，不影响视图中 db.session 的事务"""
+
+    def __init__(self, cache_seconds=CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self.table = ServerSession.__table__
+
+    @staticmethod
+    def _cache_key(sid):
+        return 'session:' + sid
+
+    def get(self, sid):
+        cached = cache.backend.get(self._cache_key(sid)) if self.cache_seconds else None
+        if cached is None:
+            with db.engine.connect() as conn:
+                row = conn.execute(select(self.table.c.data, self.table.c.expires_at)
+                                   .where(self.table.c.id == sid)).first()
+            if row is None:
+                return None
+            cached = (row.data, row.expires_at)
+            if self.cache_seconds:
+                cache.backend.set(self._cache_key(sid), cached, self.cache_seconds)
+        if cached[1] < datetime.utcnow():
+            return None
+        return _serializer.loads(cached[0])
+
+    def set(self, sid, data, ex):
+        raw = _serializer.dumps(data)
+        expires_at = datetime.utcnow() + timedelta(seconds=ex)
+        values = {'data': raw, 'expires_at': expires_at, 'user_id': data.get('user_id')}
+        with db.engine.begin() as conn:
+            upsert(ServerSession, ('id',), [dict(values, id=sid)], conn)
+        if self.cache_seconds:
+            cache.backend.set(self._cache_key(sid), (raw, expires_at), self.cache_seconds)
+
+    def delete(self, *sids):
+        if not sids:
+            return
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id.in_(sids)))
+        for sid in sids:
+            cache.backend.delete(self._cache_key(sid))
+
+    def delete_user(self, user_id):
+        with db.engine.connect() as conn:
+            sids = list(conn.execute(select(self.table.c.id).where(self.table.c.user_id == user_id)).scalars())
+        self.delete(*sids)
+        return len(sids)
+
+    def sweep(self):
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at < datetime.utcnow())).rowcount
+
+
+store = SqlSessionStore()
+
+
+# --- Flask 会话接口 ---
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.stale_sid = None
+
+    def regenerate(self):
+        """登录时更换会话 id，防止会话固定攻击"""
+        if not self.new:
+            self.stale_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = store.get(sid) if sid else None
+        if data is None:
+            return ServerSideSession(sid=_new_sid(), new=True)
+        return ServerSideSession(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.stale_sid:
+            store.delete(session.stale_sid)
+        if not session:
+            if not session.new:
+                store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        # 剩余有效期不足一半时续期，避免每个请求都写存储
+        renew = session.get('_renewed', 0) + LIFETIME / 2 < time.time()
+        if not (session.modified or session.new or renew):
+            return
+        if renew:
+            session['_renewed'] = int(time.time())
+        store.set(session.sid, dict(session), LIFETIME)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+# --- 登录状态 ---
+def login_user(user):
+    session.regenerate()
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['role'] = user.role
+    g.user_id, g.role, g.user = user.id, user.role, user
+
+
+def logout_user():
+    session.clear()
+    session.regenerate()
+    g.user_id, g.role, g.user = None, None, None
+
+
+def revoke_sessions(user_id):
+    """注销某用户的全部会话（角色变更、删除账号后调用），返回注销数"""
+    return store.delete_user(user_id)
+
+
+def current_user():
+    """当前登录用户对象，未登录返回 None；同一请求内只查询一次"""
+    if 'user' not in g:
+        g.user = db.session.get(User, g.user_id) if g.get('user_id') else None
+    return g.user
+
+
+def _load_session_user():
+    g.user_id = session.get('user_id')
+    g.role = session.get('role')
+
+
+def _deny(status, message, redirect_to, redirect_message=None):
+    if redirect_to:
+        flash(redirect_message or message)
+        return redirect(redirect_to)
+    return jsonify({'msg': message}), status
+
+
+def login_required(fn=None, *, redirect_to=None):
+    """未登录时返回 401（或提示后跳转到 redirect_to）"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not g.get('user_id'):
+                return _deny(401, '未登录', redirect_to, '请先登录')
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator(fn) if fn else decorator
+
+
+def role_required(*roles, redirect_to=None):
+    """会话中的角色不在 roles 内时返回 403（或提示后跳转到 redirect_to）"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not g.get('user_id') or g.get('role') not in roles:
+                return _deny(403, '无权限', redirect_to)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- 过期清理 ---
+def _sweep_loop(app, interval, stop_event):
+    while not stop_event.wait(interval):
+        with app.app_context():
+            try:
+                removed = store.sweep()
+                if removed:
+                    app.logger.info('已清理 %d 个过期会话', removed)
+            except Exception:
+                app.logger.exception('清理过期会话失败')
+
+
+def init_auth(app):
+    """安装服务端会话、加载当前用户的钩子与过期会话清理线程"""
+    global store, LIFETIME
+    LIFETIME = int(app.config.get('SESSION_LIFETIME', os.environ.get('SESSION_LIFETIME', LIFETIME)))
+    if app.config.get('SESSION_BACKEND', os.environ.get('SESSION_BACKEND', 'sql')) == 'memory':
+        store = MemorySessionStore()
+    else:
+        store = SqlSessionStore(int(app.config.get('SESSION_CACHE_SECONDS',
+                                                   os.environ.get('SESSION_CACHE_SECONDS', CACHE_SECONDS))))
+    app.session_interface = ServerSideSessionInterface()
+    app.before_request(_load_session_user)
+
+    interval = float(app.config.get('SESSION_SWEEP_INTERVAL',
+                                    os.environ.get('SESSION_SWEEP_INTERVAL', SWEEP_INTERVAL)))
+    if interval > 0 and background.enabled(app):
+        background.start(app, 'session-sweeper', _sweep_loop, interval)
+
+    @app.cli.command('sweep-sessions')
+    def sweep_sessions_command():
+        """删除过期的会话"""
+        print(f'已清理 {store.sweep()} 个过期会话')
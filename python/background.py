@@ -0,0 +1,44 @@
+"""后台线程开关
+
+任务工作线程、会话清理与排行榜刷新线程在 ``create_app`` 时启动。
+``flask`` 命令（``flask run`` 除外）创建的应用不启动这些线程：
+``db-upgrade`` 等命令可能在建表之前运行，命令结束后也不应留下轮询数据库的线程。
+配置或环境变量 ``BACKGROUND_THREADS`` 可显式开启或关闭。
+
+定时线程用 ``start`` 启动并记录在 ``app.extensions['background']`` 中，
+关闭服务时 ``stop(app)`` 与 ``tasks.stop_workers`` 一起调用。
+"""
+import os
+import threading
+import time
+
+import click
+
+
+def enabled(app):
+    """当前进程创建的 app 是否启动后台线程"""
+    value = app.config.get('BACKGROUND_THREADS', os.environ.get('BACKGROUND_THREADS'))
+    if value not in (None, ''):
+        return value is True or str(value).lower() in ('1', 'true', 'yes')
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.info_name == 'run'
+
+
+def start(app, name, target, *args):
+    """启动守护线程 ``target(app, *args, stop_event)``，返回 stop_event"""
+    stop_event = threading.Event()
+    thread = threading.Thread(target=target, args=(app, *args, stop_event), name=name, daemon=True)
+    thread.start()
+    app.extensions.setdefault('background', []).append((stop_event, thread))
+    return stop_event
+
+
+def stop(app, timeout=30):
+    """通知 app 的定时线程退出并等待，返回是否全部按时退出"""
+    threads = app.extensions.pop('background', [])
+    deadline = time.monotonic() + timeout
+    for stop_event, _ in threads:
+        stop_event.set()
+    for _, thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    return not any(thread.is_alive() for _, thread in threads)
@@ -0,0 +1,83 @@
+"""登录会话基准测试：每个请求为鉴权执行的 SQL 语句数与延迟
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_auth.py --repeat 500
+
+分别使用 memory、sql（带缓存）、sql（SESSION_CACHE_SECONDS=0）三种会话存储，
+以管理员身份请求只做权限判断的接口，统计每个请求的语句数与 p50/p99 延迟（毫秒）。
+改造前这些接口每个请求都要先按 session 中的 user_id 查询一次 user 表。
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_auth.db')
+os.environ['TASK_WORKERS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import app
+from models import db, User
+import auth
+
+ENDPOINTS = ['/admin/cache_stats', '/tasks/metrics', '/movie/recommendations?limit=1']
+PASSWORD = 'bench'
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def measure(client, url, repeat):
+    counter = {'n': 0}
+
+    def on_execute(*args):
+        counter['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    samples = []
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert resp.status_code == 200, (url, resp.status_code)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+    return counter['n'] / repeat, statistics.median(samples), percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.session.add(User(username='bench_admin', password=generate_password_hash(PASSWORD), role='admin'))
+        db.session.commit()
+
+    stores = [('memory', auth.MemorySessionStore()), ('sql+cache', auth.SqlSessionStore()),
+              ('sql', auth.SqlSessionStore(cache_seconds=0))]
+    print(f'{"存储":<10} {"接口":<32} {"语句/请求":>10} {"p50":>8} {"p99":>8}')
+    for name, store in stores:
+        auth.store = store
+        client = app.test_client()
+        resp = client.post('/user/login', json={'username': 'bench_admin', 'password': PASSWORD})
+        assert resp.status_code == 200
+        with app.app_context():
+            for url in ENDPOINTS:
+                queries, p50, p99 = measure(client, url, args.repeat)
+                print(f'{name:<10} {url:<32} {queries:>10.2f} {p50:>8.3f} {p99:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""批量接口基准：单项接口循环调用 vs 批量接口的每秒操作数
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_bulk.py --batch 50 --rounds 10
+
+使用 Flask 测试客户端（不含网络开销），每轮对 --batch 个对象执行:
+    collect    POST /user/collect/<type>/<id> 逐个收藏  vs  POST /user/collect/batch
+    friends    POST + DELETE /user/friends 逐个加删好友  vs  POST /user/friends/batch（先加后删）
+    register   每个用户 POST /movie/api/event/<id>/registration  vs  管理员 POST .../registration/batch
+数据用 datagen 在临时目录生成。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_bulk.db')
+os.environ['TASK_WORKERS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+
+from datagen import PASSWORD, Scale, populate
+from app import create_app
+from models import db, Friendship, MovieEvent, User
+
+
+def login(app, username):
+    client = app.test_client()
+    resp = client.post('/user/login', json={'username': username, 'password': PASSWORD})
+    assert resp.status_code == 200, resp.status_code
+    return client
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def check(resp):
+    assert resp.status_code == 200, (resp.status_code, resp.get_data(as_text=True)[:200])
+    return resp
+
+
+def bench_collect(app, client, batch, rounds):
+    single = bulk = 0.0
+    for r in range(rounds):
+        ids = range(1 + 2 * r * batch, 1 + (2 * r + 1) * batch)
+        single += timed(lambda: [check(client.post(f'/user/collect/movie/{i}')) for i in ids])
+        ops = [{'item_type': 'movie', 'item_id': i + batch} for i in ids]
+        bulk += timed(lambda: check(client.post('/user/collect/batch', json={'ops': ops})))
+    return single, bulk, rounds * batch
+
+
+def bench_friends(app, client, names, rounds):
+    single = bulk = 0.0
+    for _ in range(rounds):
+        single += timed(lambda: [check(client.post('/user/friends', json={'friend_name': n})) for n in names]
+                        + [check(client.delete('/user/friends', json={'friend_name': n})) for n in names])
+        bulk += timed(lambda: [
+            check(client.post('/user/friends/batch', json={'ops': [{'op': 'add', 'friend_name': n} for n in names]})),
+            check(client.post('/user/friends/batch', json={'ops': [{'op': 'remove', 'friend_name': n} for n in names]})),
+        ])
+    return single, bulk, rounds * len(names) * 2
+
+
+def bench_register(app, admin, members, rounds):
+    single = bulk = 0.0
+    user_ids = [uid for uid, _ in members]
+    for _ in range(rounds):
+        with app.app_context():
+            events = [MovieEvent(title='bench', status='upcoming', max_participants=len(members) // 2)
+                      for _ in range(2)]
+            db.session.add_all(events)
+            db.session.commit()
+            first, second = [e.id for e in events]
+        single += timed(lambda: [check(c.post(f'/movie/api/event/{first}/registration')) for _, c in members])
+        bulk += timed(lambda: check(admin.post(f'/movie/api/event/{second}/registration/batch',
+                                               json={'user_ids': user_ids})))
+    return single, bulk, rounds * len(members)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch', type=int, default=50, help='每轮操作的对象数（不超过 bulk.MAX_OPS）')
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        populate(Scale(users=max(500, args.batch * 4), movies=max(1000, args.batch * args.rounds * 2),
+                       events=10, news=10))
+        # datagen 生成的第一个用户是管理员
+        admin_user = User.query.filter(User.role == 'admin').first()
+        me = User.query.filter(User.id != admin_user.id).order_by(User.id).first()
+        friends = {f for (f,) in db.session.query(Friendship.friend_id).filter_by(user_id=me.id)}
+        names = [u.username for u in User.query.filter(User.id.notin_(friends | {me.id, admin_user.id}))
+                 .order_by(User.id).limit(args.batch)]
+        members = [(u.id, u.username) for u in User.query.filter(User.id.notin_([me.id, admin_user.id]))
+                   .order_by(User.id.desc()).limit(args.batch)]
+        admin_name, my_name = admin_user.username, me.username
+
+    client = login(app, my_name)
+    admin = login(app, admin_name)
+    members = [(uid, login(app, name)) for uid, name in members]
+
+    print(f'{"操作":<10} {"单项 ops/s":>12} {"批量 ops/s":>12} {"倍数":>8}')
+    for name, (single, bulk, ops) in [
+        ('collect', bench_collect(app, client, args.batch, args.rounds)),
+        ('friends', bench_friends(app, client, names, args.rounds)),
+        ('register', bench_register(app, admin, members, args.rounds)),
+    ]:
+        print(f'{name:<10} {ops / single:>12.0f} {ops / bulk:>12.0f} {single / bulk:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""并发写入压测：多线程发表评论、报名活动，对比 SQLite 调优前后
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_concurrency.py --threads 16 --users 800
+
+分别在 SQLITE_TUNING=0（默认回滚日志）与 SQLITE_TUNING=1（WAL 等 PRAGMA）下
+各启动一个子进程，报告吞吐量与 "database is locked" 错误率。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_worker(args):
+    """子进程：在临时库上跑一轮压测，结果以 JSON 打印到标准输出"""
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp.name, 'bench.db')
+
+    from flask import got_request_exception
+    from app import app
+    from models import db, User, Movie, MovieEvent
+
+    with app.app_context():
+        users = [User(username=f'bench{i}', password='x') for i in range(args.users)]
+        movies = [Movie(title=f'电影{i}') for i in range(args.movies)]
+        event_obj = MovieEvent(title='压测放映会', max_participants=args.users, current_participants=0)
+        db.session.add_all(users + movies + [event_obj])
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        movie_ids = [m.id for m in movies]
+        event_id = event_obj.id
+
+    errors = {'locked': 0, 'other': 0}
+    lock = threading.Lock()
+
+    def on_exception(sender, exception, **extra):
+        with lock:
+            errors['locked' if 'database is locked' in str(exception) else 'other'] += 1
+
+    got_request_exception.connect(on_exception, app)
+
+    def worker(ids):
+        client = app.test_client()
+        for n, uid in enumerate(ids):
+            with client.session_transaction() as sess:
+                sess['user_id'] = uid
+            client.post(f'/movie/movie/{movie_ids[n % len(movie_ids)]}', data={'rating': 1 + uid % 5, 'review_text': '压测'})
+            client.post(f'/movie/event/{event_id}')
+
+    chunks = [user_ids[i::args.threads] for i in range(args.threads)]
+    threads = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    requests = len(user_ids) * 2
+    print(json.dumps({
+        'requests': requests,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'locked_errors': errors['locked'],
+        'other_errors': errors['other'],
+        'locked_rate': round(errors['locked'] / requests, 4),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--users', type=int, default=800, help='每个用户发一条评论并报名一次')
+    parser.add_argument('--movies', type=int, default=20)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return run_worker(args)
+
+    results = {}
+    for label, tuning in (('default', '0'), ('tuned', '1')):
+        env = dict(os.environ, SQLITE_TUNING=tuning, SQLITE_BUSY_TIMEOUT_MS=os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', '--threads', str(args.threads),
+                              '--users', str(args.users), '--movies', str(args.movies)],
+                             env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+        results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
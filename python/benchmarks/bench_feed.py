@@ -0,0 +1,126 @@
+"""好友动态基准测试：写扩散时间线 vs 读时合并所有关注对象的日志
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_feed.py --users 10000 --follows 50 --logs-per-user 10
+    python benchmarks/bench_feed.py --users 300 --follows 150 --logs-per-user 200   # 关注对象历史日志多
+
+生成关注关系与日志，统计两种读取方式首页/翻页的 p50/p99 延迟（毫秒），
+以及单条日志写扩散（fanout_log）的耗时。读时合并的耗时随“关注数 × 每人日志数”增长，时间线只与页大小有关。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, select
+
+from models import db, Friendship, Log, TimelineEntry, User
+import feed
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def measure(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {'p50': round(statistics.median(samples), 3), 'p99': round(percentile(samples, 99), 3)}
+
+
+def populate(n_users, follows, logs_per_user, batch=50000):
+    rnd = random.Random(42)
+    db.session.execute(insert(User), [{'id': i, 'username': f'user{i}', 'password': 'x'}
+                                      for i in range(1, n_users + 1)])
+    weights = [1 / (i + 1) ** 0.5 for i in range(n_users)]
+    rows = []
+    for user_id in range(1, n_users + 1):
+        for friend_id in set(rnd.choices(range(1, n_users + 1), weights=weights, k=follows)) - {user_id}:
+            rows.append({'user_id': user_id, 'friend_id': friend_id})
+    for start in range(0, len(rows), batch):
+        db.session.execute(insert(Friendship), rows[start:start + batch])
+    start_time = datetime(2024, 1, 1)
+    rows = [{'user_id': rnd.randint(1, n_users), 'content': '日志内容',
+             'visible': rnd.random() > 0.1, 'created_at': start_time + timedelta(seconds=i * 7)}
+            for i in range(n_users * logs_per_user)]
+    for start in range(0, len(rows), batch):
+        db.session.execute(insert(Log), rows[start:start + batch])
+    # 一次性为已有日志写扩散（相当于把所有 fanout_log 任务执行完）
+    db.session.execute(insert(TimelineEntry).from_select(
+        ['user_id', 'log_id', 'author_id', 'created_at'],
+        select(Friendship.user_id, Log.id, Log.user_id, Log.created_at)
+        .join(Friendship, Friendship.friend_id == Log.user_id).where(Log.visible == True)))
+    db.session.commit()
+
+
+def read_pages(user_id, n):
+    cursor = None
+    for _ in range(n):
+        _, cursor = feed.read_feed(user_id, cursor, 20)
+        if not cursor:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--follows', type=int, default=50, help='每个用户关注的人数')
+    parser.add_argument('--logs-per-user', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            populate(args.users, args.follows, args.logs_per_user)
+            counts = {model.__tablename__: db.session.query(model).count() for model in (Friendship, Log, TimelineEntry)}
+            print(f'生成数据 {time.perf_counter() - t0:.1f}s: {counts}')
+
+            rnd = random.Random(7)
+            users = [(rnd.randint(1, args.users),) for _ in range(args.repeat)]
+            print(f'{"":<14} {"p50":>10} {"p99":>10}')
+            for name, fn in [('读时合并', lambda u: feed.naive_feed(u, 20)),
+                             ('时间线 首页', lambda u: feed.read_feed(u, None, 20)),
+                             ('时间线 连翻5页', lambda u: read_pages(u, 5))]:
+                result = measure(fn, users)
+                print(f'{name:<14} {result["p50"]:>10} {result["p99"]:>10}')
+
+            # 写扩散开销：热门作者（id 小的被关注更多）与普通作者
+            logs = []
+            for author in (1, args.users // 2):
+                log = Log(user_id=author, content='新日志', visible=True, created_at=datetime.utcnow())
+                db.session.add(log)
+                db.session.commit()
+                logs.append((author, log.id))
+            for author, log_id in logs:
+                followers = db.session.query(Friendship).filter_by(friend_id=author).count()
+                t0 = time.perf_counter()
+                feed.fanout_log(log_id)
+                print(f'写扩散 作者 {author}（{followers} 个关注者）: {(time.perf_counter() - t0) * 1000:.1f}ms')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
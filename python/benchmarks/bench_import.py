@@ -0,0 +1,109 @@
+"""电影目录批量导入/导出基准测试
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_import.py --rows 1000000
+    python benchmarks/bench_import.py --rows 100000 --format jsonl --batch-size 5000
+
+生成含少量重复与非法行的 CSV/JSONL 文件，统计导入（校验、去重、写入、补全文索引）
+与流式导出的每秒行数，并对比逐条 ORM 插入（session.add + commit）的速度。
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, Movie
+import catalog
+import search
+
+WORDS = ['星际', '穿越', '流浪', '地球', '霸王', '别姬', '无间', '道', '大话', '西游', 'Dark', 'Knight', 'Matrix']
+DIRECTORS = ['张艺谋', '陈凯歌', '王家卫', '姜文', '诺兰', 'Spielberg', 'Kubrick', 'Miyazaki']
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def write_file(path, fmt, n_rows, seed=42):
+    """约 1% 的行与前面重复，0.5% 的行年份非法"""
+    rnd = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=catalog.FIELDS) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        for i in range(n_rows):
+            n = rnd.randrange(i) if i and rnd.random() < 0.01 else i
+            title = f'{WORDS[n % len(WORDS)]}{WORDS[n // len(WORDS) % len(WORDS)]} {n}'
+            row = {'title': title, 'director': rnd.choice(DIRECTORS),
+                   'actors': ' / '.join(rnd.sample(DIRECTORS, 3)), 'genre': '剧情',
+                   'release_year': str(1950 + n % 75), 'country': '中国', 'duration': f'{90 + n % 90}分钟',
+                   'rating': f'{n % 100 / 10:.1f}/10', 'description': '一部关于电影的电影。'}
+            if rnd.random() < 0.005:
+                row['release_year'] = '未知'
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=catalog.FORMATS, default='csv')
+    parser.add_argument('--batch-size', type=int, default=catalog.BATCH_SIZE)
+    parser.add_argument('--orm-rows', type=int, default=5000, help='逐条 ORM 插入对照的行数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, 'movies.' + args.format)
+        write_file(data, args.format, args.rows)
+        print(f'生成 {args.rows} 行 {args.format}（{os.path.getsize(data) / 1024 / 1024:.1f}MB）')
+
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            search.init_search(app)
+
+            t0 = time.perf_counter()
+            with open(data, encoding='utf-8', newline='') as f:
+                result = catalog.import_movies(f, args.format, args.batch_size)
+            elapsed = time.perf_counter() - t0
+            print(f'批量导入: {elapsed:.1f}s，{result.read / elapsed:,.0f} 行/秒 '
+                  f'（新增 {result.inserted}，重复 {result.duplicates}，无效 {result.invalid}）')
+
+            # 再导入一遍：全部按 标题+年份 去重跳过
+            t0 = time.perf_counter()
+            with open(data, encoding='utf-8', newline='') as f:
+                again = catalog.import_movies(f, args.format, args.batch_size)
+            elapsed = time.perf_counter() - t0
+            print(f'重复导入: {elapsed:.1f}s，{again.read / elapsed:,.0f} 行/秒（新增 {again.inserted}）')
+
+            t0 = time.perf_counter()
+            exported = sum(chunk.count('\n') for chunk in catalog.export_movies(args.format))
+            elapsed = time.perf_counter() - t0
+            print(f'流式导出: {elapsed:.1f}s，{exported / elapsed:,.0f} 行/秒')
+
+            t0 = time.perf_counter()
+            for i in range(args.orm_rows):
+                db.session.add(Movie(title=f'逐条 {i}', release_year=2000, duration=100, rating=5.0))
+                db.session.commit()
+            elapsed = time.perf_counter() - t0
+            print(f'逐条 ORM 插入（{args.orm_rows} 行）: {args.orm_rows / elapsed:,.0f} 行/秒')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""列表页列裁剪基准：完整 ORM 对象 vs 只查询用到的列，10 万部电影
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_lists.py --movies 100000 --description-chars 2000
+
+数据用 datagen 在临时目录生成，再把每部电影的简介改成 --description-chars 个字符。
+对每项分别记录耗时（毫秒，取 --rounds 次最小值）与 Python 内存分配峰值（tracemalloc，MB）:
+    admin_movies   改前：全部电影 ORM 对象 + 渲染；改后：GET /admin/movies 第一页（列元组 + 简介摘要）
+    event_picker   改前：活动管理页为下拉框加载全部电影；改后：GET /admin/api/movie_options?q=...
+    movie_list     取 100 部（查询与对象构造）：完整对象 vs load_only 摘要字段
+    search         检索结果取 100 部：同上
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_lists.db')
+os.environ['TASK_WORKERS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+os.environ['RANKING_REFRESH_INTERVAL'] = '0'
+os.environ['CACHE_BACKEND'] = 'null'
+
+from flask import render_template
+from sqlalchemy import update
+from sqlalchemy.orm import undefer
+
+from datagen import PASSWORD, Scale, populate
+from app import create_app
+from models import db, Movie, User
+from search import search_statement
+from views_movie import MOVIE_SUMMARY_FIELDS
+import catalog
+
+JSON = {'Accept': 'application/json'}
+
+
+def measure(fn, rounds):
+    """返回 (最小耗时 ms, 内存分配峰值 MB)"""
+    times = []
+    for _ in range(rounds):
+        db.session.expunge_all()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times) * 1000, peak / 2 ** 20
+
+
+def check(resp):
+    assert resp.status_code == 200, resp.status_code
+    return resp.get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--movies', type=int, default=100000)
+    parser.add_argument('--description-chars', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        populate(Scale(users=200, movies=args.movies, reviews_per_user=5, friends_per_user=1, logs_per_user=1,
+                       events=20, registrations_per_event=5, news=1))
+        db.session.execute(update(Movie).values(description='简介' * (args.description_chars // 2)))
+        db.session.commit()
+        admin = User.query.filter(User.role == 'admin').first()
+        admin_name = admin.username
+        word = Movie.query.first().title[:2]
+
+    client = app.test_client()
+    assert client.post('/user/login', json={'username': admin_name, 'password': PASSWORD}).status_code == 200
+
+    def old_admin_movies():
+        with app.test_request_context('/admin/movies'):
+            movies = Movie.query.options(undefer(Movie.description)).order_by(Movie.created_at.desc()).all()
+            render_template('admin_movies.html', movies=movies, user=db.session.get(User, admin.id))
+
+    def full():
+        return Movie.query.options(undefer(Movie.description))
+
+    summary = catalog.only(Movie, MOVIE_SUMMARY_FIELDS)
+
+    cases = [
+        ('admin_movies', old_admin_movies, lambda: check(client.get('/admin/movies'))),
+        ('event_picker', lambda: full().all(), lambda: check(client.get(f'/admin/api/movie_options?q={word}'))),
+        ('movie_list', lambda: full().order_by(Movie.id).limit(100).all(),
+         lambda: Movie.query.options(summary).order_by(Movie.id).limit(100).all()),
+        ('search', lambda: db.session.scalars(search_statement(word).options(undefer(Movie.description))
+                                              .limit(100)).all(),
+         lambda: db.session.scalars(search_statement(word).options(summary).limit(100)).all()),
+    ]
+    print(f'{args.movies} 部电影，简介 {args.description_chars} 字符；耗时 ms / 内存峰值 MB')
+    print(f'{"页面":<14} {"改前 ms":>10} {"改前 MB":>9} {"改后 ms":>10} {"改后 MB":>9}')
+    with app.app_context():
+        for name, before, after in cases:
+            before_ms, before_mb = measure(before, args.rounds)
+            after_ms, after_mb = measure(after, args.rounds)
+            print(f'{name:<14} {before_ms:>10.1f} {before_mb:>9.1f} {after_ms:>10.1f} {after_mb:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""排行榜基准：物化榜单读取 vs 每次请求现场聚合，以及增量刷新 vs 全量重建
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_rankings.py --users 20000 --reviews-per-user 20 --new 500
+
+数据用 datagen 在临时目录生成（评论时间分布在最近约 115 天内）。
+    read       GET /movie/top（关闭页面缓存）vs 同一榜单直接对 movie_review 做窗口聚合的查询
+    refresh    新增 --new 条评论后 ``refresh()``（只汇总水位之后的行）vs ``rebuild()``
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_rankings.db')
+os.environ['TASK_WORKERS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+os.environ['RANKING_REFRESH_INTERVAL'] = '0'
+os.environ['CACHE_BACKEND'] = 'null'
+
+from sqlalchemy import func, insert, select
+
+from datagen import Scale, populate
+from perf_suite import summarize
+from app import create_app
+from models import db, Movie, MovieReview, User
+import rankings
+
+
+def adhoc_top(days, limit):
+    """不使用物化表：每次请求对评论表做窗口聚合并按贝叶斯平均排序"""
+    since = datetime.utcnow() - timedelta(days=days)
+    count, total = db.session.execute(select(func.count(), func.sum(MovieReview.rating))
+                                      .where(MovieReview.created_at >= since)).one()
+    prior = rankings.PRIOR_WEIGHT * (total / count)
+    score = (prior + func.sum(MovieReview.rating)) / (rankings.PRIOR_WEIGHT + func.count())
+    return db.session.execute(
+        select(Movie.id, Movie.title, score.label('score'))
+        .join(MovieReview, MovieReview.movie_id == Movie.id).where(MovieReview.created_at >= since)
+        .group_by(Movie.id).order_by(score.desc()).limit(limit)).all()
+
+
+def latency(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples)
+
+
+def add_reviews(n, rnd):
+    """新增 n 条评论（避开已有的 (用户, 电影) 组合）"""
+    users = db.session.scalars(select(User.id)).all()
+    movies = db.session.scalars(select(Movie.id)).all()
+    existing = set(db.session.execute(select(MovieReview.user_id, MovieReview.movie_id)).all())
+    rows = []
+    while len(rows) < n:
+        pair = (rnd.choice(users), rnd.choice(movies))
+        if pair not in existing:
+            existing.add(pair)
+            rows.append({'user_id': pair[0], 'movie_id': pair[1], 'rating': rnd.randint(1, 5),
+                         'review_text': '新评论', 'created_at': datetime.utcnow()})
+    db.session.execute(insert(MovieReview), rows)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200, help='读取延迟的采样次数')
+    parser.add_argument('--new', type=int, default=500, help='增量刷新前新增的评论数')
+    parser.add_argument('--limit', type=int, default=20)
+    Scale.add_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        counts = populate(Scale.from_args(args))
+    print(f'评论 {counts["movie_review"]} 条，电影 {counts["movie"]} 部')
+
+    client = app.test_client()
+    url = f'/movie/top?window=month&limit={args.limit}'
+    assert client.get(url).status_code == 200
+    print(f'{"读取":<12} {"p50 ms":>8} {"p99 ms":>8}')
+    stats = latency(lambda: client.get(url), args.rounds)
+    print(f'{"物化榜单":<12} {stats["p50"]:>8.2f} {stats["p99"]:>8.2f}')
+    with app.app_context():
+        stats = latency(lambda: adhoc_top(30, args.limit), max(1, args.rounds // 10))
+    print(f'{"现场聚合":<12} {stats["p50"]:>8.2f} {stats["p99"]:>8.2f}')
+
+    with app.app_context():
+        add_reviews(args.new, random.Random(Scale.from_args(args).seed))
+        t0 = time.perf_counter()
+        touched = rankings.refresh()
+        incremental = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rankings.rebuild()
+        full = time.perf_counter() - t0
+    print(f'增量刷新（{args.new} 条新评论，更新 {touched["movie_review"]} 行日汇总）: {incremental * 1000:.1f} ms')
+    print(f'全量重建: {full * 1000:.1f} ms（{full / incremental:.1f}x）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""电影推荐基准测试：离线构建耗时与在线推荐延迟
+
+用法（在 python/ 目录下运行，需要 NumPy/SciPy）:
+    python benchmarks/bench_recommend.py --users 100000 --movies 50000 --ratings-per-user 20
+
+生成带热门度偏斜的随机评分，直接调用 compute_neighbors 统计构建耗时；
+再把评分与邻居表写入临时 SQLite 库，统计 recommend_for 与增量刷新的 p50/p99 延迟（毫秒）。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import insert
+
+from models import db, Movie, MovieNeighbor, MovieReview, User
+import recommend
+
+DIRECTORS = ['张艺谋', '陈凯歌', '王家卫', '姜文', '诺兰', 'Spielberg', 'Kubrick', 'Miyazaki']
+GENRES = ['剧情', '科幻', '动作', '爱情', '动画', '悬疑', '喜剧', '纪录']
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def summarize(samples):
+    return {'p50': round(statistics.median(samples), 3), 'p99': round(percentile(samples, 99), 3)}
+
+
+def generate(n_users, n_movies, per_user, seed=42):
+    """返回 (user_idx, movie_idx, ratings, movie 元数据)；电影热门度服从 Zipf 分布"""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, n_movies + 1) ** 0.8
+    weights /= weights.sum()
+    user_idx = np.repeat(np.arange(n_users), per_user)
+    movie_idx = rng.choice(n_movies, size=n_users * per_user, p=weights)
+    # 同一用户重复抽到的电影只保留一条
+    pairs = np.unique(user_idx * n_movies + movie_idx)
+    user_idx, movie_idx = pairs // n_movies, pairs % n_movies
+    ratings = rng.integers(1, 6, size=len(pairs)).astype(np.float32)
+    rnd = random.Random(seed)
+    meta = [(rnd.choice(GENRES), rnd.choice(DIRECTORS)) for _ in range(n_movies)]
+    return user_idx, movie_idx, ratings, meta
+
+
+def feature_arrays(meta):
+    positions, rows, cols = {}, [], []
+    for i, (genre, director) in enumerate(meta):
+        for feature in recommend.movie_features(genre, director):
+            rows.append(i)
+            cols.append(positions.setdefault(feature, len(positions)))
+    return (np.array(rows), np.array(cols)), len(positions)
+
+
+def populate(meta, user_idx, movie_idx, ratings, neighbors, scores, n_users, batch=20000):
+    db.session.execute(insert(Movie), [{'id': i + 1, 'title': f'电影{i}', 'genre': g, 'director': d,
+                                        'rating': 3.0} for i, (g, d) in enumerate(meta)])
+    db.session.execute(insert(User), [{'id': u + 1, 'username': f'user{u}', 'password': 'x'}
+                                      for u in range(n_users)])
+    for start in range(0, len(ratings), batch):
+        db.session.execute(insert(MovieReview), [
+            {'user_id': int(u) + 1, 'movie_id': int(m) + 1, 'rating': int(r)}
+            for u, m, r in zip(user_idx[start:start + batch], movie_idx[start:start + batch],
+                               ratings[start:start + batch])])
+    rows = [{'movie_id': i + 1, 'neighbor_id': int(j) + 1, 'score': float(s)}
+            for i in range(len(meta)) for j, s in zip(neighbors[i], scores[i]) if j >= 0]
+    for start in range(0, len(rows), batch):
+        db.session.execute(insert(MovieNeighbor), rows[start:start + batch])
+    db.session.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--movies', type=int, default=50000)
+    parser.add_argument('--ratings-per-user', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--refresh-repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    user_idx, movie_idx, ratings, meta = generate(args.users, args.movies, args.ratings_per_user)
+    feature_idx, n_features = feature_arrays(meta)
+    print(f'{args.users} 用户 × {args.movies} 电影，{len(ratings)} 条评分（生成 {time.perf_counter() - t0:.1f}s）')
+
+    t0 = time.perf_counter()
+    neighbors, scores = recommend.compute_neighbors(user_idx, movie_idx, ratings, args.users, args.movies,
+                                                    feature_idx, n_features)
+    print(f'构建邻居表: {time.perf_counter() - t0:.1f}s')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            rows = populate(meta, user_idx, movie_idx, ratings, neighbors, scores, args.users)
+            print(f'写入评分与 {rows} 条邻居: {time.perf_counter() - t0:.1f}s')
+
+            rnd = random.Random(7)
+            samples = []
+            for _ in range(args.repeat):
+                user = db.session.get(User, rnd.randint(1, args.users))
+                started = time.perf_counter()
+                recommend.recommend_for(user, 20)
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.expunge_all()
+            print(f'在线推荐 (ms): {summarize(samples)}')
+
+            samples = []
+            for _ in range(args.refresh_repeat):
+                movie_id = rnd.randint(1, args.movies)
+                started = time.perf_counter()
+                recommend.refresh_movie_neighbors(movie_id)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f'增量刷新单部电影 (ms): {summarize(samples)}')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
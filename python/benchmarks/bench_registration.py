@@ -0,0 +1,104 @@
+"""活动报名并发压测：验证不超员、候补顺序正确，并测量吞吐量
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_registration.py --users 3000 --capacity 500 --threads 32
+
+所有用户同时通过 /movie/api/event/<id>/registration 抢报同一场活动，
+结束后检查正式报名数 == 名额、current_participants 与报名表一致、无重复报名；
+再随机取消一部分正式报名，检查候补者按顺序递补。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_registration.db')
+
+from sqlalchemy import func
+
+from app import app
+from models import db, User, MovieEvent, EventRegistration
+import registration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--capacity', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--cancel', type=int, default=100, help='压测结束后取消的正式报名数')
+    args = parser.parse_args()
+
+    with app.app_context():
+        users = [User(username=f'fan{i}', password='x') for i in range(args.users)]
+        event_obj = MovieEvent(title='首映抢票', max_participants=args.capacity, current_participants=0)
+        db.session.add_all(users + [event_obj])
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        event_id = event_obj.id
+
+    # 每个用户重复提交两次，模拟连点
+    attempts = user_ids * 2
+    random.Random(7).shuffle(attempts)
+    chunks = [attempts[i::args.threads] for i in range(args.threads)]
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(ids):
+        client = app.test_client()
+        for uid in ids:
+            with client.session_transaction() as sess:
+                sess['user_id'] = uid
+            resp = client.post(f'/movie/api/event/{event_id}/registration')
+            key = resp.json['result'] if resp.status_code == 200 else f'http {resp.status_code}'
+            with lock:
+                statuses[key] += 1
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    failures = []
+    with app.app_context():
+        counts = dict(db.session.query(EventRegistration.status, func.count()).filter_by(event_id=event_id)
+                      .group_by(EventRegistration.status).all())
+        current = db.session.get(MovieEvent, event_id).current_participants
+        if counts.get(registration.REGISTERED) != args.capacity or current != args.capacity:
+            failures.append(f'超员或名额不一致: registered={counts.get(registration.REGISTERED)} current={current}')
+        if sum(counts.values()) != args.users:
+            failures.append(f'存在重复报名: rows={sum(counts.values())} users={args.users}')
+
+        # 取消一部分正式报名，检查递补顺序
+        waitlist = [r.user_id for r in EventRegistration.query.filter_by(event_id=event_id, status=registration.WAITLISTED)
+                    .order_by(EventRegistration.registration_date, EventRegistration.id)]
+        registered = [r.user_id for r in EventRegistration.query.filter_by(event_id=event_id, status=registration.REGISTERED)]
+        for uid in registered[:args.cancel]:
+            registration.cancel(uid, event_id)
+        promoted = {r.user_id for r in EventRegistration.query.filter_by(event_id=event_id, status=registration.REGISTERED)} \
+            - set(registered)
+        if promoted != set(waitlist[:args.cancel]):
+            failures.append('候补递补顺序错误')
+        if db.session.get(MovieEvent, event_id).current_participants != args.capacity:
+            failures.append('递补后名额不一致')
+
+    print(f'requests={len(attempts)} seconds={elapsed:.2f} throughput={len(attempts) / elapsed:.1f} req/s')
+    print(f'responses={dict(statuses)} final={counts}')
+    for f in failures:
+        print('FAIL', f)
+    print('OK' if not failures else 'FAILED')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""电影搜索基准测试：FTS5 索引 vs 旧的 LIKE 全表扫描
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+
+每个规模各生成一个临时 SQLite 库，统计两种检索方式的 p50/p99 延迟（毫秒）。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models import db, Movie
+import search
+
+TITLE_WORDS = ['星际', '穿越', '流浪', '地球', '霸王', '别姬', '无间', '道', '大话', '西游',
+               '千与千寻', '盗梦', '空间', '肖申克', '救赎', '阿甘', '正传', '让子弹飞']
+LATIN_WORDS = ['star', 'night', 'journey', 'dream', 'city', 'love', 'war', 'ghost', 'river', 'king']
+DIRECTORS = ['张艺谋', '陈凯歌', '王家卫', '姜文', '诺兰', 'Spielberg', 'Kubrick', 'Miyazaki']
+GENRES = ['剧情', '科幻', '动作', '爱情', '动画', '悬疑']
+QUERIES = ['星际', '穿越', '诺兰', 'dream', 'kub', '千与千寻', '让子弹', '王家卫', 'river king', '西游']
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(n, batch=10000):
+    rnd = random.Random(42)
+    for start in range(0, n, batch):
+        rows = []
+        for _ in range(min(batch, n - start)):
+            title = ''.join(rnd.sample(TITLE_WORDS, 2))
+            rows.append({
+                'title': title,
+                'original_title': ' '.join(rnd.sample(LATIN_WORDS, 2)).title(),
+                'director': rnd.choice(DIRECTORS),
+                'actors': ' / '.join(rnd.sample(DIRECTORS, 3)),
+                'genre': rnd.choice(GENRES),
+                'release_year': rnd.randint(1950, 2024),
+                'rating': round(rnd.uniform(1, 5), 1),
+                'description': f'{title}，一部关于{rnd.choice(TITLE_WORDS)}的{rnd.choice(GENRES)}电影。',
+            })
+        db.session.execute(insert(Movie), rows)
+    db.session.commit()
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def measure(fn, repeat):
+    samples = []
+    for i in range(repeat):
+        q = QUERIES[i % len(QUERIES)]
+        t0 = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {'p50': round(statistics.median(samples), 3), 'p99': round(percentile(samples, 99), 3)}
+
+
+def like_search(q):
+    return Movie.query.filter(search.like_filter(q)).order_by(Movie.rating.desc()) \
+        .paginate(page=1, per_page=20, error_out=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"movies":>10} {"like p50":>10} {"like p99":>10} {"fts p50":>10} {"fts p99":>10}')
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.db'))
+            with app.app_context():
+                db.create_all()
+                search.init_search(app)
+                populate(n)
+                search.rebuild_index()
+                like = measure(like_search, args.repeat)
+                fts = measure(lambda q: search.search_movies(q, per_page=20), args.repeat)
+                db.session.remove()
+                db.engine.dispose()
+        print(f'{n:>10} {like["p50"]:>10} {like["p99"]:>10} {fts["p50"]:>10} {fts["p99"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""序列化基准：ORM 对象 + 手写字典 + 标准库 JSON vs Schema 列查询 + orjson，10k 行响应
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_serialization.py --rows 10000 --rounds 5
+
+数据用 datagen 在临时目录生成（--rows 个用户与新闻）。每种数据分别计时:
+    fetch   查询并取出全部行
+    build   转成字典列表
+    encode  编码成 JSON 字节
+另外对流式输出的 GET /admin/users 计时（Flask 测试客户端，不含网络开销）。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'bench_serialization.db')
+os.environ['TASK_WORKERS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+os.environ['RANKING_REFRESH_INTERVAL'] = '0'
+os.environ['CACHE_BACKEND'] = 'null'
+
+from flask.json.provider import DefaultJSONProvider
+
+from datagen import PASSWORD, Scale, populate
+from app import create_app
+from models import db, Log, News, User
+import serialization
+from serialization import LOG, NEWS, USER_ADMIN
+
+
+# 改动前的写法：查询 ORM 对象，逐行手写字典
+def orm_news():
+    return [{'id': n.id, 'title': n.title, 'content': n.content, 'created_at': n.created_at}
+            for n in News.query.order_by(News.created_at.desc()).all()]
+
+
+def orm_logs():
+    return [{'id': l.id, 'content': l.content, 'visible': l.visible, 'created_at': l.created_at}
+            for l in Log.query.order_by(Log.created_at.desc()).all()]
+
+
+def orm_users():
+    return [{'id': u.id, 'username': u.username, 'role': u.role, 'nickname': u.nickname} for u in User.query.all()]
+
+
+CASES = {
+    'news': (orm_news, NEWS, News.created_at.desc()),
+    'logs': (orm_logs, LOG, Log.created_at.desc()),
+    'users': (orm_users, USER_ADMIN, User.id),
+}
+
+
+def best(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000, result
+
+
+def bench_case(app, name, rounds):
+    orm, schema, order = CASES[name]
+    stdlib = DefaultJSONProvider(app)
+    # 改动前：ORM 查询与建字典无法分开计时，合并计入 fetch
+    before_fetch, items = best(orm, rounds)
+    before_encode, body = best(lambda: stdlib.response(items).get_data(), rounds)
+    after_fetch, rows = best(lambda: schema.query().order_by(order).all(), rounds)
+    after_build, items = best(lambda: schema.dump_all(rows), rounds)
+    after_encode, _ = best(lambda: app.json.response(items).get_data(), rounds)
+    before = before_fetch + before_encode
+    after = after_fetch + after_build + after_encode
+    print(f'{name:<6} {len(rows):>6} {before_fetch:>12.1f} {before_encode:>8.1f} {before:>8.1f}   '
+          f'{after_fetch:>8.1f} {after_build:>7.1f} {after_encode:>8.1f} {after:>8.1f} {before / after:>6.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        populate(Scale(users=args.rows, movies=10, reviews_per_user=0, friends_per_user=1, logs_per_user=1,
+                       events=0, news=args.rows))
+        admin_name = User.query.filter(User.role == 'admin').first().username
+
+        print(f'JSON 编码: {"orjson" if serialization.orjson else "标准库 json"}（毫秒，取 {args.rounds} 次最小值）')
+        print(f'{"数据":<6} {"行数":>6} {"改前 fetch+build":>12} {"encode":>8} {"合计":>8}   '
+              f'{"fetch":>8} {"build":>7} {"encode":>8} {"合计":>8} {"加速":>7}')
+        for name in CASES:
+            bench_case(app, name, args.rounds)
+
+    client = app.test_client()
+    assert client.post('/user/login', json={'username': admin_name, 'password': PASSWORD}).status_code == 200
+    samples = []
+    for _ in range(args.rounds):
+        t0 = time.perf_counter()
+        resp = client.get('/admin/users')
+        body = resp.get_data()
+        samples.append(time.perf_counter() - t0)
+    assert resp.status_code == 200
+    print(f'GET /admin/users（流式，{len(body) // 1024} KB）: {min(samples) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""部署方式对比：开发服务器 / 多线程 WSGI / ASGI 在并发客户端下的吞吐量与延迟
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_serving.py --clients 32 --duration 10
+    python benchmarks/bench_serving.py --db /tmp/bench.db --modes waitress,uvicorn
+
+每种方式在独立子进程中启动并监听空闲端口，客户端线程用 keep-alive 连接混合请求
+/public/news、/movie/movies、/movie/search 的 JSON 接口，统计每秒请求数与 p50/p99 延迟（毫秒）。
+    dev        ``app.run()``（werkzeug 开发服务器）
+    werkzeug   ``serve.py --server werkzeug``
+    waitress   ``serve.py --server waitress``（需安装 waitress）
+    uvicorn    ``uvicorn asgi:application``（需安装 uvicorn）
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import Scale
+from perf_suite import SEARCH_TERMS, summarize
+
+HEADERS = {'Accept': 'application/json'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def command(mode, port, threads, workers):
+    if mode == 'dev':
+        return [sys.executable, '-c', f'from app import app; app.run(port={port})']
+    if mode in ('werkzeug', 'waitress'):
+        return [sys.executable, 'serve.py', '--server', mode, '--port', str(port), '--threads', str(threads)]
+    return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+            '--workers', str(workers), '--no-access-log', '--log-level', 'warning']
+
+
+def wait_ready(port, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'服务进程退出，状态码 {proc.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/public/news', headers=HEADERS)
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('服务启动超时')
+
+
+def make_urls(rnd):
+    return [
+        lambda: f'/public/news?page={rnd.randint(1, 20)}',
+        lambda: f'/movie/movies?page={rnd.randint(1, 50)}',
+        lambda: f'/movie/search?q={quote(rnd.choice(SEARCH_TERMS))}',
+    ]
+
+
+def drive(port, clients, duration, seed):
+    samples, errors = [], [0]
+    lock = threading.Lock()
+    start = threading.Barrier(clients + 1)
+
+    def worker(index):
+        rnd = random.Random(seed + index)
+        urls = make_urls(rnd)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local, failed = [], 0
+        start.wait()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                conn.request('GET', rnd.choice(urls)(), headers=HEADERS)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        with lock:
+            samples.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.monotonic()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    return len(samples) / elapsed, summarize(samples) if samples else None, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='已有数据库（如 datagen.py 生成的）；默认临时生成')
+    parser.add_argument('--modes', default='dev,werkzeug,waitress,uvicorn')
+    parser.add_argument('--clients', type=int, default=32, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=16, help='WSGI 服务线程数')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn 进程数')
+    Scale.add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp.name, 'serving.db')
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, TASK_WORKERS='0', SESSION_SWEEP_INTERVAL='0')
+    if not os.path.exists(db_path):
+        subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'datagen.py'), '--out', db_path]
+                       + [f'--{k.replace("_", "-")}={v}' for k, v in vars(Scale.from_args(args)).items()],
+                       cwd=ROOT, env=env, check=True)
+
+    print(f'{"方式":<10} {"请求/秒":>10} {"p50":>8} {"p99":>8} {"错误":>6}')
+    for mode in args.modes.split(','):
+        port = free_port()
+        proc = subprocess.Popen(command(mode, port, args.threads, args.workers), cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port, proc)
+            rps, stats, errors = drive(port, args.clients, args.duration, Scale.from_args(args).seed)
+        except RuntimeError as e:
+            print(f'{mode:<10} 跳过: {e}')
+            continue
+        finally:
+            proc.terminate()
+            proc.wait(30)
+        print(f'{mode:<10} {rps:>10.1f} {stats["p50"]:>8.2f} {stats["p99"]:>8.2f} {errors:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""好友推荐基准测试：CSR 内存图、SQL 现算与预计算表三种方式
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_social.py --users 100000 --edges 1000000
+
+按幂律分布生成关注关系（少数人被大量关注），统计内存图的构建耗时与内存占用，
+以及三种方式获取单个用户推荐的 p50/p99 延迟（毫秒）。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models import db, Friendship, User
+import social
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def measure(fn, user_ids):
+    samples = []
+    for user_id in user_ids:
+        t0 = time.perf_counter()
+        fn(user_id)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {'p50': round(statistics.median(samples), 3), 'p99': round(percentile(samples, 99), 3)}
+
+
+def generate(n_users, n_edges, seed=42):
+    """被关注者按 Zipf 分布抽取，关注者均匀抽取"""
+    rnd = random.Random(seed)
+    weights = [1 / (i + 1) ** 0.7 for i in range(n_users)]
+    edges = set()
+    while len(edges) < n_edges:
+        batch = n_edges - len(edges)
+        followers = [rnd.randint(1, n_users) for _ in range(batch)]
+        followees = rnd.choices(range(1, n_users + 1), weights=weights, k=batch)
+        edges.update((a, b) for a, b in zip(followers, followees) if a != b)
+    return sorted(edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--edges', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    edges = generate(args.users, args.edges)
+    print(f'{args.users} 用户，{len(edges)} 条关系（生成 {time.perf_counter() - t0:.1f}s）')
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    graph = social.SocialGraph.from_edges(edges)
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'CSR 构建 {elapsed:.1f}s，数组 {graph.nbytes() / 1024 / 1024:.1f}MB，'
+          f'常驻 {current / 1024 / 1024:.1f}MB，构建峰值 {peak / 1024 / 1024:.1f}MB')
+
+    rnd = random.Random(7)
+    sample = [rnd.randint(1, args.users) for _ in range(args.repeat)]
+    print(f'内存图推荐 (ms): {measure(graph.suggestions, sample)}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            db.session.execute(insert(User), [{'id': i, 'username': f'user{i}', 'password': 'x'}
+                                              for i in range(1, args.users + 1)])
+            for start in range(0, len(edges), 50000):
+                db.session.execute(insert(Friendship), [{'user_id': a, 'friend_id': b}
+                                                        for a, b in edges[start:start + 50000]])
+            db.session.commit()
+            print(f'SQL 现算 (ms): {measure(social.query_suggestions, sample)}')
+            t0 = time.perf_counter()
+            users, rows = social.build_all(graph)
+            print(f'批量预计算 {users} 个用户、{rows} 条推荐: {time.perf_counter() - t0:.1f}s')
+            print(f'读取预计算表 (ms): {measure(social.suggestions_for, sample)}')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""启动耗时基准：导入模块、create_app 与首个请求的耗时
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/bench_startup.py --repeat 5
+
+每个场景在新的解释器进程中运行（包含模块导入），取多次的中位数（毫秒）:
+    import          只导入 app 模块，不创建应用
+    auto-migrate    create_app()，启动时建表、执行迁移与回填检查（原 app.py 的行为）
+    no-migrate      AUTO_MIGRATE=0，表结构由部署时的 db-upgrade 准备
+    no-migrate+2bp  同上，且只注册 public、movie 蓝图
+    testing         create_app('testing')，内存数据库（含建表）
+数据库默认用 datagen 在临时目录生成。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import Scale
+
+# 子进程中执行的代码：输出 {阶段: 毫秒}
+PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+result = {'import': (t1 - t0) * 1000}
+if sys.argv[1] != 'import':
+    app = module.create_app(sys.argv[1] if sys.argv[1] == 'testing' else None)
+    t2 = time.perf_counter()
+    resp = app.test_client().get('/public/news', headers={'Accept': 'application/json'})
+    assert resp.status_code == 200, resp.status_code
+    result.update(create_app=(t2 - t1) * 1000, first_request=(time.perf_counter() - t2) * 1000)
+print(json.dumps(result))
+'''
+
+SCENARIOS = [
+    ('import', 'import', {}),
+    ('auto-migrate', 'default', {'AUTO_MIGRATE': '1'}),
+    ('no-migrate', 'default', {'AUTO_MIGRATE': '0'}),
+    ('no-migrate+2bp', 'default', {'AUTO_MIGRATE': '0', 'BLUEPRINTS': 'public,movie'}),
+    ('testing', 'testing', {}),
+]
+
+
+def run(profile, extra_env, env):
+    out = subprocess.run([sys.executable, '-c', PROBE, profile], cwd=ROOT, env=dict(env, **extra_env),
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='已有数据库（如 datagen.py 生成的）；默认临时生成')
+    parser.add_argument('--repeat', type=int, default=5)
+    Scale.add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp.name, 'startup.db')
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, TASK_WORKERS='0', SESSION_SWEEP_INTERVAL='0')
+    env.pop('APP_CONFIG', None)
+    if not os.path.exists(db_path):
+        subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'datagen.py'), '--out', db_path]
+                       + [f'--{k.replace("_", "-")}={v}' for k, v in vars(Scale.from_args(args)).items()],
+                       cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    print(f'{"场景":<16} {"导入":>8} {"create_app":>11} {"首个请求":>9} {"合计":>8}')
+    for name, profile, extra_env in SCENARIOS:
+        runs = [run(profile, extra_env, env) for _ in range(args.repeat)]
+        phases = {k: statistics.median(r.get(k, 0) for r in runs) for k in ('import', 'create_app', 'first_request')}
+        print(f'{name:<16} {phases["import"]:>8.1f} {phases["create_app"]:>11.1f} {phases["first_request"]:>9.1f} '
+              f'{sum(phases.values()):>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
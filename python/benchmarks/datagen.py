@@ -0,0 +1,157 @@
+"""合成数据生成器：按指定规模填充与 association.db 结构相同的数据库
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/datagen.py --out /tmp/bench.db --users 10000 --movies 5000
+
+也可在其它脚本中调用 ``populate(Scale(...))``（需在应用上下文中）。
+所有生成账号的密码均为 ``PASSWORD``；数据写入后重建搜索索引、评分聚合、统计计数器与排行榜。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'bench-password'
+BATCH = 20000
+
+TITLE_WORDS = ['星际', '穿越', '流浪', '地球', '霸王', '别姬', '无间', '道', '大话', '西游',
+               '千与千寻', '盗梦', '空间', '肖申克', '救赎', '阿甘', '正传', '让子弹飞']
+DIRECTORS = ['张艺谋', '陈凯歌', '王家卫', '姜文', '诺兰', 'Spielberg', 'Kubrick', 'Miyazaki']
+GENRES = ['剧情', '科幻', '动作', '爱情', '动画', '悬疑', '喜剧', '纪录']
+NEWS_CATEGORIES = ['announcement', 'review', 'industry_news']
+
+
+@dataclass
+class Scale:
+    users: int = 2000
+    movies: int = 1000
+    reviews_per_user: int = 10
+    friends_per_user: int = 20
+    logs_per_user: int = 10
+    events: int = 200
+    registrations_per_event: int = 30
+    news: int = 500
+    seed: int = 42
+
+    @classmethod
+    def add_arguments(cls, parser):
+        for f in fields(cls):
+            parser.add_argument('--' + f.name.replace('_', '-'), type=int, default=f.default)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(**{f.name: getattr(args, f.name) for f in fields(cls)})
+
+
+def _insert(model, rows):
+    from sqlalchemy import insert
+    from models import db
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(insert(model), rows[start:start + BATCH])
+
+
+def populate(scale):
+    """写入合成数据并重建派生数据，返回各表行数"""
+    from werkzeug.security import generate_password_hash
+    from models import (db, User, Movie, MovieReview, Friendship, Log, MovieEvent, EventRegistration,
+                        News, TimelineEntry)
+    from sqlalchemy import insert, select
+    import rankings
+    import ratings
+    import search
+    import site_stats
+
+    rnd = random.Random(scale.seed)
+    now = datetime.utcnow()
+    password = generate_password_hash(PASSWORD)
+    # 热门度偏斜：id 小的电影/用户被评论、关注得更多
+    movie_weights = [1 / (i + 1) ** 0.8 for i in range(scale.movies)]
+    user_weights = [1 / (i + 1) ** 0.5 for i in range(scale.users)]
+    movie_ids = range(1, scale.movies + 1)
+    user_ids = range(1, scale.users + 1)
+
+    _insert(User, [{'id': i, 'username': f'user{i}', 'password': password, 'nickname': f'会员{i}',
+                    'role': 'admin' if i == 1 else 'member', 'tags': rnd.choice(GENRES),
+                    'favorite_genres': ','.join(rnd.sample(GENRES, 2)),
+                    'join_date': now - timedelta(minutes=scale.users - i)} for i in user_ids])
+    _insert(Movie, [{'id': i, 'title': ''.join(rnd.sample(TITLE_WORDS, 2)), 'director': rnd.choice(DIRECTORS),
+                     'actors': ' / '.join(rnd.sample(DIRECTORS, 3)), 'genre': rnd.choice(GENRES),
+                     'release_year': rnd.randint(1950, 2024), 'description': '一部关于电影的电影。'}
+                    for i in movie_ids])
+
+    reviews = []
+    for user_id in user_ids:
+        for movie_id in set(rnd.choices(movie_ids, weights=movie_weights, k=scale.reviews_per_user)):
+            reviews.append({'user_id': user_id, 'movie_id': movie_id, 'rating': rnd.randint(1, 5),
+                            'review_text': '值得一看', 'created_at': now - timedelta(seconds=rnd.randint(0, 10 ** 7))})
+    _insert(MovieReview, reviews)
+
+    edges = []
+    for user_id in user_ids:
+        for friend_id in set(rnd.choices(user_ids, weights=user_weights, k=scale.friends_per_user)) - {user_id}:
+            edges.append({'user_id': user_id, 'friend_id': friend_id})
+    _insert(Friendship, edges)
+
+    _insert(Log, [{'user_id': user_id, 'content': f'日志 {n}', 'visible': rnd.random() > 0.1,
+                   'created_at': now - timedelta(seconds=rnd.randint(0, 10 ** 7))}
+                  for user_id in user_ids for n in range(scale.logs_per_user)])
+    # 相当于所有 fanout_log 任务已执行
+    db.session.execute(insert(TimelineEntry).from_select(
+        ['user_id', 'log_id', 'author_id', 'created_at'],
+        select(Friendship.user_id, Log.id, Log.user_id, Log.created_at)
+        .join(Friendship, Friendship.friend_id == Log.user_id).where(Log.visible == True)))
+
+    registrations = []
+    events = []
+    for event_id in range(1, scale.events + 1):
+        attendees = rnd.sample(user_ids, min(scale.registrations_per_event, scale.users))
+        capacity = max(1, int(len(attendees) * rnd.uniform(0.8, 1.5)))
+        seated = min(capacity, len(attendees))
+        events.append({'id': event_id, 'title': f'放映会 {event_id}', 'movie_id': rnd.choice(movie_ids),
+                       'event_type': 'screening', 'event_date': now + timedelta(days=rnd.randint(-30, 60)),
+                       'location': '小剧场', 'max_participants': capacity, 'current_participants': seated,
+                       'status': 'upcoming'})
+        registrations += [{'user_id': u, 'event_id': event_id,
+                           'status': 'registered' if n < seated else 'waitlisted'}
+                          for n, u in enumerate(attendees)]
+    _insert(MovieEvent, events)
+    _insert(EventRegistration, registrations)
+
+    _insert(News, [{'title': f'新闻 {i}', 'content': '社团动态。' * 20, 'category': rnd.choice(NEWS_CATEGORIES),
+                    'created_at': now - timedelta(hours=i)} for i in range(scale.news)])
+    db.session.commit()
+
+    search.rebuild_index()
+    ratings.rebuild_movie_stats()
+    site_stats.rebuild_counters()
+    rankings.rebuild()
+    return {model.__tablename__: db.session.query(model).count()
+            for model in (User, Movie, MovieReview, Friendship, Log, TimelineEntry, MovieEvent,
+                          EventRegistration, News)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True, help='输出的 SQLite 文件（必须不存在）')
+    Scale.add_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.out):
+        parser.error(f'{args.out} 已存在')
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.out)
+    os.environ.setdefault('TASK_WORKERS', '0')
+    from app import app
+
+    started = time.perf_counter()
+    with app.app_context():
+        counts = populate(Scale.from_args(args))
+    print(f'已生成 {args.out}（{time.perf_counter() - started:.1f}s）: {counts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""性能回归套件：各蓝图热点接口的微基准与并发压测，结果输出为 JSON
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/perf_suite.py --output before.json
+    python benchmarks/perf_suite.py --output after.json --compare before.json
+    python benchmarks/perf_suite.py --db /tmp/bench.db --driver wsgi --threads 16
+
+未指定 --db 时用 datagen 在临时目录生成数据（规模参数同 datagen.py）。
+微基准逐个接口串行请求，统计 p50/p95/p99；压测按接口混合并发请求，统计吞吐量与延迟分布。
+--driver client 使用 Flask 测试客户端（不含网络开销），wsgi 启动本地 WSGI 服务经 HTTP 请求。
+--compare 与旧结果比较，p50 变慢超过 --threshold 时以非零状态码退出。
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import PASSWORD, Scale, populate
+
+SEARCH_TERMS = ['星际', '穿越', '诺兰', '千与千寻', '王家卫', '西游', '救赎', 'Kubrick']
+
+
+def summarize(samples_ms):
+    samples = sorted(samples_ms)
+
+    def pick(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))], 3)
+
+    return {'count': len(samples), 'mean': round(statistics.fmean(samples), 3),
+            'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(samples[-1], 3)}
+
+
+def endpoints(counts, rnd):
+    """接口名 -> 生成 URL 的函数；电影、用户按热门度偏斜抽取"""
+    def skewed(n):
+        return min(n, int(rnd.paretovariate(1.2)))
+
+    return {
+        'movie.search': lambda: f'/movie/search?q={quote(rnd.choice(SEARCH_TERMS))}',
+        'movie.movie_detail': lambda: f'/movie/movie/{skewed(counts["movie"])}',
+        'dashboard': lambda: '/dashboard',
+        'user.get_users': lambda: '/user/users',
+        'movie.event_detail': lambda: f'/movie/event/{rnd.randint(1, counts["movie_event"])}',
+        'public.news': lambda: '/public/news',
+    }
+
+
+# --- 请求驱动 ---
+class ClientDriver:
+    """Flask 测试客户端，每个线程一个已登录的客户端"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self, username):
+        client = self.app.test_client()
+        resp = client.post('/user/login', json={'username': username, 'password': PASSWORD})
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        return client
+
+    @staticmethod
+    def get(client, url):
+        resp = client.get(url, headers={'Accept': 'application/json'})
+        resp.close()
+        return resp.status_code
+
+
+class WSGIDriver:
+    """在后台线程启动多线程 WSGI 服务，通过 HTTP 长连接请求"""
+
+    def __init__(self, app):
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self, username):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        body = json.dumps({'username': username, 'password': PASSWORD})
+        conn.request('POST', '/user/login', body, {'Content-Type': 'application/json'})
+        resp = conn.getresponse()
+        resp.read()
+        assert resp.status == 200
+        cookie = resp.getheader('Set-Cookie').split(';', 1)[0]
+        conn.close()
+        return {'cookie': cookie, 'conn': http.client.HTTPConnection('127.0.0.1', self.port)}
+
+    @staticmethod
+    def get(client, url):
+        client['conn'].request('GET', url, headers={'Cookie': client['cookie'], 'Accept': 'application/json'})
+        resp = client['conn'].getresponse()
+        resp.read()
+        return resp.status
+
+
+def micro(driver, urls, repeat, username):
+    client = driver.session(username)
+    results = {}
+    for name, make_url in urls.items():
+        for _ in range(min(20, repeat)):  # 预热
+            driver.get(client, make_url())
+        samples, errors = [], 0
+        for _ in range(repeat):
+            url = make_url()
+            t0 = time.perf_counter()
+            status = driver.get(client, url)
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += status >= 400
+        results[name] = {**summarize(samples), 'errors': errors}
+    return results
+
+
+def load(driver, urls, threads, duration, n_users, seed):
+    names = list(urls)
+    rnd = random.Random(seed)
+    clients = [driver.session(f'user{rnd.randint(1, n_users)}') for _ in range(threads)]
+    per_thread = []
+
+    def worker(index, deadline):
+        rnd = random.Random(seed + index)
+        samples, errors = [], 0
+        while time.perf_counter() < deadline:
+            url = urls[rnd.choice(names)]()
+            t0 = time.perf_counter()
+            status = driver.get(clients[index], url)
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += status >= 400
+        per_thread.append((samples, errors))
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i, started + duration)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    samples = [s for thread_samples, _ in per_thread for s in thread_samples]
+    return {'threads': threads, 'seconds': round(elapsed, 2),
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'errors': sum(e for _, e in per_thread), **summarize(samples)}
+
+
+def compare(current, baseline_path, threshold):
+    """打印与旧结果的 p50 对比，返回是否有接口变慢超过阈值"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressed = False
+    print(f'\n对比 {baseline_path}（{baseline.get("commit")}）')
+    print(f'{"接口":<22} {"旧 p50":>10} {"新 p50":>10} {"变化":>8}')
+    for name, result in current['micro'].items():
+        old = baseline.get('micro', {}).get(name)
+        if not old:
+            continue
+        change = result['p50'] / old['p50'] - 1 if old['p50'] else 0
+        flag = ' !' if change > threshold else ''
+        regressed = regressed or bool(flag)
+        print(f'{name:<22} {old["p50"]:>10} {result["p50"]:>10} {change:>+8.1%}{flag}')
+    if 'load' in baseline and 'load' in current:
+        print(f'{"压测吞吐量 (rps)":<22} {baseline["load"]["throughput_rps"]:>10} '
+              f'{current["load"]["throughput_rps"]:>10}')
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='已有数据库（如 datagen.py 生成的）；默认临时生成')
+    parser.add_argument('--driver', choices=['client', 'wsgi'], default='client')
+    parser.add_argument('--repeat', type=int, default=200, help='微基准每个接口的请求数')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='压测秒数，0 表示跳过')
+    parser.add_argument('--cache', default='null', help='CACHE_BACKEND（默认 null，测量未缓存的开销）')
+    parser.add_argument('--output', help='结果 JSON 文件，默认打印到标准输出')
+    parser.add_argument('--compare', help='旧结果 JSON，对比 p50')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 变慢超过该比例视为回归')
+    Scale.add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp.name, 'perf.db')
+    generate = not os.path.exists(db_path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['TASK_WORKERS'] = '0'
+    os.environ['CACHE_BACKEND'] = args.cache
+
+    from jinja2 import ChoiceLoader, DictLoader
+    from app import app
+    from models import db, Movie, MovieEvent, User
+
+    # 仓库中缺少的模板用空模板代替
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader({'event_detail.html': ''})])
+    scale = Scale.from_args(args)
+    with app.app_context():
+        if generate:
+            t0 = time.perf_counter()
+            populate(scale)
+            print(f'生成数据 {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+        counts = {'user': db.session.query(User).count(), 'movie': db.session.query(Movie).count(),
+                  'movie_event': db.session.query(MovieEvent).count()}
+
+    rnd = random.Random(scale.seed)
+    urls = endpoints(counts, rnd)
+    driver = ClientDriver(app) if args.driver == 'client' else WSGIDriver(app)
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'driver': args.driver,
+        'cache': args.cache,
+        'rows': counts,
+        'micro': micro(driver, urls, args.repeat, 'user2'),
+    }
+    if args.duration:
+        result['load'] = load(driver, urls, args.threads, args.duration, counts['user'], scale.seed)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare and compare(result, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""SQL 语句计数检查：确认各页面的查询次数不随好友/参与者数量增长
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/query_counts.py --fanout 200
+
+使用临时数据库，通过 SQLAlchemy 引擎事件统计每个请求执行的语句数，
+超过上限时以非零状态码退出。
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'query_counts.db')
+# 统计期间不希望后台任务线程轮询数据库
+os.environ['TASK_WORKERS'] = '0'
+
+from jinja2 import ChoiceLoader, DictLoader
+from sqlalchemy import event
+
+from app import app
+from models import db, User, Friendship, Log, MovieEvent, EventRegistration, Movie, MovieReview, News
+import favorites
+import rankings
+from ratings import rebuild_movie_stats
+
+# 仓库中缺少的模板用空模板代替，只统计查询次数
+app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader({'event_detail.html': ''})])
+
+# 每个请求允许的最大语句数（与数据量无关）
+LIMITS = {
+    '/dashboard': 4,
+    '/user/friends': 2,
+    '/user/users': 2,
+    '/user/feed': 3,
+    '/movie/event/{event_id}': 4,
+    # 1 次分页 + 每种收藏类型（日志、电影、新闻）各 1 次
+    '/user/collections': 4,
+    # 排行榜按名次读取物化结果，一次主键范围查询
+    '/movie/trending': 1,
+    '/movie/top?window=all': 1,
+}
+
+
+class QueryCounter:
+    """在 with 块内统计引擎执行的 SQL 语句"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def seed(fanout):
+    users = [User(username=f'user{i}', password='x', nickname=f'会员{i}') for i in range(fanout + 1)]
+    db.session.add_all(users)
+    db.session.flush()
+    me = users[0]
+    event_obj = MovieEvent(title='放映会', max_participants=fanout + 10, current_participants=fanout)
+    db.session.add(event_obj)
+    db.session.flush()
+    for u in users[1:]:
+        db.session.add(Friendship(user_id=me.id, friend_id=u.id))
+        db.session.add(Log(user_id=me.id, content=f'日志 {u.id}'))
+        db.session.add(EventRegistration(user_id=u.id, event_id=event_obj.id))
+    movies = [Movie(title=f'电影 {i}') for i in range(fanout)]
+    news = [News(title=f'新闻 {i}') for i in range(fanout)]
+    db.session.add_all(movies + news)
+    db.session.flush()
+    logs = Log.query.filter_by(user_id=me.id).all()
+    favorites.collect(me.id, [item for triple in zip(logs, movies, news)
+                              for item in zip(('log', 'movie', 'news'), (o.id for o in triple))])
+    db.session.add_all(MovieReview(user_id=u.id, movie_id=m.id, rating=1 + u.id % 5)
+                       for u in users[1:] for m in movies[:5])
+    db.session.commit()
+    rebuild_movie_stats()
+    rankings.refresh()
+    return me.id, event_obj.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fanout', type=int, default=100, help='好友/日志/报名人数')
+    args = parser.parse_args()
+
+    with app.app_context():
+        user_id, event_id = seed(args.fanout)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    failed = False
+    for path, limit in LIMITS.items():
+        url = path.format(event_id=event_id)
+        with QueryCounter(engine) as counter:
+            resp = client.get(url, headers={'Accept': 'application/json'})
+        ok = resp.status_code < 400 and counter.count <= limit
+        failed = failed or not ok
+        print(f'{"OK " if ok else "FAIL"} {url:<24} status={resp.status_code} queries={counter.count} limit={limit}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""EXPLAIN QUERY PLAN 回归检查：确认热点查询都命中索引
+
+用法（在 python/ 目录下运行）:
+    python benchmarks/query_plans.py
+
+在临时数据库上执行迁移后，对每个热点查询取 SQLite 查询计划，
+出现对目标表的全表扫描（SCAN 且未使用索引）即视为失败，以非零状态码退出。
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'query_plans.db')
+# 统计期间不希望后台任务线程轮询数据库
+os.environ['TASK_WORKERS'] = '0'
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import app
+from models import db, User, Friendship, Log, Photo, MovieReview, EventRegistration, MovieEvent, Collection, \
+    CollectCount, Movie, MovieRanking
+from pagination import encode_cursor, keyset_query
+
+
+def hot_queries():
+    cursor = encode_cursor(datetime(2024, 1, 1), 100)
+    return {
+        'friendship(user_id, friend_id)': Friendship.query.filter_by(user_id=1, friend_id=2),
+        'friendship(user_id) 好友列表': Friendship.query.filter_by(user_id=1),
+        'log(user_id, created_at)': Log.query.filter_by(user_id=1).order_by(Log.created_at.desc(), Log.id.desc()),
+        'log(user_id, visible, created_at) 游标': keyset_query(
+            Log.query.filter_by(user_id=1, visible=True), Log.created_at, Log.id, cursor),
+        'photo(user_id, uploaded_at)': Photo.query.filter_by(user_id=1)
+            .order_by(Photo.uploaded_at.desc(), Photo.id.desc()),
+        'movie_review(movie_id, created_at)': MovieReview.query.filter_by(movie_id=1)
+            .order_by(MovieReview.created_at.desc()),
+        'movie_review(user_id, movie_id)': MovieReview.query.filter_by(user_id=1, movie_id=1),
+        'event_registration(event_id)': EventRegistration.query.filter_by(event_id=1),
+        'event_registration(user_id, event_id)': EventRegistration.query.filter_by(user_id=1, event_id=1),
+        'movie_event(status, event_date)': MovieEvent.query.filter_by(status='upcoming')
+            .order_by(MovieEvent.event_date),
+        'collection(user_id, item_type, item_id)': Collection.query.filter_by(user_id=1, item_type='movie', item_id=1),
+        'collection(user_id, created_at, id) 游标': keyset_query(
+            Collection.query.filter_by(user_id=1), Collection.created_at, Collection.id, cursor),
+        'collect_count(item_type, count)': CollectCount.query.filter(CollectCount.item_type == 'movie')
+            .order_by(CollectCount.count.desc()),
+        'movie_ranking(board, rank)': MovieRanking.query.filter(MovieRanking.board == 'trending',
+                                                                MovieRanking.rank <= 20).order_by(MovieRanking.rank),
+        'movie_review(id) 水位区间': MovieReview.query.filter(MovieReview.id > 100, MovieReview.id <= 200),
+        'movie(created_at, id) 管理列表游标': keyset_query(Movie.query, Movie.created_at, Movie.id, cursor),
+        'movie(created_at, id) 空时间段游标': keyset_query(Movie.query, Movie.created_at, Movie.id,
+                                                     encode_cursor(None, 100)),
+        'movie(title, release_year) 选择器前缀': Movie.query.filter(Movie.title >= '星际', Movie.title < '星际\U0010ffff')
+            .order_by(Movie.title, Movie.release_year),
+        'user(join_date, id) 游标': keyset_query(User.query, User.join_date, User.id, cursor),
+    }
+
+
+def plan_for(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+    return [r[-1] for r in rows]
+
+
+def main():
+    failed = False
+    with app.app_context():
+        for name, query in hot_queries().items():
+            plan = plan_for(query)
+            full_scan = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+            ok = not full_scan
+            failed = failed or not ok
+            print(f'{"OK " if ok else "FAIL"} {name}')
+            for step in plan:
+                print(f'       {step}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""批量写入辅助
+
+批量接口一次请求处理多个操作，在同一事务内用一条 ``INSERT ... ON CONFLICT DO NOTHING RETURNING``
+写入，由唯一索引去重，不再先查询再插入（两次往返，且并发时会产生重复）。
+RETURNING 只返回真正插入的行，据此给每个操作返回结果。
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db
+
+# 单个批量请求最多包含的操作数
+MAX_OPS = 100
+
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def insert_ignore(model, rows, keys):
+    """插入 rows（字典列表），与唯一索引冲突的行跳过；返回实际插入行的 keys 列值（元组列表）"""
+    if not rows:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f'{dialect} 不支持 ON CONFLICT DO NOTHING')
+    stmt = _INSERTS[dialect](model).on_conflict_do_nothing() \
+        .returning(*[getattr(model, k) for k in keys])
+    return [tuple(row) for row in db.session.execute(stmt, rows)]
+
+
+def _upsert(model, keys, rows, connection, set_fn):
+    executor = db.session if connection is None else connection
+    dialect = (db.session.get_bind() if connection is None else connection).dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f'{dialect} 不支持 ON CONFLICT DO UPDATE')
+    stmt = _INSERTS[dialect](model)
+    columns = [c for c in rows[0] if c not in keys]
+    stmt = stmt.on_conflict_do_update(index_elements=[getattr(model, k) for k in keys],
+                                      set_={c: set_fn(getattr(model, c), stmt.excluded[c]) for c in columns})
+    executor.execute(stmt, rows)
+
+
+def add_counts(model, keys, rows, connection=None):
+    """按主键累加计数：INSERT ... ON CONFLICT (keys) DO UPDATE SET c = c + excluded.c
+
+    rows 为字典列表，除 keys 外的列都是增量（各行的列相同），一条语句写入全部行。
+    在 flush 事件中调用时传入事件的 connection，直接在该连接上执行。
+    """
+    if rows:
+        _upsert(model, keys, rows, connection, lambda current, new: current + new)
+
+
+def upsert(model, keys, rows, connection=None):
+    """按主键插入或覆盖：INSERT ... ON CONFLICT (keys) DO UPDATE SET c = excluded.c，参数同 add_counts"""
+    if rows:
+        _upsert(model, keys, rows, connection, lambda current, new: new)
+
+
+def parse_ops(data, ops=('add', 'remove'), key='ops'):
+    """校验批量请求体 ``{"ops": [{"op": ..., ...}, ...]}``，返回操作列表，不合法时抛出 ValueError"""
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'{key} 应为非空数组')
+    if len(items) > MAX_OPS:
+        raise ValueError(f'单次最多 {MAX_OPS} 个操作')
+    for item in items:
+        if not isinstance(item, dict) or ('op' in item and item['op'] not in ops):
+            raise ValueError(f'操作应为对象，op 取值 {"/".join(ops)}')
+    return items
+
+
+def split_ops(ops, key_of):
+    """按对象拆分增删操作
+
+    key_of(op) 返回 (对象键, 错误结果)，对象无效时键为 None、错误结果如 ``not_found``。
+    同一对象在一批中只处理第一次出现的操作，之后的结果为 ``duplicate``。
+    返回 (entries, adds, removes)：entries 与 ops 一一对应，为 (op, 键, 已确定的结果或 None)。
+    """
+    entries, adds, removes, seen = [], [], [], set()
+    for op in ops:
+        key, error = key_of(op)
+        if key is None or key in seen:
+            entries.append((op, key, error or 'duplicate'))
+            continue
+        seen.add(key)
+        (removes if op.get('op') == 'remove' else adds).append(key)
+        entries.append((op, key, None))
+    return entries, adds, removes
+
+
+def op_results(entries, created, removed):
+    """按执行结果补全每个操作的结果：created / exists / removed / missing"""
+    results = []
+    for op, key, result in entries:
+        if result is None and op.get('op') == 'remove':
+            result = 'removed' if key in removed else 'missing'
+        elif result is None:
+            result = 'created' if key in created else 'exists'
+        results.append(dict(op, result=result))
+    return results
@@ -0,0 +1,279 @@
+"""响应与查询缓存
+
+后端可插拔：
+    MemoryCache  进程内 LRU + TTL（默认）
+    RedisCache   任意 Redis 兼容客户端（redis.Redis、测试用的 LocalRedis 等）
+
+失效采用“命名空间版本号”：缓存键里带上所属命名空间的当前版本标记，
+写操作提交后调用 ``invalidate('movies')`` 换一个新标记，旧键自然失效并由 LRU/TTL 淘汰。
+版本标记本身被淘汰时也会生成新标记，不会误用旧缓存。
+
+配置项（app.config / 环境变量）:
+    CACHE_BACKEND          memory / redis / null（默认 memory）
+    CACHE_REDIS_URL        redis 后端地址
+    CACHE_DEFAULT_TIMEOUT  默认过期秒数（默认 300）
+    CACHE_MAX_ENTRIES      memory 后端最大条目数（默认 2048）
+"""
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate
+
+from flask import current_app, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+
+
+class MemoryCache:
+    """线程安全的进程内 LRU 缓存，条目带过期时间"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout if timeout else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Redis 兼容后端，值用 pickle 序列化"""
+
+    def __init__(self, client, prefix='assoc:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, timeout):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class LocalRedis:
+    """进程内的 Redis 替身，实现 RedisCache 用到的命令，供测试与单机开发使用"""
+
+    def __init__(self):
+        self._store = MemoryCache(max_entries=1 << 30)
+
+    def get(self, key):
+        return self._store.get(key)
+
+    def set(self, key, value, ex=None):
+        self._store.set(key, value, ex)
+
+    def delete(self, key):
+        self._store.delete(key)
+
+    def scan_iter(self, pattern):
+        prefix = pattern.rstrip('*')
+        return [k for k in list(self._store._data) if k.startswith(prefix)]
+
+
+class NullCache:
+    """关闭缓存时使用"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            bucket = self.hits if hit else self.misses
+            bucket[name] = bucket.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            result = {}
+            for name in names:
+                hits, misses = self.hits.get(name, 0), self.misses.get(name, 0)
+                result[name] = {'hits': hits, 'misses': misses,
+                                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0}
+            return result
+
+
+backend = MemoryCache()
+stats = CacheStats()
+default_timeout = 300
+
+
+def init_cache(app):
+    """按配置选择缓存后端"""
+    global backend, default_timeout
+    kind = app.config.get('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+    default_timeout = int(app.config.get('CACHE_DEFAULT_TIMEOUT', os.environ.get('CACHE_DEFAULT_TIMEOUT', 300)))
+    if kind == 'redis':
+        url = app.config.get('CACHE_REDIS_URL', os.environ.get('CACHE_REDIS_URL'))
+        if url:
+            import redis
+            backend = RedisCache(redis.Redis.from_url(url))
+        else:
+            backend = RedisCache(LocalRedis())
+    elif kind == 'null':
+        backend = NullCache()
+    else:
+        backend = MemoryCache(int(app.config.get('CACHE_MAX_ENTRIES', os.environ.get('CACHE_MAX_ENTRIES', 2048))))
+
+
+def backend_name():
+    return type(backend).__name__
+
+
+# --- 命名空间失效 ---
+def _version(namespace):
+    version = backend.get('ns:' + namespace)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        backend.set('ns:' + namespace, version, None)
+    return version
+
+
+def invalidate(*namespaces):
+    """使命名空间下的所有缓存失效，应在写操作提交后调用"""
+    for namespace in namespaces:
+        backend.set('ns:' + namespace, uuid.uuid4().hex[:12], None)
+
+
+def invalidate_on_commit(model, namespaces):
+    """模型有增删改时，在事务提交后使命名空间失效（用于没有统一写入口的数据，如新闻）"""
+    def _mark(mapper, connection, target):
+        Session.object_session(target).info.setdefault('cache_invalidate', set()).update(namespaces)
+
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, _mark)
+
+
+def invalidate_after_commit(*namespaces):
+    """当前事务提交后使命名空间失效（回滚则不失效），用于在写入函数内部登记"""
+    db.session.info.setdefault('cache_invalidate', set()).update(namespaces)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    pending = session.info.pop('cache_invalidate', None)
+    if pending:
+        invalidate(*pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('cache_invalidate', None)
+
+
+def _make_key(name, namespaces, parts):
+    versions = ','.join(f'{ns}={_version(ns)}' for ns in namespaces)
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'{name}|{versions}|{digest}'
+
+
+def cached_query(name, namespaces, timeout=None):
+    """缓存函数返回值（需可 pickle，例如计数、字典、元组行），按参数区分"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(name, namespaces, (args, sorted(kwargs.items())))
+            value = backend.get(key)
+            stats.record(name, value is not None)
+            if value is None:
+                value = fn(*args, **kwargs)
+                backend.set(key, value, timeout or default_timeout)
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_view(namespaces, timeout=None, vary=None):
+    """缓存 GET 视图的 200 响应，并附带 ETag / Last-Modified 以支持 304
+
+    namespaces 可以是列表或 ``f(**view_args) -> 列表``；vary 返回附加到缓存键的值（如当前用户角色）。
+    有待显示的 flash 消息时不读写缓存。
+    """
+    def decorator(fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return fn(*args, **kwargs)
+            spaces = namespaces(**kwargs) if callable(namespaces) else namespaces
+            parts = (request.path, sorted(request.args.items(multi=True)),
+                     request.accept_mimetypes.accept_html, vary() if vary else None)
+            key = _make_key(name, spaces, parts)
+            entry = backend.get(key)
+            stats.record(name, entry is not None)
+            if entry is None:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                entry = {
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'etag': hashlib.sha1(body).hexdigest(),
+                    'last_modified': time.time(),
+                }
+                backend.set(key, entry, timeout or default_timeout)
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(entry['etag'])
+            response.headers['Last-Modified'] = formatdate(entry['last_modified'], usegmt=True)
+            # 浏览器每次都带 If-None-Match 回来验证，内容未变时得到 304
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,332 @@
+"""电影目录批量导入/导出
+
+导入流式读取 CSV（首行为表头）或 JSONL（每行一个 JSON 对象），逐行校验并转换字段类型，
+按 (标题, 上映年份) 去重（文件内与库中已有的都跳过），每 ``BATCH_SIZE`` 行一次 executemany 插入并提交。
+批量插入不经过 ORM 事件，全文索引与电影计数器在每批提交前手动补上。
+
+导出按 id 分批读取，逐行生成 CSV/JSONL 文本，不会一次把整张表读入内存。
+
+列表页只查询模板用到的列（``only`` / ``admin_movie_page``，简介取 ``excerpt`` 摘要），
+活动表单选电影用 ``movie_options`` 按输入前缀查询，不再把整个片库发给页面。
+
+命令:
+    flask --app app import-movies movies.csv
+    flask --app app export-movies movies.jsonl
+"""
+import csv
+import io
+import json
+import os
+import re
+
+import click
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from models import db, Movie
+from cache import invalidate
+from pagination import keyset_page
+from tasks import task
+import search
+import site_stats
+
+BATCH_SIZE = 1000
+# 导入结果中最多保留的错误信息条数
+MAX_ERRORS = 100
+FORMATS = ('csv', 'jsonl')
+
+# 可导入的字段；导出时在前面加上 id
+FIELDS = ('title', 'original_title', 'director', 'actors', 'genre', 'release_year', 'country',
+          'duration', 'rating', 'poster_url', 'description', 'trailer_url')
+YEAR_RANGE = (1870, 2100)
+# 与评论一致的 5 分制（页面显示为 x/5），0 表示暂无评分
+RATING_RANGE = (0.0, 5.0)
+
+# 列表页（电影管理、活动管理）中简介摘要的长度
+EXCERPT_LENGTH = 200
+# 电影管理页每页条数与展示的字段
+ADMIN_PAGE_SIZE = 50
+ADMIN_LIST_FIELDS = ('id', 'title', 'director', 'genre', 'release_year', 'country', 'duration', 'rating')
+# 电影选择器最多返回的条数
+OPTION_LIMIT = 10
+
+_NUMBER_RE = re.compile(r'\s*(-?\d+(?:\.\d+)?)')
+# 写成 "8.5/10" 的十分制评分，导入时换算成 5 分制
+_TEN_POINT_RE = re.compile(r'/\s*10\s*$')
+
+
+def detect_format(filename, default='csv'):
+    ext = os.path.splitext(filename or '')[-1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(ext, default)
+
+
+def _text(data, field):
+    value = data.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    limit = Movie.__table__.c[field].type.length
+    if limit and len(value) > limit:
+        raise ValueError(f'{field} 超过 {limit} 个字符')
+    return value
+
+
+def _number(data, field, convert, bounds=None):
+    """数字字段：接受数字或 "142分钟"、"8.5/10" 这类带单位的字符串，取开头的数字"""
+    value = data.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f'{field} 不是数字: {value!r}')
+    if not isinstance(value, (int, float)):
+        match = _NUMBER_RE.match(str(value))
+        if not match:
+            raise ValueError(f'{field} 不是数字: {value!r}')
+        value = float(match.group(1))
+    if convert is int:
+        if value != int(value):
+            raise ValueError(f'{field} 应为整数: {value!r}')
+        value = int(value)
+    else:
+        value = float(value)
+    if bounds and not bounds[0] <= value <= bounds[1]:
+        raise ValueError(f'{field} 超出范围 {bounds[0]}-{bounds[1]}: {value}')
+    return value
+
+
+def _rating(data):
+    """评分换算为 5 分制并校验范围，没有评分时返回 0.0"""
+    rating = _number(data, 'rating', float)
+    if rating is None:
+        return 0.0
+    raw = data.get('rating')
+    if isinstance(raw, str) and _TEN_POINT_RE.search(raw):
+        rating = round(rating / 2, 1)
+    if not RATING_RANGE[0] <= rating <= RATING_RANGE[1]:
+        raise ValueError(f'rating 超出范围 {RATING_RANGE[0]}-{RATING_RANGE[1]}（十分制请写成 "8.5/10"）: {rating}')
+    return rating
+
+
+def coerce_movie(data):
+    """校验并转换一条电影数据（表单、JSON 或导入行），返回可直接写入的字段字典，不合法时抛出 ValueError"""
+    movie = {f: _text(data, f) for f in FIELDS if f not in ('release_year', 'duration', 'rating')}
+    if not movie['title']:
+        raise ValueError('缺少标题')
+    movie['release_year'] = _number(data, 'release_year', int, YEAR_RANGE)
+    duration = _number(data, 'duration', int)
+    if duration is not None and duration <= 0:
+        raise ValueError(f'duration 应为正数: {duration}')
+    movie['duration'] = duration
+    movie['rating'] = _rating(data)
+    return movie
+
+
+def read_rows(stream, fmt):
+    """逐行读取文本流，生成 (行号, 字典)；无法解析的行生成 (行号, 错误信息)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for lineno, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield lineno, f'JSON 解析失败: {e}'
+                continue
+            yield lineno, row if isinstance(row, dict) else 'JSON 行应为对象'
+
+
+class ImportResult:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def error(self, lineno, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'第 {lineno} 行: {message}')
+
+    def to_dict(self):
+        return {'read': self.read, 'inserted': self.inserted, 'duplicates': self.duplicates,
+                'invalid': self.invalid, 'errors': self.errors}
+
+
+def _insert_batch(batch, result):
+    """去掉批内与库中重复的电影后插入，并补全文索引与计数器，提交事务"""
+    rows = {}
+    for movie in batch:
+        key = (movie['title'], movie['release_year'])
+        if key in rows:
+            result.duplicates += 1
+        else:
+            rows[key] = movie
+    titles = {title for title, _ in rows}
+    for key in db.session.query(Movie.title, Movie.release_year).filter(Movie.title.in_(titles)):
+        if rows.pop(tuple(key), None) is not None:
+            result.duplicates += 1
+    if rows:
+        movies = list(rows.values())
+        # Core 语句直接 executemany，跳过 ORM 批量写入的逐行处理；RETURNING 按参数顺序返回新 id，
+        # 只为这些行补写索引（并发经 ORM 新增的电影已由模型事件建好索引）
+        ids = db.session.execute(Movie.__table__.insert().returning(Movie.id, sort_by_parameter_order=True),
+                                 movies).scalars().all()
+        search.index_movies([dict(movie, id=movie_id) for movie, movie_id in zip(movies, ids)])
+        site_stats.adjust('movies:total', len(rows))
+        result.inserted += len(rows)
+    db.session.commit()
+
+
+def import_movies(stream, fmt='csv', batch_size=BATCH_SIZE, progress=None):
+    """从文本流导入电影，返回 ImportResult；progress(result) 在每批提交后调用"""
+    if fmt not in FORMATS:
+        raise ValueError(f'不支持的格式: {fmt}')
+    result = ImportResult()
+    batch = []
+    try:
+        for lineno, row in read_rows(stream, fmt):
+            result.read += 1
+            if isinstance(row, str):
+                result.error(lineno, row)
+                continue
+            try:
+                batch.append(coerce_movie(row))
+            except ValueError as e:
+                result.error(lineno, e)
+                continue
+            if len(batch) >= batch_size:
+                _insert_batch(batch, result)
+                batch = []
+                if progress:
+                    progress(result)
+        if batch:
+            _insert_batch(batch, result)
+            if progress:
+                progress(result)
+    finally:
+        if result.inserted:
+            invalidate('movies', 'admin_stats')
+    return result
+
+
+def export_movies(fmt='csv', batch_size=BATCH_SIZE):
+    """按 id 顺序分批读取，逐块生成导出文本"""
+    if fmt not in FORMATS:
+        raise ValueError(f'不支持的格式: {fmt}')
+    columns = ('id',) + FIELDS
+    query = select(*[getattr(Movie, c) for c in columns]).order_by(Movie.id).limit(batch_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(Movie.id > last_id)).all()
+        if not rows:
+            break
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        last_id = rows[-1][0]
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# --- 列表页与选择器：只查询页面用到的列 ---
+def excerpt(column, length=EXCERPT_LENGTH):
+    """长文本列的前 length + 1 个字符（多取一个，模板据此判断是否加省略号），结果列名不变"""
+    return func.substr(column, 1, length + 1).label(column.key)
+
+
+def only(model, fields):
+    """``load_only`` 选项：ORM 对象只加载 fields 列，其余列访问时才查询"""
+    return load_only(*[getattr(model, f) for f in fields])
+
+
+def admin_movie_page(cursor=None, limit=ADMIN_PAGE_SIZE):
+    """电影管理页：按添加时间倒序取一页 (字段元组, 简介摘要)，返回 (行列表, 下一页游标)"""
+    query = db.session.query(*[getattr(Movie, f) for f in ADMIN_LIST_FIELDS], Movie.created_at,
+                             excerpt(Movie.description))
+    return keyset_page(query, Movie.created_at, Movie.id, cursor, limit)
+
+
+def movie_options(q, limit=OPTION_LIMIT):
+    """活动表单的电影选择器：标题前缀匹配（走标题索引），不足 limit 条时用全文检索补充
+
+    返回 [{'id', 'title', 'release_year'}]；q 为空时返回空列表。
+    """
+    q = (q or '').strip()
+    if not q:
+        return []
+    columns = (Movie.id, Movie.title, Movie.release_year)
+    # 前缀区间 [q, q + U+10FFFF)：二进制排序下等价于 LIKE 'q%'，且可用 ix_movie_title_year
+    rows = db.session.execute(select(*columns).where(Movie.title >= q, Movie.title < q + '\U0010ffff')
+                              .order_by(Movie.title, Movie.release_year).limit(limit)).all()
+    if len(rows) < limit:
+        seen = {r.id for r in rows}
+        stmt = search.search_statement(q, columns=columns).limit(limit + len(rows))
+        rows += [r for r in db.session.execute(stmt) if r.id not in seen][:limit - len(rows)]
+    return [r._asdict() for r in rows]
+
+
+def import_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'imports')
+
+
+def _remove_upload(path, fmt):
+    """导入任务最终失败后删除上传的文件"""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@task('import_movies', on_failure=_remove_upload)
+def import_movies_file(path, fmt):
+    """后台导入已上传的文件；重试时已导入的行按去重规则跳过，成功后删除文件"""
+    def log_progress(result):
+        current_app.logger.info('导入 %s: 已读 %d 行，新增 %d', os.path.basename(path), result.read, result.inserted)
+
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        result = import_movies(f, fmt, progress=log_progress)
+    os.remove(path)
+    return result.to_dict()
+
+
+def init_catalog(app):
+    @app.cli.command('import-movies')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='默认按扩展名判断')
+    @click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+    def import_movies_command(path, fmt, batch_size):
+        """从 CSV/JSONL 文件批量导入电影"""
+        def report(result):
+            print(f'\r已读 {result.read} 行，新增 {result.inserted}，重复 {result.duplicates}，'
+                  f'无效 {result.invalid}', end='', flush=True)
+
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            result = import_movies(f, fmt or detect_format(path), batch_size, progress=report)
+        report(result)
+        print()
+        for message in result.errors:
+            print(message)
+
+    @app.cli.command('export-movies')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='默认按扩展名判断')
+    def export_movies_command(path, fmt):
+        """把电影目录导出为 CSV/JSONL 文件"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in export_movies(fmt or detect_format(path)):
+                f.write(chunk)
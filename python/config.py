@@ -0,0 +1,80 @@
+"""应用配置
+
+``create_app(config)`` 的 config 可以是配置名、配置类或字典；未指定时按环境变量 ``APP_CONFIG`` 选择
+（development / production / testing，默认 development）。字典在所选配置的基础上覆盖。
+各子系统的其它配置项（TASK_WORKERS、CACHE_BACKEND 等）未在这里设置时仍读取同名环境变量。
+
+环境变量（均可选）:
+    APP_CONFIG      配置名
+    SECRET_KEY      会话签名密钥，生产环境必须设置
+    AUTO_MIGRATE    启动时建表并执行迁移（production 默认 0，部署前执行 ``flask --app app db-upgrade``）
+    BLUEPRINTS      只注册列出的蓝图，逗号分隔（如 ``public,movie``），默认全部
+    MAX_UPLOAD_MB   单次请求（上传）大小上限（默认 16）
+"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SECRET_KEY = 'your_secret_key'
+
+
+def _env_flag(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else value.lower() in ('1', 'true', 'yes')
+
+
+def _env_list(name):
+    value = os.environ.get(name)
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+class Config:
+    # 禁止追踪对象修改，提高性能
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 用于session加密的密钥
+    SECRET_KEY = os.environ.get('SECRET_KEY', DEFAULT_SECRET_KEY)
+    # 文件上传目录
+    UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
+    # 单次请求（上传）大小上限
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
+    # 启动时建表、执行迁移与派生数据回填；多进程部署时关闭，由部署脚本执行一次 db-upgrade
+    AUTO_MIGRATE = _env_flag('AUTO_MIGRATE', True)
+    # 注册的蓝图名，None 表示全部（见 app.BLUEPRINTS）
+    BLUEPRINTS = _env_list('BLUEPRINTS')
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    # 不使用默认密钥，未设置环境变量时 create_app 报错
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    AUTO_MIGRATE = _env_flag('AUTO_MIGRATE', False)
+
+
+class TestingConfig(Config):
+    TESTING = True
+    # 内存数据库，每个应用实例独立
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    AUTO_MIGRATE = True
+    TASK_WORKERS = 0
+    SESSION_BACKEND = 'memory'
+    SESSION_SWEEP_INTERVAL = 0
+    RANKING_REFRESH_INTERVAL = 0
+    CACHE_BACKEND = 'null'
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def get_config(name=None):
+    """按名称取配置类，未知名称抛出 ValueError"""
+    name = name or os.environ.get('APP_CONFIG', 'development')
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f'未知配置: {name}（可选 {", ".join(CONFIGS)}）') from None
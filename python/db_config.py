@@ -0,0 +1,79 @@
+"""数据库连接配置
+
+从环境变量读取数据库地址与连接池参数；使用 SQLite 时在每个新连接上设置
+WAL、synchronous 等 PRAGMA，让读写可以并发、写入不因回滚日志而串行阻塞。
+
+环境变量（均可选）:
+    DATABASE_URL            数据库地址，默认 python/association.db，可换成 postgresql:// 等服务端数据库
+    DB_POOL_SIZE            连接池常驻连接数（默认 5）
+    DB_MAX_OVERFLOW         超出常驻数后允许临时新建的连接数（默认 10）
+    DB_POOL_TIMEOUT         等待空闲连接的秒数（默认 30）
+    DB_POOL_RECYCLE         连接最长复用秒数，服务端数据库建议设置（默认不回收）
+    SQLITE_TUNING           设为 0 时不设置下列 PRAGMA（用于对比测试）
+    SQLITE_BUSY_TIMEOUT_MS  写锁等待毫秒数（默认 5000）
+    SQLITE_CACHE_SIZE_KB    页缓存大小 KB（默认 65536，即 64MB）
+    SQLITE_MMAP_SIZE        内存映射字节数（默认 268435456，即 256MB）
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'association.db')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def sqlite_pragmas():
+    """每个 SQLite 连接建立时执行的 PRAGMA（按顺序）"""
+    if os.environ.get('SQLITE_TUNING', '1') == '0':
+        return []
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        # 负数表示以 KB 为单位
+        ('cache_size', -_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+        ('mmap_size', _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def configure_database(app):
+    """把数据库地址与引擎参数写入 app.config，需在 db.init_app 之前调用"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('DATABASE_URL') \
+        or 'sqlite:///' + DEFAULT_SQLITE_PATH
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    url = make_url(uri)
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    if not in_memory:
+        # 内存库使用单连接池，不支持以下参数
+        options.setdefault('pool_size', _env_int('DB_POOL_SIZE', 5))
+        options.setdefault('max_overflow', _env_int('DB_MAX_OVERFLOW', 10))
+        options.setdefault('pool_timeout', _env_int('DB_POOL_TIMEOUT', 30))
+        options.setdefault('pool_recycle', _env_int('DB_POOL_RECYCLE', -1))
+    options.setdefault('pool_pre_ping', url.get_backend_name() != 'sqlite')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_database(db):
+    """在应用上下文中为 SQLite 引擎注册连接事件，设置 PRAGMA"""
+    install_sqlite_pragmas(db.engine)
+
+
+def install_sqlite_pragmas(engine):
+    """为引擎的新连接设置 PRAGMA（非 SQLite 时忽略）；异步引擎传入 ``engine.sync_engine``"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
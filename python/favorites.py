@@ -0,0 +1,142 @@
+"""收藏
+
+``collection`` 表保存 (user_id, item_type, item_id)，三者唯一；item_type 对应的表见 ``ITEM_MODELS``。
+收藏/取消收藏都支持批量：每种类型一条 IN 查询校验对象是否存在，再用一条
+``INSERT ... ON CONFLICT DO NOTHING`` / ``DELETE ... RETURNING`` 写入，
+并在同一事务内增减 ``collect_count`` 计数，“最多收藏”排行只读计数表。
+
+列表先按 (created_at, id) 游标取一页 (item_type, item_id)，再按类型分组、每种类型一条 IN 查询
+取出展示字段，查询次数为 1 + 本页出现的类型数，与收藏数量无关。
+"""
+from sqlalchemy import delete, func, insert, or_, select, tuple_
+
+from models import db, Collection, CollectCount, Log, Movie, News
+from bulk import add_counts, insert_ignore
+from cache import invalidate_after_commit
+from migrations import after_upgrade
+from pagination import keyset_page
+
+ITEM_MODELS = {'news': News, 'log': Log, 'movie': Movie}
+# 收藏列表与排行中各类对象返回的字段
+ITEM_FIELDS = {
+    'news': ('id', 'title', 'category', 'created_at'),
+    'log': ('id', 'user_id', 'content', 'created_at'),
+    'movie': ('id', 'title', 'director', 'genre', 'release_year', 'rating', 'poster_url'),
+}
+
+
+def namespace(user_id):
+    """某用户收藏列表的缓存命名空间"""
+    return f'collections:{user_id}'
+
+
+def _group(items):
+    by_type = {}
+    for item_type, item_id in items:
+        if item_type in ITEM_MODELS:
+            by_type.setdefault(item_type, set()).add(item_id)
+    return by_type
+
+
+def _select(item_type, columns, ids, user_id):
+    model = ITEM_MODELS[item_type]
+    stmt = select(*[getattr(model, c) for c in columns]).where(model.id.in_(ids))
+    if model is Log:
+        # 隐藏的日志只有作者本人可见
+        stmt = stmt.where(or_(Log.visible == True, Log.user_id == user_id))
+    return stmt
+
+
+def existing_items(user_id, items):
+    """返回 items（(item_type, item_id) 序列）中存在且当前用户可见的对象集合，每种类型一次查询"""
+    found = set()
+    for item_type, ids in _group(items).items():
+        found.update((item_type, item_id) for item_id in db.session.scalars(_select(item_type, ('id',), ids, user_id)))
+    return found
+
+
+def hydrate(user_id, items):
+    """按类型分组批量取出展示字段，返回 {(item_type, item_id): 字典}；不存在或不可见的对象不在结果中"""
+    result = {}
+    for item_type, ids in _group(items).items():
+        for row in db.session.execute(_select(item_type, ITEM_FIELDS[item_type], ids, user_id)):
+            result[(item_type, row.id)] = row._asdict()
+    return result
+
+
+def _count(items, delta):
+    add_counts(CollectCount, ('item_type', 'item_id'),
+               [{'item_type': t, 'item_id': i, 'count': delta} for t, i in items])
+
+
+def collect(user_id, items):
+    """批量收藏，已收藏的跳过，返回新收藏的 (item_type, item_id) 集合；调用方负责提交"""
+    rows = [{'user_id': user_id, 'item_type': t, 'item_id': i} for t, i in items]
+    created = set(insert_ignore(Collection, rows, ('item_type', 'item_id')))
+    if created:
+        _count(created, 1)
+        invalidate_after_commit(namespace(user_id))
+    return created
+
+
+def uncollect(user_id, items):
+    """批量取消收藏，返回被删除的 (item_type, item_id) 集合；调用方负责提交"""
+    if not items:
+        return set()
+    removed = {tuple(row) for row in db.session.execute(
+        delete(Collection)
+        .where(Collection.user_id == user_id, tuple_(Collection.item_type, Collection.item_id).in_(list(items)))
+        .returning(Collection.item_type, Collection.item_id).execution_options(synchronize_session=False))}
+    if removed:
+        _count(removed, -1)
+        invalidate_after_commit(namespace(user_id))
+    return removed
+
+
+def list_collections(user_id, item_type=None, cursor=None, limit=20):
+    """按收藏时间倒序取一页收藏并补全对象字段，返回 (列表, 下一页游标)；已删除的对象 item 为 None"""
+    query = db.session.query(Collection.id, Collection.item_type, Collection.item_id, Collection.created_at) \
+        .filter(Collection.user_id == user_id)
+    if item_type:
+        query = query.filter(Collection.item_type == item_type)
+    rows, next_cursor = keyset_page(query, Collection.created_at, Collection.id, cursor, limit)
+    items = hydrate(user_id, [(r.item_type, r.item_id) for r in rows])
+    return [{'item_type': r.item_type, 'item_id': r.item_id, 'collected_at': r.created_at,
+             'item': items.get((r.item_type, r.item_id))} for r in rows], next_cursor
+
+
+def most_collected(item_type, limit=20):
+    """某类对象按收藏次数排行，返回带 collect_count 的对象字典列表"""
+    rows = db.session.execute(
+        select(CollectCount.item_id, CollectCount.count)
+        .where(CollectCount.item_type == item_type, CollectCount.count > 0)
+        .order_by(CollectCount.count.desc(), CollectCount.item_id).limit(limit)).all()
+    items = hydrate(None, [(item_type, r.item_id) for r in rows])
+    return [dict(items[(item_type, r.item_id)], collect_count=r.count)
+            for r in rows if (item_type, r.item_id) in items]
+
+
+def rebuild_counts():
+    """按收藏表重算收藏计数，返回有收藏的对象数"""
+    db.session.execute(delete(CollectCount))
+    db.session.execute(insert(CollectCount).from_select(
+        ['item_type', 'item_id', 'count'],
+        select(Collection.item_type, Collection.item_id, func.count())
+        .group_by(Collection.item_type, Collection.item_id)))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(CollectCount).scalar()
+
+
+@after_upgrade
+def backfill_counts():
+    """已有收藏但计数表为空（刚升级）时回填"""
+    if not db.session.query(CollectCount.item_id).first() and db.session.query(Collection.id).first():
+        rebuild_counts()
+
+
+def init_favorites(app):
+    """注册重算命令"""
+    @app.cli.command('rebuild-collect-counts')
+    def rebuild_collect_counts_command():
+        """按收藏表重算收藏计数"""
+        print(f'已重算 {rebuild_counts()} 个对象的收藏数')
@@ -0,0 +1,104 @@
+"""好友动态（时间线）
+
+写扩散：发布可见日志后，后台任务 ``fanout_log`` 用一条 INSERT ... SELECT
+把日志写入每个关注者的 ``timeline_entry``，读取动态只需按 (user_id, created_at, log_id) 索引翻页。
+
+读扩散兜底：关注者超过 ``FANOUT_LIMIT`` 的作者不再写扩散，记入 ``feed_pull_author``（之后一直保持），
+读取时再按日志索引取这些作者的日志与时间线合并（按 log_id 去重）。
+
+关注/取消关注时补写或删除该作者的日志（``backfill_timeline`` / ``drop_timeline``）。
+"""
+import os
+
+from sqlalchemy import delete, exists, func, insert, literal, select
+from sqlalchemy.orm import joinedload
+
+from models import db, FeedPullAuthor, Friendship, Log, TimelineEntry
+from pagination import encode_cursor, keyset_rows, sort_key
+from tasks import enqueue, task
+
+# 关注者超过此数的作者改为读扩散
+FANOUT_LIMIT = 5000
+# 新关注时补写的最近日志数
+BACKFILL = 100
+
+
+def publish(log):
+    """日志写入后调用（调用方负责提交）：可见日志提交后异步写扩散"""
+    if log.visible:
+        db.session.flush()
+        enqueue('fanout_log', user_id=log.user_id, log_id=log.id)
+
+
+@task('fanout_log')
+def fanout_log(log_id):
+    """把日志写入作者所有关注者的时间线"""
+    log = db.session.get(Log, log_id)
+    if not log or not log.visible:
+        return None
+    followers = db.session.query(func.count(Friendship.id)).filter(Friendship.friend_id == log.user_id).scalar()
+    if followers > FANOUT_LIMIT:
+        if not db.session.get(FeedPullAuthor, log.user_id):
+            db.session.add(FeedPullAuthor(user_id=log.user_id))
+            db.session.commit()
+        return {'followers': followers, 'mode': 'pull'}
+    # 任务重试时跳过已写入的关注者
+    rows = select(Friendship.user_id, literal(log.id), literal(log.user_id), literal(log.created_at)) \
+        .where(Friendship.friend_id == log.user_id, Friendship.user_id.isnot(None),
+               ~exists().where(TimelineEntry.user_id == Friendship.user_id, TimelineEntry.log_id == log.id)) \
+        .distinct()
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'log_id', 'author_id', 'created_at'], rows))
+    db.session.commit()
+    return {'followers': followers, 'mode': 'push'}
+
+
+@task('backfill_timeline')
+def backfill_timeline(follower_id, author_id):
+    """新关注作者后，把作者最近的可见日志补进关注者的时间线"""
+    recent = select(literal(follower_id), Log.id, Log.user_id, Log.created_at) \
+        .where(Log.user_id == author_id, Log.visible == True,
+               ~exists().where(TimelineEntry.user_id == follower_id, TimelineEntry.log_id == Log.id)) \
+        .order_by(Log.created_at.desc(), Log.id.desc()).limit(BACKFILL)
+    db.session.execute(insert(TimelineEntry).from_select(['user_id', 'log_id', 'author_id', 'created_at'], recent))
+    db.session.commit()
+
+
+def drop_timeline(follower_id, author_id):
+    """取消关注后删除该作者在关注者时间线中的日志（调用方负责提交）"""
+    db.session.execute(delete(TimelineEntry).where(TimelineEntry.user_id == follower_id,
+                                                   TimelineEntry.author_id == author_id))
+
+
+def read_feed(user_id, cursor=None, limit=20):
+    """按 (created_at, id) 倒序取一页好友动态，返回 (日志列表, 下一页游标)"""
+    pushed = keyset_rows(db.session.query(TimelineEntry.created_at, TimelineEntry.log_id)
+                         .filter(TimelineEntry.user_id == user_id),
+                         TimelineEntry.created_at, TimelineEntry.log_id, cursor, limit + 1)
+    keys = set(map(tuple, pushed))
+    pull_authors = [a for (a,) in db.session.query(FeedPullAuthor.user_id)
+                    .join(Friendship, Friendship.friend_id == FeedPullAuthor.user_id)
+                    .filter(Friendship.user_id == user_id)]
+    if pull_authors:
+        pulled = keyset_rows(db.session.query(Log.created_at, Log.id)
+                             .filter(Log.user_id.in_(pull_authors), Log.visible == True),
+                             Log.created_at, Log.id, cursor, limit + 1)
+        keys.update(map(tuple, pulled))
+    keys = sorted(keys, key=sort_key, reverse=True)
+    next_cursor = encode_cursor(*keys[limit - 1]) if len(keys) > limit else None
+    ids = [log_id for _, log_id in keys[:limit]]
+    logs = {l.id: l for l in Log.query.options(joinedload(Log.user))
+            .filter(Log.id.in_(ids), Log.visible == True)} if ids else {}
+    return [logs[i] for i in ids if i in logs], next_cursor
+
+
+def naive_feed(user_id, limit=20):
+    """不使用时间线表：直接合并所有关注对象的日志（用于基准对比）"""
+    following = select(Friendship.friend_id).where(Friendship.user_id == user_id)
+    return Log.query.options(joinedload(Log.user)) \
+        .filter(Log.user_id.in_(following), Log.visible == True) \
+        .order_by(Log.created_at.desc(), Log.id.desc()).limit(limit).all()
+
+
+def init_feed(app):
+    global FANOUT_LIMIT
+    FANOUT_LIMIT = int(app.config.get('FEED_FANOUT_LIMIT', os.environ.get('FEED_FANOUT_LIMIT', FANOUT_LIMIT)))
@@ -0,0 +1,146 @@
+"""会员照片存储
+
+上传文件按块流式写入临时文件，同时计算 SHA-256；以哈希作为文件名存放（内容寻址），
+相同内容的照片只保存一份。缩略图/预览图由后台任务 ``process_photo`` 生成（需要 Pillow，未安装时直接使用原图）。
+
+目录结构（位于 UPLOAD_FOLDER 下）:
+    objects/<哈希前两位>/<哈希><扩展名>      原图
+    thumbs/<哈希前两位>/<哈希>_thumb.jpg     缩略图
+    thumbs/<哈希前两位>/<哈希>_preview.jpg   预览图
+
+文件名即内容哈希，永不变化，因此 /media/ 下的响应带一年的缓存头。
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import Blueprint, abort, current_app, jsonify, send_from_directory
+
+from models import db, Photo
+from tasks import task
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+CHUNK_SIZE = 64 * 1024
+# 派生图尺寸：名称 -> 最长边像素
+DERIVED_SIZES = {'thumb': 320, 'preview': 1280}
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# /media/ 路径中的目录名（哈希前两位）与文件名（哈希 + 扩展名 / 派生图后缀）
+_PREFIX_RE = re.compile(r'[0-9a-f]{2}')
+_OBJECT_RE = re.compile(r'[0-9a-f]{64}\.[a-z]+')
+_DERIVED_RE = re.compile(r'[0-9a-f]{64}_[a-z]+\.jpg')
+
+media_bp = Blueprint('media', __name__)
+
+
+def _root():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def object_path(root, sha256, ext):
+    return os.path.join(root, 'objects', sha256[:2], sha256 + ext)
+
+
+def derived_path(root, sha256, size):
+    return os.path.join(root, 'thumbs', sha256[:2], f'{sha256}_{size}.jpg')
+
+
+def store_upload(file_storage):
+    """流式保存上传文件，返回 (sha256, 扩展名, 字节数)；内容已存在时直接复用"""
+    ext = os.path.splitext(file_storage.filename or '')[-1].lower()
+    root = _root()
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        final_path = object_path(root, sha256, ext)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sha256, ext, size
+
+
+def generate_derivatives(root, sha256, ext):
+    """生成缩略图与预览图，返回原图 (宽, 高)；无 Pillow 或无法解析时返回 None"""
+    if Image is None:
+        return None
+    with Image.open(object_path(root, sha256, ext)) as img:
+        dimensions = img.size
+        img = img.convert('RGB')
+        for name, longest in DERIVED_SIZES.items():
+            target = derived_path(root, sha256, name)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            copy = img.copy()
+            copy.thumbnail((longest, longest))
+            copy.save(target, 'JPEG', quality=85, optimize=True)
+    return dimensions
+
+
+@task('process_photo')
+def process_photo(sha256, ext):
+    """后台任务：生成派生图并回写同一内容的所有照片记录"""
+    dimensions = generate_derivatives(_root(), sha256, ext)
+    if dimensions:
+        Photo.query.filter_by(sha256=sha256).update(
+            {'width': dimensions[0], 'height': dimensions[1], 'has_thumbnail': True})
+        db.session.commit()
+        return {'width': dimensions[0], 'height': dimensions[1]}
+    return None
+
+
+def init_media(app):
+    @app.errorhandler(413)
+    def _too_large(e):
+        limit = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify({'msg': f'文件过大，最大 {limit}MB'}), 413
+
+
+def _check_path(prefix, filename, pattern):
+    """目录名须是文件名哈希的前两位，否则 404（不把任意路径拼到存储目录上）"""
+    if not _PREFIX_RE.fullmatch(prefix) or not pattern.fullmatch(filename) or not filename.startswith(prefix):
+        abort(404)
+
+
+@media_bp.route('/<prefix>/<filename>')
+def original(prefix, filename):
+    _check_path(prefix, filename, _OBJECT_RE)
+    return send_from_directory(os.path.join(_root(), 'objects', prefix), filename, max_age=CACHE_MAX_AGE)
+
+
+@media_bp.route('/thumbs/<prefix>/<filename>')
+def derived(prefix, filename):
+    _check_path(prefix, filename, _DERIVED_RE)
+    return send_from_directory(os.path.join(_root(), 'thumbs', prefix), filename, max_age=CACHE_MAX_AGE)
+
+
+@media_bp.after_request
+def _immutable(response):
+    if response.status_code == 200:
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+    return response
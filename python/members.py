@@ -0,0 +1,37 @@
+"""会员申请审核后的后台任务
+
+任务需在任何进程中都已注册（app.py 启动时导入本模块），
+否则只注册了部分蓝图的进程领取到任务时会因找不到任务函数而失败。
+"""
+from datetime import datetime
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User, MemberApplication
+from cache import invalidate
+from tasks import task
+
+# 审核通过后新账号的默认密码
+DEFAULT_MEMBER_PASSWORD = '123456'
+
+
+@task('create_member_account')
+def create_member_account(application_id):
+    """为通过审核的申请创建会员账号，默认密码 123456"""
+    application = MemberApplication.query.get(application_id)
+    if not application or application.status != 'approved':
+        return None
+    existing = User.query.filter_by(username=application.username).first()
+    if existing:
+        return {'user_id': existing.id}
+    new_user = User(
+        username=application.username,
+        password=generate_password_hash(DEFAULT_MEMBER_PASSWORD),
+        role='member',
+        nickname=application.realname,
+        join_date=datetime.utcnow()
+    )
+    db.session.add(new_user)
+    db.session.commit()
+    invalidate('admin_stats')
+    return {'user_id': new_user.id}
@@ -0,0 +1,148 @@
+"""数据库版本迁移
+
+``db.create_all()`` 只会新建缺失的表，已有部署无法获得新增的列和索引。
+这里按版本号顺序执行迁移函数，已执行的版本记录在 ``schema_migration`` 表中。
+迁移函数需写成幂等的（新库由 create_all 建好后再执行一遍也不会出错）。
+
+新增迁移：在文件末尾追加一个 ``@migration(下一个版本号, '说明')`` 装饰的函数。
+建表与迁移之外的初始化（全文索引表、派生数据回填）由各模块用 ``@after_upgrade`` 注册，
+``setup_schema()`` 依次执行；配置 ``AUTO_MIGRATE`` 关闭时启动不执行，由 ``db-upgrade`` 命令执行。
+"""
+from sqlalchemy import inspect, text
+
+from models import db, SchemaMigration
+
+MIGRATIONS = []
+_after_upgrade = []
+
+
+def migration(version, description):
+    def decorator(fn):
+        assert not MIGRATIONS or version > MIGRATIONS[-1][0], '迁移版本号必须递增'
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+# --- 迁移辅助函数 ---
+def create_index(conn, name, table, columns, unique=False):
+    conn.execute(text('CREATE %sINDEX IF NOT EXISTS %s ON %s (%s)' % (
+        'UNIQUE ' if unique else '', name, table, ', '.join(columns))))
+
+
+def add_column(conn, table, column, ddl):
+    """列不存在时执行 ALTER TABLE ADD COLUMN"""
+    if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (table, column, ddl)))
+
+
+def dedupe(conn, table, columns):
+    """建唯一索引前删除重复行，保留 id 最小的一条"""
+    cols = ', '.join(columns)
+    conn.execute(text('DELETE FROM %s WHERE id NOT IN (SELECT MIN(id) FROM %s GROUP BY %s)' % (table, table, cols)))
+
+
+def current_version():
+    return db.session.query(db.func.max(SchemaMigration.version)).scalar() or 0
+
+
+def upgrade(logger=None):
+    """执行所有未执行的迁移，每个版本一个事务，返回执行的版本列表"""
+    applied = []
+    done = current_version()
+    for version, description, fn in MIGRATIONS:
+        if version <= done:
+            continue
+        with db.engine.begin() as conn:
+            fn(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(version=version, description=description))
+        if logger:
+            logger.info('数据库迁移 %s: %s', version, description)
+        applied.append(version)
+    return applied
+
+
+def after_upgrade(fn):
+    """注册建表与迁移之后执行的初始化函数（需幂等）"""
+    _after_upgrade.append(fn)
+    return fn
+
+
+def setup_schema(logger=None):
+    """建表、执行未完成的迁移并运行注册的初始化，返回执行的迁移版本列表"""
+    db.create_all()
+    applied = upgrade(logger)
+    for fn in _after_upgrade:
+        fn()
+    return applied
+
+
+def init_migrations(app):
+    """AUTO_MIGRATE 开启时建表并升级到最新版本，注册迁移相关命令"""
+    if app.config.get('AUTO_MIGRATE', True):
+        setup_schema(app.logger)
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        """建表并执行未完成的数据库迁移"""
+        applied = setup_schema()
+        print(f'已执行迁移: {applied}' if applied else '数据库已是最新版本')
+
+    @app.cli.command('db-version')
+    def db_version_command():
+        """显示当前数据库版本"""
+        print(f'当前版本 {current_version()}，最新版本 {MIGRATIONS[-1][0]}')
+
+
+# --- 迁移列表 ---
+@migration(1, '日志、照片、用户的游标分页索引')
+def _keyset_indexes(conn):
+    create_index(conn, 'ix_user_join_date_id', 'user', ['join_date', 'id'])
+    create_index(conn, 'ix_log_user_created', 'log', ['user_id', 'created_at', 'id'])
+    create_index(conn, 'ix_log_user_visible_created', 'log', ['user_id', 'visible', 'created_at', 'id'])
+    create_index(conn, 'ix_photo_user_uploaded', 'photo', ['user_id', 'uploaded_at', 'id'])
+
+
+@migration(2, '热点查询复合索引与唯一约束')
+def _hot_query_indexes(conn):
+    create_index(conn, 'ix_movie_review_movie_created', 'movie_review', ['movie_id', 'created_at'])
+    create_index(conn, 'ix_event_registration_event', 'event_registration', ['event_id'])
+    create_index(conn, 'ix_movie_event_status_date', 'movie_event', ['status', 'event_date'])
+    for name, table, columns in [
+        ('uq_friendship_user_friend', 'friendship', ['user_id', 'friend_id']),
+        ('uq_movie_review_user_movie', 'movie_review', ['user_id', 'movie_id']),
+        ('uq_event_registration_user_event', 'event_registration', ['user_id', 'event_id']),
+        ('uq_collection_user_item', 'collection', ['user_id', 'item_type', 'item_id']),
+    ]:
+        dedupe(conn, table, columns)
+        create_index(conn, name, table, columns, unique=True)
+
+
+@migration(3, '照片内容哈希、尺寸与缩略图字段')
+def _photo_media_columns(conn):
+    add_column(conn, 'photo', 'sha256', 'VARCHAR(64)')
+    add_column(conn, 'photo', 'size', 'INTEGER')
+    add_column(conn, 'photo', 'width', 'INTEGER')
+    add_column(conn, 'photo', 'height', 'INTEGER')
+    add_column(conn, 'photo', 'has_thumbnail', 'BOOLEAN DEFAULT 0')
+    create_index(conn, 'ix_photo_sha256', 'photo', ['sha256'])
+
+
+@migration(4, '好友关系反向索引')
+def _friendship_reverse_index(conn):
+    create_index(conn, 'ix_friendship_friend', 'friendship', ['friend_id'])
+
+
+@migration(5, '电影标题+年份索引（批量导入去重）')
+def _movie_title_year_index(conn):
+    create_index(conn, 'ix_movie_title_year', 'movie', ['title', 'release_year'])
+
+
+@migration(6, '收藏游标分页索引')
+def _collection_user_created_index(conn):
+    create_index(conn, 'ix_collection_user_created', 'collection', ['user_id', 'created_at', 'id'])
+
+
+@migration(7, '电影管理列表游标分页索引')
+def _movie_created_index(conn):
+    create_index(conn, 'ix_movie_created_id', 'movie', ['created_at', 'id'])
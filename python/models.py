@@ -15,6 +15,10 @@ class User(db.Model):
     favorite_directors = db.Column(db.String(256))  # 喜欢的导演
     join_date = db.Column(db.DateTime, default=datetime.utcnow)
     member_level = db.Column(db.String(16), default='bronze')  # bronze, silver, gold, platinum
+
+    __table_args__ = (
+        db.Index('ix_user_join_date_id', 'join_date', 'id'),
+    )
     # 其它字段...
 
 class Movie(db.Model):
@@ -29,10 +33,16 @@ class Movie(db.Model):
     duration = db.Column(db.Integer)  # 时长（分钟）
     rating = db.Column(db.Float, default=0.0)  # 评分
     poster_url = db.Column(db.String(256))
-    description = db.Column(db.Text)
+    # 简介只在详情页展示，默认不随对象加载（访问时再单独查询，或查询时 undefer）
+    description = db.deferred(db.Column(db.Text))
     trailer_url = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_movie_title_year', 'title', 'release_year'),
+        db.Index('ix_movie_created_id', 'created_at', 'id'),
+    )
+
 class MovieReview(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -41,10 +51,40 @@ class MovieReview(db.Model):
     review_text = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    user = db.relationship('User')
+    movie = db.relationship('Movie')
+
+    __table_args__ = (
+        db.Index('ix_movie_review_movie_created', 'movie_id', 'created_at'),
+        db.Index('uq_movie_review_user_movie', 'user_id', 'movie_id', unique=True),
+    )
+
+# 电影评分聚合，随评论增量维护，避免每次重新读取全部评论
+class MovieStats(db.Model):
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    review_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    # 1-5星各自的评论数
+    star_1 = db.Column(db.Integer, default=0, nullable=False)
+    star_2 = db.Column(db.Integer, default=0, nullable=False)
+    star_3 = db.Column(db.Integer, default=0, nullable=False)
+    star_4 = db.Column(db.Integer, default=0, nullable=False)
+    star_5 = db.Column(db.Integer, default=0, nullable=False)
+
+# 电影推荐：每部电影离线计算出的前 K 个相似电影
+class MovieNeighbor(db.Model):
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_movie_neighbor_neighbor', 'neighbor_id'),
+    )
+
 class MovieEvent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
-    description = db.Column(db.Text)
+    description = db.deferred(db.Column(db.Text))  # 同电影简介，默认不加载
     movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'))
     event_type = db.Column(db.String(32))  # screening, discussion, workshop
     event_date = db.Column(db.DateTime)
@@ -54,18 +94,61 @@ class MovieEvent(db.Model):
     status = db.Column(db.String(16), default='upcoming')  # upcoming, ongoing, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_movie_event_status_date', 'status', 'event_date'),
+    )
+
 class EventRegistration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     event_id = db.Column(db.Integer, db.ForeignKey('movie_event.id'))
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(16), default='registered')  # registered, attended, cancelled
+    status = db.Column(db.String(16), default='registered')  # registered, waitlisted, attended, cancelled
+
+    user = db.relationship('User')
+    event = db.relationship('MovieEvent')
+
+    __table_args__ = (
+        db.Index('ix_event_registration_event', 'event_id'),
+        db.Index('uq_event_registration_user_event', 'user_id', 'event_id', unique=True),
+    )
 
 class Friendship(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     friend_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    user = db.relationship('User', foreign_keys=[user_id])
+    friend = db.relationship('User', foreign_keys=[friend_id])
+
+    __table_args__ = (
+        db.Index('uq_friendship_user_friend', 'user_id', 'friend_id', unique=True),
+        db.Index('ix_friendship_friend', 'friend_id'),
+    )
+
+# 好友动态时间线：写扩散时每个关注者一行（见 feed.py）
+class TimelineEntry(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    log_id = db.Column(db.Integer, db.ForeignKey('log.id'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, nullable=False)  # 日志发布时间
+
+    __table_args__ = (
+        db.Index('ix_timeline_user_created', 'user_id', 'created_at', 'log_id'),
+        db.Index('ix_timeline_user_author', 'user_id', 'author_id'),
+    )
+
+# 关注者过多、改为读时合并日志的作者
+class FeedPullAuthor(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# 好友推荐：好友的好友，按共同好友数排序（见 social.py）
+class FriendSuggestion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    suggested_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    mutual_count = db.Column(db.Integer, nullable=False)
+
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -73,6 +156,14 @@ class Log(db.Model):
     visible = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    user = db.relationship('User')
+
+    # 支撑按 (created_at, id) 游标分页
+    __table_args__ = (
+        db.Index('ix_log_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_log_user_visible_created', 'user_id', 'visible', 'created_at', 'id'),
+    )
+
 class News(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128))
@@ -87,6 +178,29 @@ class Photo(db.Model):
     realname = db.Column(db.String(128))
     contest = db.Column(db.String(64))
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 内容寻址存储的元数据（旧照片为空，仍按 uploads/<contest>/<filename> 访问）
+    sha256 = db.Column(db.String(64))
+    size = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    has_thumbnail = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_photo_user_uploaded', 'user_id', 'uploaded_at', 'id'),
+        db.Index('ix_photo_sha256', 'sha256'),
+    )
+
+    @property
+    def url(self):
+        if self.sha256:
+            return f'/media/{self.sha256[:2]}/{self.filename}'
+        return f'/static/uploads/{self.contest}/{self.filename}'
+
+    @property
+    def thumb_url(self):
+        if self.sha256 and self.has_thumbnail:
+            return f'/media/thumbs/{self.sha256[:2]}/{self.sha256}_thumb.jpg'
+        return self.url
 
 class Collection(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -95,6 +209,46 @@ class Collection(db.Model):
     item_id = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_collection_user_item', 'user_id', 'item_type', 'item_id', unique=True),
+        # 我的收藏按 (created_at, id) 游标分页
+        db.Index('ix_collection_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+# 每个对象被收藏的次数，收藏/取消收藏时在同一事务内增减，“最多收藏”排行只读这张表
+class CollectCount(db.Model):
+    item_type = db.Column(db.String(32), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_collect_count_type_count', 'item_type', 'count'),
+    )
+
+# 排行榜：每部电影按天汇总的活动量，由 rankings.refresh 按水位增量累加，只保留最近窗口内的天
+class MovieDailyActivity(db.Model):
+    day = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD（UTC）
+    movie_id = db.Column(db.Integer, primary_key=True)
+    reviews = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    collects = db.Column(db.Integer, default=0, nullable=False)
+    registrations = db.Column(db.Integer, default=0, nullable=False)
+
+# 物化的排行榜，每个榜单按名次保存前 N 部电影，接口按 (board, rank) 主键范围读取
+class MovieRanking(db.Model):
+    board = db.Column(db.String(32), primary_key=True)  # 如 trending、top:month、most_reviewed:week
+    rank = db.Column(db.Integer, primary_key=True)
+    movie_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    review_count = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# 排行榜增量处理水位：每个数据源已汇总到的最大 id
+class RankingWatermark(db.Model):
+    source = db.Column(db.String(32), primary_key=True)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class MemberApplication(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(32), nullable=False)
@@ -103,4 +257,47 @@ class MemberApplication(db.Model):
     favorite_movies = db.Column(db.String(256))  # 喜欢的电影
     movie_experience = db.Column(db.Text)  # 电影相关经历
     status = db.Column(db.String(16), default='pending')  # pending, approved, rejected
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
+
+# 统计计数器（按角色、申请状态、活动状态、每日评论数等），随数据增删改在同一事务内增量维护
+class StatCounter(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+# 后台任务（持久化任务队列）
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text)  # JSON 参数
+    status = db.Column(db.String(16), default='queued')  # queued, running, done, failed
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # 提交任务的用户，用于查询权限
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.Text)  # JSON 结果
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)  # 重试退避：此时间之后才可执行
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_job_status_available', 'status', 'available_at', 'id'),
+    )
+
+# 服务端会话（浏览器 cookie 只保存会话 id）
+class ServerSession(db.Model):
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer)  # 登录用户，用于按用户注销全部会话
+    data = db.Column(db.Text)  # 序列化后的会话内容
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_server_session_user', 'user_id'),
+        db.Index('ix_server_session_expires', 'expires_at'),
+    )
+
+# 已执行的数据库迁移版本
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(128))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,249 @@
+"""请求性能监控
+
+每个请求记录：
+    - 按端点的耗时直方图
+    - SQL 语句数与累计数据库耗时（SQLAlchemy 引擎事件）
+    - 模板渲染耗时（Flask 模板信号）
+超过 ``SLOW_QUERY_MS`` 的语句连同 SQL 与参数写入日志（后台任务中的语句同样记录）。
+
+``/metrics`` 以 Prometheus 文本格式输出，设置 ``METRICS_TOKEN`` 后需带
+``Authorization: Bearer <token>``，否则只允许本机或管理员访问。
+
+性能分析（cProfile）：
+    - 管理员请求带 ``X-Profile: 1`` 头或 ``?_profile=1`` 参数时，响应替换为分析报告
+    - ``PROFILE_SAMPLE_RATE``（默认 0）按比例抽样分析普通请求，报告写入日志
+未开启时每个请求只多一次请求头/参数查找。
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, request, session, template_rendered, before_render_template
+from sqlalchemy import event
+
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+PROFILE_LINES = 40
+
+_current = ContextVar('request_perf', default=None)
+
+
+class Histogram:
+    """按标签分组的累积直方图（Prometheus 语义）"""
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        for label_values, (counts, total, count) in items:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {round(total, 6)}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_latency = Histogram('http_request_duration_seconds', '请求处理耗时', LATENCY_BUCKETS,
+                            ('endpoint', 'method'))
+request_total = Counter('http_requests_total', '请求数', ('endpoint', 'method', 'status'))
+request_queries = Histogram('http_request_sql_statements', '每个请求执行的 SQL 语句数', COUNT_BUCKETS,
+                            ('endpoint',))
+request_db_time = Histogram('http_request_db_seconds', '每个请求的数据库累计耗时', LATENCY_BUCKETS,
+                            ('endpoint',))
+template_time = Histogram('template_render_seconds', '模板渲染耗时', LATENCY_BUCKETS, ('template',))
+slow_queries = Counter('sql_slow_queries_total', '慢查询次数', ('endpoint',))
+REGISTRY = [request_latency, request_total, request_queries, request_db_time, template_time, slow_queries]
+
+slow_query_seconds = 0.2
+sample_rate = 0.0
+metrics_token = None
+_logger = None
+
+
+# --- SQL 计时 ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    state = _current.get()
+    if state is not None:
+        state['queries'] += 1
+        state['db_time'] += elapsed
+    if elapsed >= slow_query_seconds:
+        endpoint = state['endpoint'] if state is not None else 'background'
+        slow_queries.inc(endpoint)
+        _logger.warning('慢查询 %.1fms [%s]: %s | 参数: %.500r', elapsed * 1000, endpoint,
+                        ' '.join(statement.split()), parameters)
+
+
+def _handle_error(exception_context):
+    # 语句出错时 after_cursor_execute 不会触发，弹出开始时间避免错位
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+# --- 模板计时 ---
+def _before_render(sender, template, context, **extra):
+    state = _current.get()
+    if state is not None:
+        state['templates'].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    state = _current.get()
+    if state is not None and state['templates']:
+        template_time.observe(time.perf_counter() - state['templates'].pop(), template.name or '<string>')
+
+
+# --- 请求钩子 ---
+def _profile_requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1'
+
+
+def _is_admin():
+    # 角色在登录时写入会话（见 auth.py），无需查询 user 表
+    return session.get('role') == 'admin'
+
+
+def _start_request():
+    state = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'templates': [],
+             'endpoint': request.endpoint or 'unmatched', 'profiler': None, 'report': False}
+    state['token'] = _current.set(state)
+    if _profile_requested() and _is_admin():
+        state['report'] = True
+    elif sample_rate and random.random() < sample_rate:
+        pass
+    else:
+        return
+    state['profiler'] = cProfile.Profile()
+    state['profiler'].enable()
+
+
+def _finish_request(response):
+    state = _current.get()
+    if state is None:
+        return response
+    state['status'] = response.status_code
+    profiler = state['profiler']
+    if profiler is None:
+        return response
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    summary = (f'{request.method} {request.full_path} -> {response.status_code}，'
+               f'{time.perf_counter() - state["start"]:.3f}s，SQL {state["queries"]} 条 / {state["db_time"]:.3f}s')
+    if not state['report']:
+        _logger.info('抽样性能分析 %s\n%s', summary, out.getvalue())
+        return response
+    report = Response(summary + '\n\n' + out.getvalue(), mimetype='text/plain')
+    report.headers['X-Profiled-Status'] = str(response.status_code)
+    return report
+
+
+def _teardown_request(exc):
+    state = _current.get()
+    if state is None:
+        return
+    if state['profiler'] is not None and exc is not None:
+        state['profiler'].disable()
+    endpoint = state['endpoint']
+    request_latency.observe(time.perf_counter() - state['start'], endpoint, request.method)
+    request_total.inc(endpoint, request.method, state.get('status', 500))
+    request_queries.observe(state['queries'], endpoint)
+    request_db_time.observe(state['db_time'], endpoint)
+    _current.reset(state['token'])
+
+
+def metrics_text():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.expose()
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    if metrics_token:
+        if request.headers.get('Authorization') != f'Bearer {metrics_token}':
+            return Response('forbidden\n', status=403, mimetype='text/plain')
+    elif request.remote_addr not in ('127.0.0.1', '::1') and not _is_admin():
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+
+def init_monitoring(app):
+    """注册请求钩子、引擎事件与 /metrics；应在其它 before_request 钩子之前调用"""
+    global slow_query_seconds, sample_rate, metrics_token, _logger
+    _logger = app.logger
+    slow_query_seconds = float(app.config.get('SLOW_QUERY_MS', os.environ.get('SLOW_QUERY_MS', 200))) / 1000
+    sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE', os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+    metrics_token = app.config.get('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(db.engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,84 @@
+"""游标（keyset）分页
+
+按 ``(时间列, id)`` 倒序翻页，游标编码最后一行的这两个值，
+下一页查询走 ``WHERE (ts, id) < (游标)``，配合复合索引无需 OFFSET 扫描。
+时间为空的行排在最后、按 id 倒序，游标中的空时间编码为 ``null``；
+时间非空的行翻完后接着查询 ``WHERE ts IS NULL AND id < ?``，两段都能走索引。
+统一返回 ``{'items': [...], 'next_cursor': str | None}`` 结构。
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+NULL_TS = 'null'
+
+
+def encode_cursor(ts, row_id):
+    raw = f'{ts.isoformat() if ts is not None else NULL_TS}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标为 (时间或 None, id)，非法游标返回 None（即从第一页开始）"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit('|', 1)
+        return (None if ts in (NULL_TS, '') else datetime.fromisoformat(ts)), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def sort_key(row):
+    """(时间, id) 行在内存中排序的键，``reverse=True`` 时与 keyset_query 的顺序一致（空时间在最后）"""
+    ts, row_id = row[0], row[1]
+    return ts is not None, ts or datetime.min, row_id
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_query(query, ts_col, id_col, cursor=None):
+    """在查询上追加游标条件与排序：(ts_col, id_col) 倒序，ts_col 为空的行排在最后
+
+    游标位于时间非空的行时，只返回其后时间非空的行（时间为空的行由 keyset_rows 接着取）。
+    """
+    position = decode_cursor(cursor)
+    if position:
+        ts, row_id = position
+        if ts is None:
+            query = query.filter(ts_col.is_(None), id_col < row_id)
+        else:
+            query = query.filter(tuple_(ts_col, id_col) < tuple_(ts, row_id))
+    return query.order_by(ts_col.desc().nulls_last(), id_col.desc())
+
+
+def keyset_rows(query, ts_col, id_col, cursor, count):
+    """按游标顺序取最多 count 行；游标之后时间非空的行不足时，接着取时间为空的行"""
+    rows = keyset_query(query, ts_col, id_col, cursor).limit(count).all()
+    position = decode_cursor(cursor)
+    if len(rows) < count and position and position[0] is not None:
+        rows += query.filter(ts_col.is_(None)).order_by(id_col.desc()).limit(count - len(rows)).all()
+    return rows
+
+
+def keyset_page(query, ts_col, id_col, cursor=None, limit=DEFAULT_LIMIT):
+    """按 (ts_col, id_col) 倒序取一页，返回 (行列表, 下一页游标)"""
+    rows = keyset_rows(query, ts_col, id_col, cursor, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, ts_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
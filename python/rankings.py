@@ -0,0 +1,249 @@
+"""电影排行榜
+
+两级物化，接口只读最终结果：
+
+1. ``movie_daily_activity``：每部电影每天的评论数、评分和、收藏数、活动报名数。
+   ``refresh()`` 只汇总各数据源 id 大于水位（``ranking_watermark``）的新行，
+   每个数据源一条 GROUP BY (日期, 电影) 查询，再用 ``INSERT ... ON CONFLICT DO UPDATE`` 累加；
+   超出最长窗口的天直接删除。
+2. ``movie_ranking``：由日汇总（总榜由 ``movie_stats``）重算出的各榜单前 ``BOARD_SIZE`` 名，
+   ``/movie/top``、``/movie/trending`` 按 (board, rank) 主键范围读取，耗时与评论量无关。
+
+评分榜用贝叶斯平均 ``(C * m + 评分和) / (C + 评论数)``（m 为窗口内全部评论的平均分，C 为
+``PRIOR_WEIGHT``），评论很少的电影被拉向平均分，不会因为一条五星评论登顶。
+热度榜为最近 ``TRENDING_DAYS`` 天各类活动的加权和，按天数以 ``TRENDING_HALF_LIFE`` 为半衰期衰减。
+
+水位按“先把水位从旧值改为新值，成功才累加”的顺序在同一事务内推进，
+多个进程同时刷新时只有一个生效，其余回滚，不会重复计数。
+删除评论、取消收藏与报名不回退日汇总（按发生过的活动计）；PostgreSQL 的序列号可能乱序提交，
+刷新时正在提交的事务中 id 较小的行会被跳过，对排行榜的影响可以忽略，需要精确时执行 ``rebuild-rankings``。
+"""
+import heapq
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+
+from models import db, Collection, EventRegistration, Movie, MovieDailyActivity, MovieEvent, MovieRanking, \
+    MovieReview, MovieStats, RankingWatermark
+from bulk import add_counts, insert_ignore
+from cache import invalidate_after_commit
+from migrations import after_upgrade
+import background
+
+# 时间窗口：名称 -> 天数，None 为全部时间
+WINDOWS = {'week': 7, 'month': 30, 'all': None}
+# 每个榜单保存的名次数（接口 limit 的上限）
+BOARD_SIZE = 100
+# 贝叶斯平均的先验权重，相当于每部电影额外有 C 条平均分的评论
+PRIOR_WEIGHT = 10
+TRENDING_DAYS = 7
+TRENDING_HALF_LIFE = 2.0
+# 热度榜中各类活动的权重
+TRENDING_WEIGHTS = {'reviews': 3.0, 'collects': 2.0, 'registrations': 1.0}
+# 日汇总保留的天数
+RETENTION_DAYS = max(max(d for d in WINDOWS.values() if d), TRENDING_DAYS)
+# 后台刷新间隔（秒），0 表示不启动刷新线程（由 cron 执行 refresh-rankings）
+REFRESH_INTERVAL = 300
+
+
+def board_name(kind, window=None):
+    """榜单名：trending，或 top:<窗口>（评分）/ most_reviewed:<窗口>（评论数）"""
+    return f'{kind}:{window}' if window else kind
+
+
+def _day(value):
+    # SQLite 的 date() 返回字符串，PostgreSQL 返回 date，统一成 YYYY-MM-DD
+    return str(value)[:10]
+
+
+# --- 数据源：(id 列, 日汇总中的列, 构造 (low, high, since) 区间内按 (日期, 电影) 分组查询的函数) ---
+def _reviews(low, high, since):
+    day = func.date(MovieReview.created_at)
+    return select(day, MovieReview.movie_id, func.count(), func.coalesce(func.sum(MovieReview.rating), 0)) \
+        .where(MovieReview.id > low, MovieReview.id <= high, MovieReview.created_at >= since,
+               MovieReview.movie_id.isnot(None), MovieReview.rating.between(1, 5)) \
+        .group_by(day, MovieReview.movie_id)
+
+
+def _collects(low, high, since):
+    day = func.date(Collection.created_at)
+    return select(day, Collection.item_id, func.count()) \
+        .where(Collection.id > low, Collection.id <= high, Collection.created_at >= since,
+               Collection.item_type == 'movie') \
+        .group_by(day, Collection.item_id)
+
+
+def _registrations(low, high, since):
+    day = func.date(EventRegistration.registration_date)
+    return select(day, MovieEvent.movie_id, func.count()) \
+        .join(MovieEvent, MovieEvent.id == EventRegistration.event_id) \
+        .where(EventRegistration.id > low, EventRegistration.id <= high,
+               EventRegistration.registration_date >= since, MovieEvent.movie_id.isnot(None)) \
+        .group_by(day, MovieEvent.movie_id)
+
+
+SOURCES = {
+    'movie_review': (MovieReview.id, ('reviews', 'rating_sum'), _reviews),
+    'collection': (Collection.id, ('collects',), _collects),
+    'event_registration': (EventRegistration.id, ('registrations',), _registrations),
+}
+
+
+def _accumulate(now):
+    """按水位汇总新行到日汇总，返回 {数据源: 更新的 (日期, 电影) 数}；水位已被其它进程推进时返回 None"""
+    since = now - timedelta(days=RETENTION_DAYS)
+    insert_ignore(RankingWatermark, [{'source': s, 'last_id': 0} for s in SOURCES], ('source',))
+    marks = dict(db.session.execute(select(RankingWatermark.source, RankingWatermark.last_id)).all())
+    touched = {}
+    for source, (id_column, columns, build) in SOURCES.items():
+        low = marks[source]
+        high = db.session.execute(select(func.max(id_column))).scalar() or 0
+        if high <= low:
+            touched[source] = 0
+            continue
+        claimed = db.session.execute(
+            update(RankingWatermark).where(RankingWatermark.source == source, RankingWatermark.last_id == low)
+            .values(last_id=high, updated_at=now)).rowcount
+        if not claimed:
+            return None
+        rows = [dict(zip(('day', 'movie_id') + columns, (_day(day), movie_id, *values)))
+                for day, movie_id, *values in db.session.execute(build(low, high, since))]
+        add_counts(MovieDailyActivity, ('day', 'movie_id'), rows)
+        touched[source] = len(rows)
+    db.session.execute(delete(MovieDailyActivity).where(MovieDailyActivity.day < _day(since.date())))
+    return touched
+
+
+# --- 榜单计算 ---
+def _window_stats(now, days):
+    """窗口内每部电影的 (movie_id, n 评论数, total 评分和) 子查询"""
+    if days is None:
+        return select(MovieStats.movie_id, MovieStats.review_count.label('n'), MovieStats.rating_sum.label('total')) \
+            .where(MovieStats.review_count > 0).subquery()
+    n = func.sum(MovieDailyActivity.reviews)
+    return select(MovieDailyActivity.movie_id, n.label('n'), func.sum(MovieDailyActivity.rating_sum).label('total')) \
+        .where(MovieDailyActivity.day > _day((now - timedelta(days=days)).date())) \
+        .group_by(MovieDailyActivity.movie_id).having(n > 0).subquery()
+
+
+def _rated_board(stats):
+    """贝叶斯平均评分榜，返回 (movie_id, score, review_count) 列表"""
+    count, total = db.session.execute(select(func.sum(stats.c.n), func.sum(stats.c.total))).one()
+    if not count:
+        return []
+    prior = PRIOR_WEIGHT * (total / count)
+    score = (prior + stats.c.total) / (PRIOR_WEIGHT + stats.c.n)
+    return db.session.execute(select(stats.c.movie_id, score, stats.c.n)
+                              .order_by(score.desc(), stats.c.n.desc(), stats.c.movie_id).limit(BOARD_SIZE)).all()
+
+
+def _reviewed_board(stats):
+    """评论数榜"""
+    return db.session.execute(select(stats.c.movie_id, stats.c.n, stats.c.n)
+                              .order_by(stats.c.n.desc(), stats.c.movie_id).limit(BOARD_SIZE)).all()
+
+
+def _trending_board(now):
+    """热度榜：最近 TRENDING_DAYS 天的加权活动量按天衰减后求和"""
+    today = now.date()
+    scores, reviews = {}, {}
+    for row in db.session.execute(select(MovieDailyActivity).where(
+            MovieDailyActivity.day > _day(today - timedelta(days=TRENDING_DAYS)))).scalars():
+        age = (today - datetime.strptime(row.day, '%Y-%m-%d').date()).days
+        decay = 0.5 ** (max(age, 0) / TRENDING_HALF_LIFE)
+        activity = sum(weight * getattr(row, column) for column, weight in TRENDING_WEIGHTS.items())
+        scores[row.movie_id] = scores.get(row.movie_id, 0.0) + decay * activity
+        reviews[row.movie_id] = reviews.get(row.movie_id, 0) + row.reviews
+    top = heapq.nsmallest(BOARD_SIZE, ((-score, movie_id) for movie_id, score in scores.items() if score > 0))
+    return [(movie_id, -score, reviews[movie_id]) for score, movie_id in top]
+
+
+def compute_boards(now):
+    """重算全部榜单，返回 {榜单名: [(movie_id, score, review_count), ...]}"""
+    boards = {board_name('trending'): _trending_board(now)}
+    for window, days in WINDOWS.items():
+        stats = _window_stats(now, days)
+        boards[board_name('top', window)] = _rated_board(stats)
+        boards[board_name('most_reviewed', window)] = _reviewed_board(stats)
+    return boards
+
+
+def refresh(now=None):
+    """增量汇总新行并重算榜单，返回 {数据源: 更新的日汇总行数}；其它进程正在刷新时返回 None"""
+    now = now or datetime.utcnow()
+    touched = _accumulate(now)
+    if touched is None:
+        db.session.rollback()
+        return None
+    db.session.execute(delete(MovieRanking))
+    rows = [{'board': board, 'rank': rank, 'movie_id': movie_id, 'score': float(score),
+             'review_count': int(count or 0), 'computed_at': now}
+            for board, entries in compute_boards(now).items()
+            for rank, (movie_id, score, count) in enumerate(entries, 1)]
+    if rows:
+        db.session.execute(insert(MovieRanking), rows)
+    invalidate_after_commit('rankings')
+    db.session.commit()
+    return touched
+
+
+def rebuild():
+    """清空日汇总与水位后从头汇总（只读取保留窗口内的行）"""
+    db.session.execute(delete(MovieDailyActivity))
+    db.session.execute(delete(RankingWatermark))
+    db.session.commit()
+    return refresh()
+
+
+def read_board(board, limit, columns):
+    """按名次读取榜单前 limit 名，返回电影字段（columns）加 rank、score、review_count 的字典列表
+
+    已删除的电影不返回（该名次空缺）。
+    """
+    rows = db.session.execute(
+        select(MovieRanking.rank, MovieRanking.score, MovieRanking.review_count,
+               *[getattr(Movie, c) for c in columns])
+        .join(Movie, Movie.id == MovieRanking.movie_id)
+        .where(MovieRanking.board == board, MovieRanking.rank <= limit)
+        .order_by(MovieRanking.rank))
+    return [row._asdict() for row in rows]
+
+
+@after_upgrade
+def backfill_rankings():
+    """首次升级（尚无水位）且已有评论时汇总一次"""
+    if not db.session.query(RankingWatermark.source).first() and db.session.query(MovieReview.id).first():
+        refresh()
+
+
+def _refresh_loop(app, interval, stop_event):
+    while not stop_event.wait(interval):
+        with app.app_context():
+            try:
+                refresh()
+            except Exception:
+                app.logger.exception('刷新排行榜失败')
+
+
+def init_rankings(app):
+    """启动定时刷新线程并注册命令"""
+    interval = float(app.config.get('RANKING_REFRESH_INTERVAL',
+                                    os.environ.get('RANKING_REFRESH_INTERVAL', REFRESH_INTERVAL)))
+    if interval > 0 and background.enabled(app):
+        background.start(app, 'ranking-refresher', _refresh_loop, interval)
+
+    @app.cli.command('refresh-rankings')
+    def refresh_rankings_command():
+        """汇总水位之后的新活动并重算排行榜"""
+        touched = refresh()
+        if touched is None:
+            print('其它进程正在刷新排行榜')
+        else:
+            print('已刷新排行榜，' + '，'.join(f'{s} 更新 {n} 行' for s, n in touched.items()))
+
+    @app.cli.command('rebuild-rankings')
+    def rebuild_rankings_command():
+        """清空日汇总与水位后重新汇总排行榜"""
+        touched = rebuild()
+        print('已重建排行榜，' + '，'.join(f'{s} {n} 行' for s, n in (touched or {}).items()))
@@ -0,0 +1,64 @@
+"""电影评分聚合
+
+``movie_stats`` 保存每部电影的评论数、评分总和及 1-5 星分布，
+发表评论时在同一事务内增量更新，电影页直接读取聚合结果而不扫描评论表。
+"""
+from sqlalchemy import case, func, insert, select, update
+
+from models import db, Movie, MovieReview, MovieStats
+from migrations import after_upgrade
+from bulk import add_counts
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def record_review(movie, rating):
+    """把一条新评论计入聚合，并刷新电影平均分（调用方负责提交事务）"""
+    # 单条 upsert：同一电影的首批评论并发写入时不会撞主键
+    add_counts(MovieStats, ('movie_id',), [{'movie_id': movie.id, 'review_count': 1, 'rating_sum': rating,
+                                            **{f'star_{s}': int(s == rating) for s in STARS}}])
+    count, total = db.session.query(MovieStats.review_count, MovieStats.rating_sum) \
+        .filter_by(movie_id=movie.id).one()
+    movie.rating = round(total / count, 1)
+
+
+def rating_histogram(movie_id):
+    """返回 {'count': 总评论数, 'stars': {1: n1, ..., 5: n5}}"""
+    stats = db.session.get(MovieStats, movie_id)
+    if not stats:
+        return {'count': 0, 'stars': {s: 0 for s in STARS}}
+    return {'count': stats.review_count, 'stars': {s: getattr(stats, f'star_{s}') for s in STARS}}
+
+
+def rebuild_movie_stats():
+    """按评论表一次 GROUP BY 重算全部聚合并修正电影评分，返回有评论的电影数"""
+    db.session.execute(MovieStats.__table__.delete())
+    grouped = select(
+        MovieReview.movie_id,
+        func.count(MovieReview.id),
+        func.coalesce(func.sum(MovieReview.rating), 0),
+        *[func.sum(case((MovieReview.rating == s, 1), else_=0)) for s in STARS]
+    ).where(MovieReview.movie_id.isnot(None), MovieReview.rating.between(1, 5)) \
+        .group_by(MovieReview.movie_id)
+    db.session.execute(insert(MovieStats).from_select(
+        ['movie_id', 'review_count', 'rating_sum'] + [f'star_{s}' for s in STARS], grouped))
+    avg = select(func.round(MovieStats.rating_sum * 1.0 / MovieStats.review_count, 1)) \
+        .where(MovieStats.movie_id == Movie.id).scalar_subquery()
+    db.session.execute(update(Movie).where(Movie.id.in_(select(MovieStats.movie_id))).values(rating=avg))
+    db.session.commit()
+    return db.session.query(func.count(MovieStats.movie_id)).scalar()
+
+
+@after_upgrade
+def backfill_movie_stats():
+    """已有评论但聚合表为空（刚升级）时回填"""
+    if not db.session.query(MovieStats.movie_id).first() and db.session.query(MovieReview.id).first():
+        rebuild_movie_stats()
+
+
+def init_ratings(app):
+    """注册修复命令"""
+    @app.cli.command('rebuild-movie-stats')
+    def rebuild_movie_stats_command():
+        """按评论表重算电影评分聚合"""
+        print(f'已重算 {rebuild_movie_stats()} 部电影的评分')
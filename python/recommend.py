@@ -0,0 +1,347 @@
+"""电影推荐
+
+离线批量计算每部电影的前 K 个相似电影，存入 ``movie_neighbor`` 表；
+在线推荐只读取当前用户评过分/收藏的电影及其邻居，不做矩阵运算。
+
+相似度 = 评分余弦相似度 × 共同评分人数收缩 + CONTENT_WEIGHT × 类型/导演特征余弦相似度
+
+批量构建使用 NumPy/SciPy 稀疏矩阵（可选依赖，未安装时逐部电影用 SQL 计算，只适合小数据量）。
+新评论提交后由后台任务 ``refresh_movie_neighbors`` 增量刷新该电影及其邻居的列表。
+
+没有评分/收藏的用户按 ``favorite_genres`` / ``favorite_directors`` 推荐，仍不足时按评分补齐。
+"""
+import math
+import re
+import time
+
+from sqlalchemy import delete, exists, func, insert, or_
+
+from models import db, Collection, Movie, MovieNeighbor, MovieReview
+from tasks import task
+
+# NumPy/SciPy 为可选依赖；导入耗时较长，只在批量构建时由 _load_numpy() 导入，不拖慢应用启动
+np = sparse = None
+
+# 每部电影保存的邻居数
+TOP_K = 30
+# 共同评分人数收缩：相似度乘以 n / (n + SHRINKAGE)，避免一两个人的巧合
+SHRINKAGE = 10
+CONTENT_WEIGHT = 0.3
+# 收藏视同的评分
+COLLECT_RATING = 4
+# 在线推荐最多使用的种子电影数
+MAX_SEEDS = 200
+# 增量刷新时最多读取的评分人数（最新的）
+MAX_RATERS = 2000
+BLOCK_SIZE = 512
+
+_SPLIT = re.compile(r'[,，/、|;；\s]+')
+
+
+def split_tags(value):
+    return [t for t in _SPLIT.split(value or '') if t]
+
+
+def movie_features(genre, director):
+    """电影的内容特征：类型与导演"""
+    return {f'g:{g}' for g in split_tags(genre)} | {f'd:{d}' for d in split_tags(director)}
+
+
+def _shrink(co_count):
+    return co_count / (co_count + SHRINKAGE)
+
+
+def _content_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / math.sqrt(len(a) * len(b))
+
+
+# --- 批量构建（NumPy/SciPy） ---
+def _load_numpy():
+    """按需导入 NumPy/SciPy，未安装时返回 False"""
+    global np, sparse
+    if sparse is None:
+        try:
+            import numpy
+            from scipy import sparse as scipy_sparse
+        except ImportError:
+            return False
+        np, sparse = numpy, scipy_sparse
+    return True
+
+
+def compute_neighbors(user_idx, movie_idx, ratings, n_users, n_movies, feature_idx=None, n_features=0,
+                      k=TOP_K, block_size=BLOCK_SIZE):
+    """根据评分三元组与电影特征计算每部电影的前 k 个邻居
+
+    user_idx/movie_idx/ratings 为等长数组，feature_idx 为 (电影下标, 特征下标) 数组对。
+    返回 (neighbors, scores)，形状均为 (n_movies, k)，不足 k 个时下标为 -1。
+    """
+    if not _load_numpy():
+        raise RuntimeError('批量构建需要安装 NumPy 与 SciPy')
+    R = sparse.csr_matrix((np.asarray(ratings, dtype=np.float32), (user_idx, movie_idx)),
+                          shape=(n_users, n_movies))
+    R.sum_duplicates()
+    norms = np.sqrt(np.asarray(R.multiply(R).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    Rn = (R @ sparse.diags(1 / norms)).tocsr()
+    B = R.copy()
+    B.data[:] = 1
+    RnT, BT = Rn.T.tocsr(), B.T.tocsr()
+    if feature_idx is not None and len(feature_idx[0]):
+        F = sparse.csr_matrix((np.ones(len(feature_idx[0]), dtype=np.float32), feature_idx),
+                              shape=(n_movies, n_features))
+        fnorms = np.sqrt(np.asarray(F.sum(axis=1)).ravel())
+        fnorms[fnorms == 0] = 1
+        F = (sparse.diags(1 / fnorms) @ F).tocsr()
+        FT = F.T.tocsc()
+    else:
+        F = None
+
+    k = min(k, max(n_movies - 1, 0))
+    neighbors = np.full((n_movies, k), -1, dtype=np.int64)
+    scores = np.zeros((n_movies, k), dtype=np.float32)
+    if not k:
+        return neighbors, scores
+    # 按行分块：每块电影与全部电影的相似度，块内数组约 block_size × n_movies 个 float32
+    for start in range(0, n_movies, block_size):
+        stop = min(start + block_size, n_movies)
+        sim = RnT[start:stop] @ Rn
+        co = BT[start:stop] @ B
+        sim.sort_indices()
+        co.sort_indices()
+        # 评分均为正数，两个乘积的非零位置相同
+        sim.data *= co.data / (co.data + SHRINKAGE)
+        sim = sim.toarray()
+        if F is not None:
+            sim += CONTENT_WEIGHT * (F[start:stop] @ FT).toarray()
+        rows = np.arange(stop - start)
+        sim[rows, np.arange(start, stop)] = 0
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sim, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top[top_scores <= 0] = -1
+        neighbors[start:stop] = top
+        scores[start:stop] = top_scores
+    return neighbors, scores
+
+
+def _load_matrix():
+    movie_rows = db.session.query(Movie.id, Movie.genre, Movie.director).order_by(Movie.id).all()
+    movie_ids = np.array([row[0] for row in movie_rows], dtype=np.int64)
+    movie_pos = {mid: i for i, mid in enumerate(movie_ids.tolist())}
+
+    triples = db.session.query(MovieReview.user_id, MovieReview.movie_id, MovieReview.rating) \
+        .filter(MovieReview.rating.between(1, 5), MovieReview.user_id.isnot(None)).all()
+    reviewed = {(u, m) for u, m, _ in triples}
+    collected = db.session.query(Collection.user_id, Collection.item_id) \
+        .filter(Collection.item_type == 'movie').all()
+    triples += [(u, m, COLLECT_RATING) for u, m in collected if (u, m) not in reviewed]
+    triples = [t for t in triples if t[1] in movie_pos]
+
+    user_ids = sorted({t[0] for t in triples})
+    user_pos = {uid: i for i, uid in enumerate(user_ids)}
+    user_idx = np.array([user_pos[t[0]] for t in triples], dtype=np.int64)
+    movie_idx = np.array([movie_pos[t[1]] for t in triples], dtype=np.int64)
+    ratings = np.array([t[2] for t in triples], dtype=np.float32)
+
+    feature_pos, rows, cols = {}, [], []
+    for i, (_, genre, director) in enumerate(movie_rows):
+        for feature in movie_features(genre, director):
+            rows.append(i)
+            cols.append(feature_pos.setdefault(feature, len(feature_pos)))
+    return movie_ids, (user_idx, movie_idx, ratings, len(user_ids)), \
+        (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), len(feature_pos)
+
+
+def _store_all(rows):
+    db.session.execute(delete(MovieNeighbor))
+    for start in range(0, len(rows), 5000):
+        db.session.execute(insert(MovieNeighbor), rows[start:start + 5000])
+    db.session.commit()
+
+
+def build_index(k=TOP_K):
+    """重新计算全部电影的邻居表，返回 (电影数, 写入的邻居数)"""
+    if not _load_numpy():
+        movie_ids = [mid for (mid,) in db.session.query(Movie.id).order_by(Movie.id)]
+        rows = []
+        for movie_id in movie_ids:
+            rows += [{'movie_id': movie_id, 'neighbor_id': n, 'score': s} for n, s in _neighbors_for(movie_id, k)]
+        _store_all(rows)
+        return len(movie_ids), len(rows)
+    movie_ids, (user_idx, movie_idx, ratings, n_users), feature_idx, n_features = _load_matrix()
+    neighbors, scores = compute_neighbors(user_idx, movie_idx, ratings, n_users, len(movie_ids),
+                                          feature_idx, n_features, k=k)
+    rows = [{'movie_id': int(movie_ids[i]), 'neighbor_id': int(movie_ids[j]), 'score': float(s)}
+            for i in range(len(movie_ids)) for j, s in zip(neighbors[i], scores[i]) if j >= 0]
+    _store_all(rows)
+    return len(movie_ids), len(rows)
+
+
+# --- 单部电影计算（增量刷新） ---
+def _ratings_of(movie_id):
+    """某部电影最新 MAX_RATERS 个评分者的 {用户: 评分}（含收藏）"""
+    ratings = dict(db.session.query(MovieReview.user_id, MovieReview.rating)
+                   .filter(MovieReview.movie_id == movie_id, MovieReview.rating.between(1, 5))
+                   .order_by(MovieReview.created_at.desc()).limit(MAX_RATERS).all())
+    for (user_id,) in db.session.query(Collection.user_id) \
+            .filter_by(item_type='movie', item_id=movie_id).limit(MAX_RATERS):
+        ratings.setdefault(user_id, COLLECT_RATING)
+    return ratings
+
+
+def _user_ratings(user_ids, exclude_movie_id):
+    """这些用户对其它电影的 {(用户, 电影): 评分}，未评分的收藏按 COLLECT_RATING 计入（与 _load_matrix 相同）"""
+    ratings = {(u, m): r for u, m, r in db.session.query(
+        MovieReview.user_id, MovieReview.movie_id, MovieReview.rating)
+        .filter(MovieReview.user_id.in_(user_ids), MovieReview.movie_id != exclude_movie_id,
+                MovieReview.rating.between(1, 5))}
+    for pair in db.session.query(Collection.user_id, Collection.item_id) \
+            .filter(Collection.user_id.in_(user_ids), Collection.item_type == 'movie',
+                    Collection.item_id != exclude_movie_id):
+        ratings.setdefault(tuple(pair), COLLECT_RATING)
+    return ratings
+
+
+def _rating_norms(movie_ids):
+    """电影评分向量的平方和 {电影: Σr²}，同样计入未评分的收藏"""
+    norms = dict(db.session.query(MovieReview.movie_id, func.sum(MovieReview.rating * MovieReview.rating))
+                 .filter(MovieReview.movie_id.in_(movie_ids), MovieReview.rating.between(1, 5))
+                 .group_by(MovieReview.movie_id).all())
+    reviewed = exists().where(MovieReview.user_id == Collection.user_id, MovieReview.movie_id == Collection.item_id,
+                              MovieReview.rating.between(1, 5))
+    for movie_id, count in db.session.query(Collection.item_id, func.count(Collection.id)) \
+            .filter(Collection.item_type == 'movie', Collection.item_id.in_(movie_ids), ~reviewed) \
+            .group_by(Collection.item_id):
+        norms[movie_id] = norms.get(movie_id, 0) + count * COLLECT_RATING ** 2
+    return norms
+
+
+def _neighbors_for(movie_id, k=TOP_K):
+    """用 SQL 计算一部电影的前 k 个邻居 [(邻居 id, 相似度)]
+
+    公式与批量构建一致（收藏同样视作 COLLECT_RATING 评分）；评分人数超过 MAX_RATERS 时只用最新的部分。
+    """
+    movie = db.session.get(Movie, movie_id)
+    if not movie:
+        return []
+    target = _ratings_of(movie_id)
+    dots, co = {}, {}
+    if target:
+        raters = list(target)
+        for start in range(0, len(raters), 500):
+            for (user_id, other), rating in _user_ratings(raters[start:start + 500], movie_id).items():
+                dots[other] = dots.get(other, 0) + target[user_id] * rating
+                co[other] = co.get(other, 0) + 1
+    candidates = sorted(dots, key=dots.get, reverse=True)[:k * 10]
+    norms = _rating_norms(candidates) if candidates else {}
+    target_norm = math.sqrt(sum(r * r for r in target.values())) or 1
+    scores = {m: dots[m] / (target_norm * math.sqrt(norms.get(m) or 1)) * _shrink(co[m]) for m in candidates}
+
+    features = movie_features(movie.genre, movie.director)
+    conditions = [Movie.director == d for d in split_tags(movie.director)] + \
+        [Movie.genre.contains(g) for g in split_tags(movie.genre)]
+    similar = db.session.query(Movie.id, Movie.genre, Movie.director) \
+        .filter(Movie.id != movie_id, or_(*conditions)).order_by(Movie.rating.desc()).limit(k * 10).all() \
+        if conditions else []
+    others = {m: movie_features(g, d) for m, g, d in similar}
+    for m, g, d in db.session.query(Movie.id, Movie.genre, Movie.director) \
+            .filter(Movie.id.in_([c for c in candidates if c not in others])):
+        others[m] = movie_features(g, d)
+    for m, other_features in others.items():
+        content = _content_similarity(features, other_features)
+        if content:
+            scores[m] = scores.get(m, 0) + CONTENT_WEIGHT * content
+    top = sorted(((m, s) for m, s in scores.items() if s > 0), key=lambda x: -x[1])[:k]
+    return top
+
+
+@task('refresh_movie_neighbors')
+def refresh_movie_neighbors(movie_id, k=TOP_K):
+    """重算一部电影的邻居，并把它合并进各邻居自己的列表（相似度对称）"""
+    top = _neighbors_for(movie_id, k)
+    db.session.execute(delete(MovieNeighbor).where(MovieNeighbor.movie_id == movie_id))
+    db.session.execute(delete(MovieNeighbor).where(MovieNeighbor.neighbor_id == movie_id))
+    if top:
+        db.session.execute(insert(MovieNeighbor), [
+            {'movie_id': movie_id, 'neighbor_id': n, 'score': s} for n, s in top])
+        db.session.execute(insert(MovieNeighbor), [
+            {'movie_id': n, 'neighbor_id': movie_id, 'score': s} for n, s in top])
+        # 邻居列表超过 k 个时去掉最弱的
+        for neighbor_id, _ in top:
+            weakest = db.session.query(MovieNeighbor.neighbor_id).filter_by(movie_id=neighbor_id) \
+                .order_by(MovieNeighbor.score.desc()).offset(k).all()
+            if weakest:
+                db.session.execute(delete(MovieNeighbor).where(
+                    MovieNeighbor.movie_id == neighbor_id,
+                    MovieNeighbor.neighbor_id.in_([w for (w,) in weakest])))
+    db.session.commit()
+    return {'neighbors': len(top)}
+
+
+# --- 在线推荐 ---
+def _seed_weights(user_id):
+    """用户的种子电影及权重：5 星 1.0、1 星 -0.6，收藏 0.6"""
+    seeds = {m: (r - 2.5) / 2.5 for m, r in db.session.query(MovieReview.movie_id, MovieReview.rating)
+             .filter(MovieReview.user_id == user_id, MovieReview.rating.between(1, 5))
+             .order_by(MovieReview.id.desc()).limit(MAX_SEEDS)}
+    for (movie_id,) in db.session.query(Collection.item_id) \
+            .filter_by(user_id=user_id, item_type='movie').limit(MAX_SEEDS):
+        seeds.setdefault(movie_id, (COLLECT_RATING - 2.5) / 2.5)
+    return seeds
+
+
+def _profile_movies(user, exclude, limit):
+    """按喜欢的类型/导演推荐评分最高的电影"""
+    conditions = [Movie.director == d for d in split_tags(user.favorite_directors)] + \
+        [Movie.genre.contains(g) for g in split_tags(user.favorite_genres)]
+    if not conditions:
+        return []
+    query = Movie.query.filter(or_(*conditions))
+    if exclude:
+        query = query.filter(Movie.id.notin_(exclude))
+    return query.order_by(Movie.rating.desc(), Movie.id.desc()).limit(limit).all()
+
+
+def _popular_movies(exclude, limit):
+    query = Movie.query
+    if exclude:
+        query = query.filter(Movie.id.notin_(exclude))
+    return query.order_by(Movie.rating.desc(), Movie.id.desc()).limit(limit).all()
+
+
+def recommend_for(user, limit=20):
+    """返回 [(Movie, 分数, 来源)]，来源为 neighbors / profile / popular"""
+    seeds = _seed_weights(user.id)
+    scores = {}
+    if seeds:
+        for movie_id, neighbor_id, score in db.session.query(
+                MovieNeighbor.movie_id, MovieNeighbor.neighbor_id, MovieNeighbor.score) \
+                .filter(MovieNeighbor.movie_id.in_(list(seeds))):
+            if neighbor_id not in seeds:
+                scores[neighbor_id] = scores.get(neighbor_id, 0) + seeds[movie_id] * score
+    ranked = sorted((m for m, s in scores.items() if s > 0), key=lambda m: -scores[m])[:limit]
+    movies = {m.id: m for m in Movie.query.filter(Movie.id.in_(ranked))} if ranked else {}
+    results = [(movies[m], round(scores[m], 4), 'neighbors') for m in ranked if m in movies]
+    exclude = set(seeds) | {m.id for m, _, _ in results}
+    if len(results) < limit:
+        for movie in _profile_movies(user, exclude, limit - len(results)):
+            results.append((movie, None, 'profile'))
+            exclude.add(movie.id)
+    if len(results) < limit:
+        results += [(movie, None, 'popular') for movie in _popular_movies(exclude, limit - len(results))]
+    return results
+
+
+def init_recommend(app):
+    @app.cli.command('build-recommendations')
+    def build_recommendations_command():
+        """重新计算电影相似度邻居表"""
+        started = time.perf_counter()
+        movies, rows = build_index()
+        print(f'{movies} 部电影，写入 {rows} 条邻居，耗时 {time.perf_counter() - started:.1f}s'
+              f'（{"NumPy" if np is not None else "SQL"}）')
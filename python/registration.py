@@ -0,0 +1,194 @@
+"""活动报名引擎
+
+名额扣减使用单条条件更新
+``UPDATE movie_event SET current_participants = current_participants + 1
+WHERE id = ? AND current_participants < max_participants``，
+由数据库保证并发下不会超员；``(user_id, event_id)`` 唯一索引保证同一用户不会重复报名。
+满员后进入候补名单，有人取消时按报名先后自动递补。
+"""
+import functools
+import time
+from datetime import datetime
+
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, EventRegistration, MovieEvent
+from bulk import insert_ignore
+from cache import invalidate
+
+REGISTERED = 'registered'
+WAITLISTED = 'waitlisted'
+CANCELLED = 'cancelled'
+ACTIVE = (REGISTERED, WAITLISTED)
+
+# SQLite 写锁冲突时的重试次数
+LOCK_RETRIES = 5
+
+
+def _retry_on_lock(fn):
+    """SQLite 在读事务升级为写事务时可能直接返回 database is locked，回滚后重试"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e) or attempt == LOCK_RETRIES - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+    return wrapper
+
+
+def _take_seat(event_id):
+    """条件更新占用一个名额，成功返回 True"""
+    result = db.session.execute(
+        update(MovieEvent)
+        .where(MovieEvent.id == event_id,
+               MovieEvent.status == 'upcoming',
+               or_(MovieEvent.max_participants.is_(None),
+                   MovieEvent.current_participants < MovieEvent.max_participants))
+        .values(current_participants=func.coalesce(MovieEvent.current_participants, 0) + 1)
+        .execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+
+def waitlist_position(registration):
+    """候补名单中的位次（从 1 开始），与递补顺序一致"""
+    return db.session.query(func.count(EventRegistration.id)).filter(
+        EventRegistration.event_id == registration.event_id,
+        EventRegistration.status == WAITLISTED,
+        tuple_(EventRegistration.registration_date, EventRegistration.id)
+        <= tuple_(registration.registration_date, registration.id)).scalar()
+
+
+@_retry_on_lock
+def register(user_id, event_id):
+    """报名活动，返回 (结果, 报名记录)；结果为 registered / waitlisted / already / closed"""
+    event = db.session.get(MovieEvent, event_id)
+    if not event or event.status != 'upcoming':
+        return 'closed', None
+    registration = EventRegistration.query.filter_by(user_id=user_id, event_id=event_id).first()
+    if registration and registration.status in ACTIVE:
+        return 'already', registration
+    try:
+        with db.session.begin_nested():
+            if registration:
+                # 取消后重新报名，沿用原记录
+                registration.status = WAITLISTED
+                registration.registration_date = datetime.utcnow()
+            else:
+                registration = EventRegistration(user_id=user_id, event_id=event_id, status=WAITLISTED)
+                db.session.add(registration)
+            db.session.flush()
+    except IntegrityError:
+        # 并发的重复报名被唯一索引拦下
+        db.session.rollback()
+        return 'already', EventRegistration.query.filter_by(user_id=user_id, event_id=event_id).first()
+    if _take_seat(event_id):
+        registration.status = REGISTERED
+    db.session.commit()
+    # 活动列表显示报名人数
+    invalidate('events')
+    return registration.status, registration
+
+
+@_retry_on_lock
+def register_many(event_id, user_ids):
+    """为一组用户报名同一活动（一个事务），返回 {user_id: 结果}，结果同 register()
+
+    新报名一次批量插入（唯一索引冲突的跳过），已取消的一次更新重新报名，
+    再按剩余名额一次占用多个座位，按 user_ids 的顺序转为正式报名，其余进入候补名单。
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    event = db.session.get(MovieEvent, event_id)
+    if not event or event.status != 'upcoming':
+        return {uid: 'closed' for uid in user_ids}
+    now = datetime.utcnow()
+    created = {uid for (uid,) in insert_ignore(
+        EventRegistration, [{'user_id': uid, 'event_id': event_id, 'status': WAITLISTED, 'registration_date': now}
+                            for uid in user_ids], ('user_id',))}
+    rejoined = set(db.session.scalars(
+        update(EventRegistration)
+        .where(EventRegistration.event_id == event_id, EventRegistration.user_id.in_(user_ids),
+               EventRegistration.user_id.notin_(created), EventRegistration.status == CANCELLED)
+        .values(status=WAITLISTED, registration_date=now)
+        .returning(EventRegistration.user_id)
+        .execution_options(synchronize_session=False)))
+    joined = [uid for uid in user_ids if uid in created or uid in rejoined]
+    seated = joined[:_take_seats(event_id, len(joined))]
+    if seated:
+        db.session.execute(
+            update(EventRegistration)
+            .where(EventRegistration.event_id == event_id, EventRegistration.user_id.in_(seated))
+            .values(status=REGISTERED)
+            .execution_options(synchronize_session=False))
+    db.session.commit()
+    if joined:
+        invalidate('events')
+    seated = set(seated)
+    return {uid: REGISTERED if uid in seated else WAITLISTED if uid in created or uid in rejoined else 'already'
+            for uid in user_ids}
+
+
+def _take_seats(event_id, count):
+    """一次占用至多 count 个名额，返回占到的数量（调用前本事务已写入，持有写锁）"""
+    if not count:
+        return 0
+    max_participants, current = db.session.execute(
+        select(MovieEvent.max_participants, func.coalesce(MovieEvent.current_participants, 0))
+        .where(MovieEvent.id == event_id).with_for_update()).one()
+    seats = count if max_participants is None else max(0, min(count, max_participants - current))
+    if seats:
+        db.session.execute(
+            update(MovieEvent).where(MovieEvent.id == event_id)
+            .values(current_participants=func.coalesce(MovieEvent.current_participants, 0) + seats)
+            .execution_options(synchronize_session=False))
+    return seats
+
+
+@_retry_on_lock
+def cancel(user_id, event_id):
+    """取消报名；正式名额被释放时递补最早的候补者，返回被递补的报名记录 id（没有则为 None）"""
+    registration = EventRegistration.query.filter_by(user_id=user_id, event_id=event_id).first()
+    if not registration or registration.status not in ACTIVE:
+        return None
+    was_registered = registration.status == REGISTERED
+    result = db.session.execute(
+        update(EventRegistration)
+        .where(EventRegistration.id == registration.id, EventRegistration.status.in_(ACTIVE))
+        .values(status=CANCELLED)
+        .execution_options(synchronize_session=False))
+    promoted_id = None
+    if result.rowcount and was_registered:
+        next_in_line = db.session.execute(select(EventRegistration.id).where(
+            EventRegistration.event_id == event_id, EventRegistration.status == WAITLISTED
+        ).order_by(EventRegistration.registration_date, EventRegistration.id).limit(1)).scalar()
+        # 名额直接转给候补者，已报名人数不变
+        if next_in_line and db.session.execute(
+                update(EventRegistration)
+                .where(EventRegistration.id == next_in_line, EventRegistration.status == WAITLISTED)
+                .values(status=REGISTERED)
+                .execution_options(synchronize_session=False)).rowcount:
+            promoted_id = next_in_line
+        else:
+            db.session.execute(
+                update(MovieEvent).where(MovieEvent.id == event_id, MovieEvent.current_participants > 0)
+                .values(current_participants=MovieEvent.current_participants - 1)
+                .execution_options(synchronize_session=False))
+    db.session.commit()
+    invalidate('events')
+    return promoted_id
+
+
+def registration_summary(event):
+    """活动名额概况"""
+    waitlisted = db.session.query(func.count(EventRegistration.id)).filter_by(
+        event_id=event.id, status=WAITLISTED).scalar()
+    return {
+        'event_id': event.id,
+        'max_participants': event.max_participants,
+        'current_participants': event.current_participants or 0,
+        'waitlisted': waitlisted,
+    }
@@ -0,0 +1,208 @@
+"""电影全文检索
+
+基于 SQLite FTS5 的倒排索引，替代 ``LIKE '%q%'`` 全表扫描。
+中文没有空格分词，这里在写入索引前先把连续的中日韩字符切成单字 + 二元组(bigram)，
+西文按单词切分，再交给 FTS5 的 unicode61 分词器，查询时按同样规则切分。
+"""
+import re
+import weakref
+
+from flask import current_app
+from sqlalchemy import event, inspect, or_, select, text, table, column
+from sqlalchemy.orm import load_only
+
+from models import db, Movie
+from migrations import after_upgrade
+
+FTS_TABLE = 'movie_fts'
+# 参与检索的字段及其 bm25 权重（标题权重最高）
+FTS_FIELDS = ('title', 'original_title', 'director', 'actors', 'description')
+FTS_WEIGHTS = (10.0, 6.0, 4.0, 3.0, 1.0)
+# 排序时评分的混合系数：bm25 越小越相关，减去 评分*系数 让高分电影靠前
+RATING_WEIGHT = 0.5
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(r'[%s]+|[^\W_%s]+' % (_CJK, _CJK))
+_CJK_RE = re.compile(r'[%s]' % _CJK)
+
+_fts = table(FTS_TABLE, column('rowid'))
+# 已启用全文检索的数据库引擎：按应用各自的引擎区分，同一进程中的多个应用（如测试库与正式库）互不影响
+_engines = weakref.WeakSet()
+
+
+def is_enabled(bind=None):
+    """bind（连接或引擎，默认当前应用的引擎）所在的数据库是否启用了全文检索"""
+    return (db.engine if bind is None else bind.engine) in _engines
+
+
+def _split(value):
+    return _TOKEN_RE.findall(value or '')
+
+
+def tokenize_for_index(value):
+    """把字段文本切成索引用的词串：中文输出单字和二元组，西文输出小写单词"""
+    tokens = []
+    for run in _split(value):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return ' '.join(tokens)
+
+
+def build_match_query(q):
+    """把用户输入转换成 FTS5 MATCH 表达式，无可检索词时返回 None"""
+    runs = _split(q)
+    terms = []
+    for i, run in enumerate(runs):
+        if _CJK_RE.match(run):
+            grams = [run] if len(run) == 1 else [run[j:j + 2] for j in range(len(run) - 1)]
+            terms.extend('"%s"' % g for g in grams)
+        else:
+            term = '"%s"' % run.lower().replace('"', '""')
+            # 最后一个西文词按前缀匹配，方便边输入边搜索
+            if i == len(runs) - 1:
+                term += '*'
+            terms.append(term)
+    return ' AND '.join(terms) if terms else None
+
+
+def _index_row(connection, movie):
+    connection.execute(text('DELETE FROM %s WHERE rowid = :id' % FTS_TABLE), {'id': movie.id})
+    values = {f: tokenize_for_index(getattr(movie, f)) for f in FTS_FIELDS}
+    values['id'] = movie.id
+    connection.execute(
+        text('INSERT INTO %s (rowid, %s) VALUES (:id, %s)' % (
+            FTS_TABLE, ', '.join(FTS_FIELDS), ', '.join(':' + f for f in FTS_FIELDS))),
+        values)
+
+
+# 电影增删改时在同一事务内同步索引
+@event.listens_for(Movie, 'after_insert')
+def _index_movie(mapper, connection, movie):
+    if is_enabled(connection):
+        _index_row(connection, movie)
+
+
+@event.listens_for(Movie, 'after_update')
+def _reindex_movie(mapper, connection, movie):
+    # 只改评分等非检索字段时不必重写索引
+    state = inspect(movie)
+    if is_enabled(connection) and any(state.attrs[f].history.has_changes() for f in FTS_FIELDS):
+        _index_row(connection, movie)
+
+
+@event.listens_for(Movie, 'after_delete')
+def _remove_movie(mapper, connection, movie):
+    if is_enabled(connection):
+        connection.execute(text('DELETE FROM %s WHERE rowid = :id' % FTS_TABLE), {'id': movie.id})
+
+
+def _insert_index(rows):
+    """rows 为 (id, 各检索字段值) 元组，批量写入索引"""
+    insert = text('INSERT INTO %s (rowid, %s) VALUES (:id, %s)' % (
+        FTS_TABLE, ', '.join(FTS_FIELDS), ', '.join(':' + f for f in FTS_FIELDS)))
+    db.session.connection().execute(insert, [
+        dict({'id': r[0]}, **{f: tokenize_for_index(v) for f, v in zip(FTS_FIELDS, r[1:])})
+        for r in rows])
+
+
+def _index_from(last_id, batch_size):
+    """为 id > last_id 的电影写入索引，返回写入数"""
+    fields = [getattr(Movie, f) for f in FTS_FIELDS]
+    total = 0
+    while True:
+        rows = db.session.query(Movie.id, *fields).filter(Movie.id > last_id) \
+            .order_by(Movie.id).limit(batch_size).all()
+        if not rows:
+            break
+        _insert_index(rows)
+        total += len(rows)
+        last_id = rows[-1][0]
+    return total
+
+
+def rebuild_index(batch_size=1000):
+    """从 movie 表全量重建索引，返回写入的电影数"""
+    db.session.connection().execute(text('DELETE FROM %s' % FTS_TABLE))
+    total = _index_from(0, batch_size)
+    db.session.commit()
+    return total
+
+
+def index_movies(movies):
+    """批量插入（不触发模型事件）后为这些电影补写索引；movies 为含 id 与检索字段的字典，调用方负责提交"""
+    if not movies or not is_enabled():
+        return 0
+    _insert_index([(m['id'], *[m.get(f) for f in FTS_FIELDS]) for m in movies])
+    return len(movies)
+
+
+def _index_exists():
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {'n': FTS_TABLE}).first() is not None
+
+
+@after_upgrade
+def ensure_index():
+    """创建索引表并从现有电影回填；已存在或不是 SQLite 时跳过"""
+    if db.engine.dialect.name != 'sqlite' or _index_exists():
+        return
+    try:
+        db.session.connection().execute(text(
+            "CREATE VIRTUAL TABLE %s USING fts5(%s, tokenize='unicode61 remove_diacritics 2')"
+            % (FTS_TABLE, ', '.join(FTS_FIELDS))))
+    except Exception as e:
+        # 编译时未启用 FTS5 的 SQLite，退回 LIKE 检索
+        current_app.logger.warning('FTS5 不可用，电影搜索退回 LIKE 模式: %s', e)
+        db.session.rollback()
+        return
+    rebuild_index()
+
+
+def init_search(app):
+    """索引表（由 migrations.setup_schema 创建）存在时启用全文检索，否则退回 LIKE"""
+    if db.engine.dialect.name != 'sqlite' or not _index_exists():
+        _engines.discard(db.engine)
+        return
+    _engines.add(db.engine)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """重建电影全文索引"""
+        print(f'已索引 {rebuild_index()} 部电影')
+
+
+def like_filter(q):
+    """旧的 LIKE 检索条件，FTS5 不可用时使用"""
+    return or_(*[getattr(Movie, f).contains(q) for f in FTS_FIELDS])
+
+
+def search_statement(q, genre=None, year=None, columns=(Movie,)):
+    """构造检索语句（按相关度与评分混合排序），columns 可只选部分列"""
+    stmt = select(*columns)
+    if genre:
+        stmt = stmt.where(Movie.genre == genre)
+    if year:
+        stmt = stmt.where(Movie.release_year == year)
+    match = build_match_query(q) if q else None
+    if match and is_enabled():
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        stmt = stmt.join(_fts, _fts.c.rowid == Movie.id) \
+            .where(text('%s MATCH :match' % FTS_TABLE).bindparams(match=match)) \
+            .order_by(text('bm25(%s, %s) - %s * coalesce(movie.rating, 0)'
+                           % (FTS_TABLE, weights, RATING_WEIGHT)))
+    else:
+        if q:
+            stmt = stmt.where(like_filter(q))
+        stmt = stmt.order_by(Movie.rating.desc())
+    return stmt
+
+
+def search_movies(q, genre=None, year=None, page=1, per_page=20, fields=None):
+    """检索电影，返回 Flask-SQLAlchemy 分页对象；fields 指定时电影对象只加载这些列"""
+    stmt = search_statement(q, genre, year)
+    if fields:
+        stmt = stmt.options(load_only(*[getattr(Movie, f) for f in fields]))
+    return db.paginate(stmt, page=page, per_page=per_page, error_out=False)
@@ -0,0 +1,147 @@
+"""接口序列化
+
+``Schema`` 声明某个模型在接口中返回的字段：``query()`` / ``select()`` 只查询这些列，
+结果是普通的行元组而不是 ORM 对象（不做身份映射与属性加载），``dump()`` 把行转成字典。
+字段可以是列名，也可以是 ``名称=SQL 表达式``（如昵称为空时取用户名）。
+
+``init_serialization(app)`` 安装 JSON provider：装有 orjson 时用它编码、解码（比标准库快数倍），
+否则退回标准库。两种情况下 datetime 都输出为 ISO-8601（按 UTC，带 ``+00:00``），
+不再是 Flask 默认的 HTTP 日期格式（``Mon, 01 Jan 2024 00:00:00 GMT``）。
+
+``stream_array`` 按主键分批查询、逐块输出 ``{"键": [...]}``，大列表不必一次放进内存。
+"""
+from datetime import date, datetime, timezone
+
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func, select
+
+from models import db, Log, News, User
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库 json
+    orjson = None
+
+# stream_array 每批查询的行数
+STREAM_BATCH = 1000
+
+
+class Schema:
+    """模型的接口字段声明"""
+
+    def __init__(self, model, *fields, **expressions):
+        self.model = model
+        self._columns = [(f, getattr(model, f)) for f in fields] + \
+                        [(name, expr.label(name)) for name, expr in expressions.items()]
+        self.fields = tuple(name for name, _ in self._columns)
+
+    def only(self, *fields):
+        """只保留部分字段的新 Schema"""
+        schema = Schema(self.model)
+        schema._columns = [(name, column) for name, column in self._columns if name in fields]
+        schema.fields = tuple(name for name, _ in schema._columns)
+        return schema
+
+    @property
+    def columns(self):
+        return [column for _, column in self._columns]
+
+    def query(self, *extra):
+        """只查询声明字段的 Query（可直接用于 keyset_page / paginate）；extra 为额外查询、不输出的列"""
+        return db.session.query(*self.columns, *extra)
+
+    def select(self, *extra):
+        return select(*self.columns, *extra)
+
+    def dump(self, row):
+        return dict(zip(self.fields, row))
+
+    def dump_all(self, rows):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+
+# --- 各接口返回的字段 ---
+NEWS = Schema(News, 'id', 'title', 'content', 'created_at')
+LOG = Schema(Log, 'id', 'content', 'visible', 'created_at')
+# 好友空间只展示可见日志，不返回 visible
+PUBLIC_LOG = LOG.only('id', 'content', 'created_at')
+USER_PROFILE = Schema(User, 'id', 'username', 'nickname', 'avatar', 'tags')
+USER_ADMIN = Schema(User, 'id', 'username', 'role', 'nickname')
+# 用户搜索列表：昵称为空时显示用户名
+USER_SUMMARY = Schema(User, 'id', 'username', 'tags',
+                      nickname=func.coalesce(func.nullif(User.nickname, ''), User.username))
+
+
+def _utc(value):
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """datetime 输出 ISO-8601；装有 orjson 时由它编码与解码"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return _utc(o).isoformat()
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _encode(self, obj, indent=False):
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def stream_array(key, schema, query, id_column, batch_size=STREAM_BATCH):
+    """流式返回 ``{key: [...]}``：按 id_column 升序每次查询 batch_size 行并逐块输出
+
+    query 为 ``schema.select()`` 加上过滤条件的语句，结果中须包含 id_column。
+    """
+    dumps = current_app.json.dumps
+    index = schema.fields.index(id_column.key)
+    query = query.order_by(id_column).limit(batch_size)
+
+    def generate():
+        yield f'{{{dumps(key)}:['
+        last_id, first = None, True
+        while True:
+            stmt = query if last_id is None else query.where(id_column > last_id)
+            rows = db.session.execute(stmt).all()
+            if not rows:
+                break
+            # 整批编码成数组再去掉首尾的方括号
+            chunk = dumps(schema.dump_all(rows))[1:-1]
+            yield chunk if first else ',' + chunk
+            first, last_id = False, rows[-1][index]
+        yield ']}\n'
+
+    return Response(stream_with_context(generate()), mimetype=current_app.json.mimetype)
+
+
+def init_serialization(app):
+    """安装 JSON provider"""
+    app.json_provider_class = JSONProvider
+    app.json = JSONProvider(app)
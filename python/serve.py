@@ -0,0 +1,103 @@
+"""生产环境 WSGI 启动（替代 ``python app.py`` 的开发服务器）
+
+用法（在 python/ 目录下运行）:
+    python serve.py --port 8000 --threads 16
+    uvicorn asgi:application --port 8000 --workers 4     # ASGI 模式，见 asgi.py
+
+配置按环境变量 APP_CONFIG 选择（见 config.py）。多进程部署时先执行一次 ``flask --app app db-upgrade``，
+再以 ``APP_CONFIG=production`` 启动各进程，避免每个进程启动时都检查表结构。
+
+装有 waitress 时使用 waitress（多线程、带请求缓冲），否则退回 werkzeug 多线程服务器。
+多核机器可用进程管理器（systemd、supervisor 等）启动多个进程分别监听，或改用 ASGI 模式的 --workers。
+
+收到 SIGTERM / SIGINT 时优雅关闭：停止接收新连接，等待进行中的请求结束（最多 --grace 秒），
+再停止后台任务线程（等当前任务执行完）并释放数据库连接。
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+DEFAULT_THREADS = 16
+
+
+def run_waitress(app, host, port, threads, grace):
+    from waitress import create_server
+    server = create_server(app, host=host, port=port, threads=threads, channel_timeout=grace)
+
+    def stop(signum, frame):
+        server.close()
+        # 不取消已排队的请求，等待工作线程处理完
+        server.task_dispatcher.shutdown(cancel_pending=False, timeout=grace)
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.run()
+    except SystemExit:
+        pass
+
+
+def run_werkzeug(app, host, port, threads, grace):
+    from werkzeug.serving import make_server
+    server = make_server(host, port, app, threaded=True)
+    # 关闭时等待请求线程结束，而不是随主线程退出被中断
+    server.daemon_threads = False
+    server.block_on_close = True
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever()
+    deadline = time.monotonic() + grace
+    for thread in list(getattr(server, '_threads', None) or []):
+        thread.join(max(0, deadline - time.monotonic()))
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', DEFAULT_THREADS)),
+                        help='处理请求的线程数')
+    parser.add_argument('--grace', type=float, default=float(os.environ.get('SHUTDOWN_TIMEOUT', 30)),
+                        help='关闭时等待进行中的请求与后台任务的秒数')
+    parser.add_argument('--server', choices=['auto', 'waitress', 'werkzeug'], default='auto')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app
+    from models import db
+    import background
+    import tasks
+
+    app = create_app()
+    server = args.server
+    if server == 'auto':
+        try:
+            import waitress  # noqa: F401
+            server = 'waitress'
+        except ImportError:
+            server = 'werkzeug'
+    app.logger.info('%s 监听 %s:%d，%d 个线程', server, args.host, args.port, args.threads)
+    runner = run_waitress if server == 'waitress' else run_werkzeug
+    runner(app, args.host, args.port, args.threads, args.grace)
+
+    if not tasks.stop_workers(args.grace):
+        app.logger.warning('关闭时仍有后台任务未执行完，租约过期后由工作线程重新领取执行')
+    background.stop(app, args.grace)
+    with app.app_context():
+        db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""站点统计服务
+
+计数器保存在 ``stat_counter`` 表中，由模型的插入/更新/删除事件在同一事务内增减，
+读取统计只需按主键取少量计数器，与会员、评论总量无关。
+计数器缺失或被怀疑不准时可用 ``rebuild_counters()``（命令 ``rebuild-stats``）按分组查询重算。
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, inspect, or_
+
+from models import db, StatCounter, User, MemberApplication, Movie, MovieEvent, MovieReview
+from bulk import add_counts
+from cache import cached_query
+from migrations import after_upgrade
+
+# 按字段取值分组的计数器：(名称前缀, 模型, 字段, 字段为空时的默认值)
+GROUPED = [
+    ('users:role:', User, 'role', 'member'),
+    ('applications:status:', MemberApplication, 'status', 'pending'),
+    ('events:status:', MovieEvent, 'status', 'upcoming'),
+]
+
+
+def _bump(connection, name, delta):
+    # 单条 upsert：并发创建同一个新计数器时不会撞主键
+    add_counts(StatCounter, ('name',), [{'name': name, 'value': delta}], connection)
+
+
+def _track(model, key_fn, field=None):
+    """模型插入/删除时增减 key_fn(对象) 对应的计数器；field 变化时在新旧计数器之间转移"""
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        _bump(connection, key_fn(target), 1)
+
+    @event.listens_for(model, 'after_delete')
+    def _deleted(mapper, connection, target):
+        _bump(connection, key_fn(target), -1)
+
+    if field:
+        @event.listens_for(model, 'after_update')
+        def _updated(mapper, connection, target):
+            history = inspect(target).attrs[field].history
+            if history.deleted and history.added:
+                old, new = key_fn(target, history.deleted[0]), key_fn(target)
+                if old != new:
+                    _bump(connection, old, -1)
+                    _bump(connection, new, 1)
+
+
+def _grouped_key(prefix, field, default):
+    def key_fn(target, value=None):
+        value = getattr(target, field) if value is None else value
+        return prefix + (value or default)
+    return key_fn
+
+
+for _prefix, _model, _field, _default in GROUPED:
+    _track(_model, _grouped_key(_prefix, _field, _default), _field)
+_track(Movie, lambda m: 'movies:total')
+_track(MovieReview, lambda r: 'reviews:day:' + (r.created_at or datetime.utcnow()).strftime('%Y-%m-%d'))
+
+
+def adjust(name, delta):
+    """批量写入（不触发模型事件）时手动增减计数器，调用方负责提交"""
+    _bump(db.session.connection(), name, delta)
+
+
+def rebuild_counters():
+    """用分组查询重算全部计数器，返回计数器个数"""
+    counters = {}
+    for prefix, model, field, default in GROUPED:
+        column = func.coalesce(getattr(model, field), default)
+        for key, count in db.session.query(column, func.count()).group_by(column):
+            counters[prefix + key] = count
+    counters['movies:total'] = db.session.query(func.count(Movie.id)).scalar()
+    day = func.date(MovieReview.created_at)
+    for key, count in db.session.query(day, func.count()).filter(MovieReview.created_at.isnot(None)).group_by(day):
+        counters['reviews:day:' + str(key)] = count
+    db.session.execute(StatCounter.__table__.delete())
+    db.session.add_all(StatCounter(name=k, value=v) for k, v in counters.items())
+    db.session.commit()
+    return len(counters)
+
+
+def _prefixed(rows, prefix):
+    return {r.name[len(prefix):]: r.value for r in rows if r.name.startswith(prefix)}
+
+
+@cached_query('site_stats', ['admin_stats'], timeout=10)
+def summary(days=30):
+    """统计概况：各计数器 + 最近 days 天每日评论数 + 即将开始活动的报名人数"""
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    rows = StatCounter.query.filter(or_(~StatCounter.name.startswith('reviews:day:'),
+                                        StatCounter.name >= 'reviews:day:' + since)).all()
+    users_by_role = _prefixed(rows, 'users:role:')
+    applications = _prefixed(rows, 'applications:status:')
+    events_by_status = _prefixed(rows, 'events:status:')
+    upcoming = MovieEvent.query.filter_by(status='upcoming').order_by(MovieEvent.event_date).limit(20).all()
+    return {
+        'users_by_role': users_by_role,
+        'total_users': sum(users_by_role.values()),
+        'applications_by_status': applications,
+        'pending_applications': applications.get('pending', 0),
+        'events_by_status': events_by_status,
+        'total_events': sum(events_by_status.values()),
+        'total_movies': _prefixed(rows, 'movies:').get('total', 0),
+        'reviews_per_day': _prefixed(rows, 'reviews:day:'),
+        'registrations_per_event': [
+            {'event_id': e.id, 'title': e.title, 'current_participants': e.current_participants or 0,
+             'max_participants': e.max_participants} for e in upcoming],
+    }
+
+
+@after_upgrade
+def backfill_counters():
+    """计数器表为空（刚升级）时回填"""
+    if not db.session.query(StatCounter.name).first():
+        rebuild_counters()
+
+
+def init_stats(app):
+    """注册重算命令"""
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """按分组查询重算统计计数器"""
+        print(f'已重算 {rebuild_counters()} 个计数器')
@@ -0,0 +1,238 @@
+"""好友关系图与好友推荐
+
+``friendship`` 表是有向边（user_id 关注 friend_id）。开启 ``SYMMETRIC_FRIENDSHIPS`` 后，
+添加/删除好友会同时写入/删除反向边，即双向好友；已有数据可用 ``symmetrize-friendships`` 补齐。
+
+推荐“好友的好友”：按共同好友数排序，结果存入 ``friend_suggestion`` 表，接口只读这张表。
+    - 批量：``build-friend-suggestions`` 把整张边表载入 CSR 结构（array 数组，约 4 字节/边）后逐个用户计算
+    - 增量：好友关系变化后，后台任务 ``refresh_friend_suggestions`` 用 SQL 重算受影响的用户
+      （边 a→b 变化时，a 以及所有关注 a 的用户的推荐会变化）
+"""
+import os
+import time
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.orm import aliased
+
+from models import db, Friendship, FriendSuggestion
+from bulk import insert_ignore
+import feed
+from tasks import enqueue, task
+
+# 每个用户保存的推荐数
+MAX_SUGGESTIONS = 20
+symmetric = False
+
+
+class SocialGraph:
+    """压缩稀疏行（CSR）存储的关注关系：用户 i 的好友为 indices[indptr[i]:indptr[i+1]]（已排序）"""
+
+    def __init__(self, user_ids, indptr, indices):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, edges):
+        """由 (user_id, friend_id) 序列构建，重复边只保留一条"""
+        edges = sorted(set(edges))
+        user_ids = array('q', sorted({u for e in edges for u in e}))
+        position = {uid: i for i, uid in enumerate(user_ids)}
+        indptr = array('q', [0]) * (len(user_ids) + 1)
+        indices = array('i', [0]) * len(edges)
+        for n, (u, f) in enumerate(edges):
+            indptr[position[u] + 1] += 1
+            indices[n] = position[f]
+        for i in range(len(user_ids)):
+            indptr[i + 1] += indptr[i]
+        return cls(user_ids, indptr, indices)
+
+    @classmethod
+    def load(cls):
+        """从数据库载入全部边"""
+        return cls.from_edges(db.session.query(Friendship.user_id, Friendship.friend_id)
+                              .filter(Friendship.user_id.isnot(None), Friendship.friend_id.isnot(None))
+                              .yield_per(50000))
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.user_ids, self.indptr, self.indices))
+
+    def _pos(self, user_id):
+        i = bisect_left(self.user_ids, user_id)
+        return i if i < len(self.user_ids) and self.user_ids[i] == user_id else None
+
+    def _row(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def friends(self, user_id):
+        i = self._pos(user_id)
+        return [self.user_ids[j] for j in self._row(i)] if i is not None else []
+
+    def mutual_count(self, a, b):
+        """a、b 共同关注的人数（有序数组归并）"""
+        i, j = self._pos(a), self._pos(b)
+        if i is None or j is None:
+            return 0
+        x, y = self._row(i), self._row(j)
+        p = q = count = 0
+        while p < len(x) and q < len(y):
+            if x[p] == y[q]:
+                count += 1
+                p += 1
+                q += 1
+            elif x[p] < y[q]:
+                p += 1
+            else:
+                q += 1
+        return count
+
+    def suggestions(self, user_id, limit=MAX_SUGGESTIONS):
+        """好友的好友中尚未关注的人，返回 [(用户 id, 共同好友数)]，按共同好友数降序"""
+        i = self._pos(user_id)
+        if i is None:
+            return []
+        own = self._row(i)
+        counts = {}
+        for f in own:
+            for w in self._row(f):
+                counts[w] = counts.get(w, 0) + 1
+        counts.pop(i, None)
+        for f in own:
+            counts.pop(f, None)
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], self.user_ids[item[0]]))[:limit]
+        return [(self.user_ids[w], c) for w, c in ranked]
+
+
+# --- SQL 计算（增量刷新、未预计算时的后备） ---
+def query_suggestions(user_id, limit=MAX_SUGGESTIONS):
+    """用一条 SQL 计算单个用户的推荐，结果与 SocialGraph.suggestions 一致"""
+    first, second = aliased(Friendship), aliased(Friendship)
+    own = select(Friendship.friend_id).where(Friendship.user_id == user_id, Friendship.friend_id.isnot(None))
+    mutual = func.count().label('mutual')
+    rows = db.session.query(second.friend_id, mutual).select_from(first) \
+        .join(second, second.user_id == first.friend_id) \
+        .filter(first.user_id == user_id, second.friend_id != user_id, second.friend_id.notin_(own)) \
+        .group_by(second.friend_id).order_by(mutual.desc(), second.friend_id).limit(limit)
+    return [(suggested_id, count) for suggested_id, count in rows]
+
+
+def _store(user_id, suggestions):
+    db.session.execute(delete(FriendSuggestion).where(FriendSuggestion.user_id == user_id))
+    if suggestions:
+        db.session.execute(insert(FriendSuggestion), [
+            {'user_id': user_id, 'suggested_id': s, 'mutual_count': c} for s, c in suggestions])
+
+
+def suggestions_for(user_id, limit=MAX_SUGGESTIONS):
+    """读取预计算的推荐；该用户还没有计算过时现算（不落库）"""
+    rows = db.session.query(FriendSuggestion.suggested_id, FriendSuggestion.mutual_count) \
+        .filter_by(user_id=user_id).order_by(FriendSuggestion.mutual_count.desc(),
+                                             FriendSuggestion.suggested_id).limit(limit).all()
+    if rows:
+        return [tuple(row) for row in rows]
+    return query_suggestions(user_id, limit)
+
+
+@task('refresh_friend_suggestions')
+def refresh_friend_suggestions(changed_id):
+    """changed_id 的关注列表变化后，重算其本人及所有关注他的用户的推荐"""
+    affected = [changed_id] + [u for (u,) in db.session.query(Friendship.user_id)
+                               .filter(Friendship.friend_id == changed_id, Friendship.user_id.isnot(None))]
+    for start in range(0, len(affected), 500):
+        for uid in affected[start:start + 500]:
+            _store(uid, query_suggestions(uid))
+        db.session.commit()
+    return {'refreshed': len(affected)}
+
+
+def build_all(graph=None):
+    """用内存图批量重算全部用户的推荐，返回 (用户数, 推荐条数)"""
+    graph = graph or SocialGraph.load()
+    db.session.execute(delete(FriendSuggestion))
+    rows = []
+    for user_id in graph.user_ids:
+        rows += [{'user_id': user_id, 'suggested_id': s, 'mutual_count': c} for s, c in graph.suggestions(user_id)]
+        if len(rows) >= 20000:
+            db.session.execute(insert(FriendSuggestion), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(FriendSuggestion), rows)
+    db.session.commit()
+    return len(graph.user_ids), db.session.query(func.count()).select_from(FriendSuggestion).scalar()
+
+
+# --- 好友关系写入口 ---
+def _pairs(user_id, friend_ids):
+    pairs = [(user_id, f) for f in friend_ids]
+    return pairs + [(f, user_id) for f in friend_ids] if symmetric else pairs
+
+
+def add_friendships(user_id, friend_ids):
+    """批量添加好友（双向模式下同时添加反向边），已存在的边跳过，返回新添加的好友 id 集合；调用方负责提交"""
+    created = insert_ignore(Friendship, [{'user_id': a, 'friend_id': b} for a, b in _pairs(user_id, friend_ids)],
+                            ('user_id', 'friend_id'))
+    for changed_id in sorted({a for a, _ in created}):
+        enqueue('refresh_friend_suggestions', user_id=user_id, changed_id=changed_id)
+    for a, b in created:
+        enqueue('backfill_timeline', user_id=user_id, follower_id=a, author_id=b)
+    return {b for a, b in created if a == user_id}
+
+
+def remove_friendships(user_id, friend_ids):
+    """批量删除好友（双向模式下同时删除反向边），返回被删除的好友 id 集合；调用方负责提交"""
+    pairs = _pairs(user_id, friend_ids)
+    if not pairs:
+        return set()
+    removed = [tuple(row) for row in db.session.execute(
+        delete(Friendship).where(tuple_(Friendship.user_id, Friendship.friend_id).in_(pairs))
+        .returning(Friendship.user_id, Friendship.friend_id).execution_options(synchronize_session=False))]
+    for changed_id in sorted({a for a, _ in removed}):
+        enqueue('refresh_friend_suggestions', user_id=user_id, changed_id=changed_id)
+    for a, b in removed:
+        feed.drop_timeline(a, b)
+    return {b for a, b in removed if a == user_id}
+
+
+def add_friendship(user_id, friend_id):
+    """添加好友，返回是否新建；调用方负责提交"""
+    return friend_id in add_friendships(user_id, [friend_id])
+
+
+def remove_friendship(user_id, friend_id):
+    """删除好友，返回是否删除；调用方负责提交"""
+    return friend_id in remove_friendships(user_id, [friend_id])
+
+
+def symmetrize():
+    """为每条单向边补上反向边，返回补上的条数"""
+    reverse = aliased(Friendship)
+    missing = db.session.query(Friendship.friend_id, Friendship.user_id) \
+        .outerjoin(reverse, (reverse.user_id == Friendship.friend_id) & (reverse.friend_id == Friendship.user_id)) \
+        .filter(reverse.id.is_(None), Friendship.user_id.isnot(None), Friendship.friend_id.isnot(None),
+                Friendship.user_id != Friendship.friend_id).distinct().all()
+    if missing:
+        db.session.execute(insert(Friendship), [{'user_id': a, 'friend_id': b} for a, b in missing])
+    db.session.commit()
+    return len(missing)
+
+
+def init_social(app):
+    global symmetric
+    symmetric = str(app.config.get('SYMMETRIC_FRIENDSHIPS', os.environ.get('SYMMETRIC_FRIENDSHIPS', ''))) \
+        .lower() in ('1', 'true', 'yes')
+
+    @app.cli.command('build-friend-suggestions')
+    def build_friend_suggestions_command():
+        """载入好友关系图并重算全部好友推荐"""
+        started = time.perf_counter()
+        graph = SocialGraph.load()
+        users, rows = build_all(graph)
+        print(f'{users} 个用户，{len(graph.indices)} 条关系（{graph.nbytes() / 1024 / 1024:.1f}MB），'
+              f'写入 {rows} 条推荐，耗时 {time.perf_counter() - started:.1f}s')
+
+    @app.cli.command('symmetrize-friendships')
+    def symmetrize_friendships_command():
+        """补齐反向好友关系（开启双向好友前执行一次）"""
+        print(f'补充了 {symmetrize()} 条反向关系，请再执行 build-friend-suggestions')
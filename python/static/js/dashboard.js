@@ -1,29 +1,47 @@
 // 会员空间页面JavaScript功能
 
-// 用户搜索功能
-let allUsers = [];
+// 用户搜索功能：服务端筛选 + 游标分页，按需加载
+let loadedUsers = [];
+let nextCursor = null;
+let currentKeyword = '';
+let searchTimer = null;
+let requestSeq = 0;
 
-// 页面加载时获取所有用户
-window.addEventListener('load', function() {
-    fetch('/user/users')
+function fetchUsers(keyword, cursor) {
+    const params = new URLSearchParams({ limit: 20 });
+    if (keyword) params.set('q', keyword);
+    if (cursor) params.set('cursor', cursor);
+    const seq = ++requestSeq;
+    return fetch('/user/users?' + params.toString())
         .then(response => response.json())
         .then(data => {
-            allUsers = data.users;
-            displayUsers(allUsers);
+            // 忽略过期请求的结果（输入变化后先发出的请求可能后返回）
+            if (seq !== requestSeq) return;
+            loadedUsers = cursor ? loadedUsers.concat(data.items) : data.items;
+            nextCursor = data.next_cursor;
+            displayUsers(loadedUsers);
+            document.getElementById('loadMoreUsers').style.display = nextCursor ? '' : 'none';
         })
         .catch(error => {
             console.error('获取用户列表失败:', error);
         });
+}
+
+// 页面加载时获取第一页用户
+window.addEventListener('load', function() {
+    fetchUsers('', null);
 });
 
-// 搜索输入框事件
+// 搜索输入框事件（防抖后请求服务端）
 document.getElementById('searchInput').addEventListener('input', function() {
-    const searchTerm = this.value.toLowerCase();
-    const filteredUsers = allUsers.filter(user => 
-        user.username.toLowerCase().includes(searchTerm) || 
-        user.nickname.toLowerCase().includes(searchTerm)
-    );
-    displayUsers(filteredUsers);
+    currentKeyword = this.value.trim();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => fetchUsers(currentKeyword, null), 250);
+});
+
+// 加载下一页
+document.getElementById('loadMoreUsers').addEventListener('click', function() {
+    if (nextCursor) fetchUsers(currentKeyword, nextCursor);
 });
 
 // 显示用户列表
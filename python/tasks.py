@@ -0,0 +1,323 @@
+"""后台任务队列
+
+任务持久化在 ``job`` 表中，视图里用 ``enqueue('任务名', **参数)`` 提交（随请求事务一起提交），
+由工作线程领取执行，失败按指数退避重试，超过次数标记为 failed。
+
+工作线程有两种运行方式：
+    - 应用进程内：``TASK_WORKERS``（默认 2）个线程，提交任务后通过本地 broker 立即唤醒
+    - 独立进程：``flask --app app run-worker``（此时可把 TASK_WORKERS 设为 0）
+
+本地 broker 只负责唤醒等待中的线程，任务本身始终以数据库为准，
+多进程部署时各工作进程轮询数据库，用条件更新保证一个任务只被领取一次。
+执行中的任务每隔租约（``TASK_LEASE_SECONDS``，默认 600 秒）的三分之一续租一次；
+工作进程被杀或关闭超时时任务停在 running，租约过期后由其它工作线程重新领取执行。
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, g, jsonify
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session
+
+from models import db, Job
+from auth import login_required, role_required
+import background
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+POLL_INTERVAL = 1.0
+# 第 n 次失败后等待 RETRY_BASE * 2^(n-1) 秒再重试
+RETRY_BASE = 2
+# 任务领取后超过该秒数仍为 running，视为执行它的进程已退出
+LEASE_SECONDS = 600
+
+TASKS = {}
+# 任务最终失败（不再重试）时调用的清理函数：任务名 -> 函数，参数与任务相同
+ON_FAILURE = {}
+# 本进程启动的工作线程：[(stop_event, 线程列表)]
+_running = []
+
+tasks_bp = Blueprint('tasks', __name__)
+
+
+def task(name, max_attempts=3, on_failure=None):
+    """注册任务函数，函数在应用上下文中以关键字参数调用，返回值需可 JSON 序列化
+
+    on_failure 在任务最终失败后以同样的参数调用，用于清理任务留下的文件等。
+    """
+    def decorator(fn):
+        TASKS[name] = (fn, max_attempts)
+        if on_failure:
+            ON_FAILURE[name] = on_failure
+        return fn
+    return decorator
+
+
+class LocalBroker:
+    """进程内的唤醒通知，可替换为 Redis 等消息通道"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        with self._cond:
+            self._cond.wait(timeout)
+
+
+broker = LocalBroker()
+
+
+class Metrics:
+    """进程内任务指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = {}
+        self.failed = {}
+        self.retried = {}
+        self.latencies = []  # 最近的 (排队到完成) 秒数
+
+    def record(self, name, outcome, latency=None):
+        with self._lock:
+            bucket = {'done': self.completed, 'failed': self.failed, 'retry': self.retried}[outcome]
+            bucket[name] = bucket.get(name, 0) + 1
+            if latency is not None:
+                self.latencies.append(latency)
+                del self.latencies[:-1000]
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        pick = (lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)) \
+            if latencies else (lambda p: None)
+        return {'completed': dict(self.completed), 'failed': dict(self.failed), 'retried': dict(self.retried),
+                'latency_seconds': {'p50': pick(0.5), 'p95': pick(0.95), 'max': pick(1.0)}}
+
+
+metrics = Metrics()
+
+
+def enqueue(name, user_id=None, **kwargs):
+    """提交任务（加入当前会话，随调用方的事务提交），返回 Job 对象"""
+    if name not in TASKS:
+        raise KeyError(f'未注册的任务: {name}')
+    job = Job(name=name, payload=json.dumps(kwargs), user_id=user_id, status=QUEUED,
+              max_attempts=TASKS[name][1], available_at=datetime.utcnow())
+    db.session.add(job)
+    db.session.flush()
+    db.session.info['wake_workers'] = True
+    return job
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    if session.info.pop('wake_workers', None):
+        broker.notify()
+
+
+def _lease_seconds():
+    return int(current_app.config.get('TASK_LEASE_SECONDS', os.environ.get('TASK_LEASE_SECONDS', LEASE_SECONDS)))
+
+
+def _claim():
+    """领取一个可执行的任务（含租约过期的 running 任务），返回任务 id，没有则返回 None"""
+    now = datetime.utcnow()
+    expiry = now - timedelta(seconds=_lease_seconds())
+    while True:
+        # 只领取本进程注册过的任务，其它任务留给能执行它的进程
+        row = db.session.query(Job.id, Job.status, Job.started_at, Job.attempts, Job.max_attempts).filter(
+            Job.name.in_(list(TASKS)),
+            or_(and_(Job.status == QUEUED, Job.available_at <= now),
+                and_(Job.status == RUNNING, Job.started_at < expiry))) \
+            .order_by(Job.id).limit(1).first()
+        if row is None:
+            db.session.rollback()
+            return None
+        job_id, status, started_at, attempts, max_attempts = row
+        # 条件带上读到的状态与领取时间，并发领取同一任务时只有一个能更新成功
+        match = Job.query.filter_by(id=job_id, status=status, started_at=started_at)
+        if status == RUNNING and attempts >= max_attempts:
+            failed = match.update({'status': FAILED, 'finished_at': now,
+                                   'last_error': '租约过期：执行该任务的进程已退出'}, synchronize_session=False)
+            db.session.commit()
+            if failed:
+                _cleanup(db.session.get(Job, job_id))
+            continue
+        claimed = match.update({'status': RUNNING, 'started_at': now, 'attempts': Job.attempts + 1},
+                               synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return job_id
+
+
+def _cleanup(job):
+    """任务最终失败后调用注册的清理函数，清理出错只记录日志"""
+    cleanup = ON_FAILURE.get(job.name)
+    if cleanup is None:
+        return
+    try:
+        cleanup(**json.loads(job.payload or '{}'))
+    except Exception:
+        current_app.logger.exception('任务 %s 失败后的清理出错', job.name)
+
+
+def _heartbeat(app, job_id, stop_event, interval):
+    """任务执行期间定期续租（刷新 started_at），长任务不会被其它工作线程当作过期任务重复执行"""
+    while not stop_event.wait(interval):
+        with app.app_context():
+            try:
+                Job.query.filter_by(id=job_id, status=RUNNING).update(
+                    {'started_at': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                app.logger.exception('任务续租失败')
+            finally:
+                db.session.remove()
+
+
+def run_one():
+    """领取并执行一个任务，返回是否执行了任务（需在应用上下文中调用）"""
+    job_id = _claim()
+    if job_id is None:
+        return False
+    job = db.session.get(Job, job_id)
+    fn, _ = TASKS.get(job.name, (None, 0))
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(current_app._get_current_object(), job_id, stop_heartbeat,
+                                              _lease_seconds() / 3),
+                     name=f'task-heartbeat-{job_id}', daemon=True).start()
+    try:
+        if fn is None:
+            raise KeyError(f'未注册的任务: {job.name}')
+        result = fn(**json.loads(job.payload or '{}'))
+        job = db.session.get(Job, job_id)
+        job.status = DONE
+        job.result = json.dumps(result) if result is not None else None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        metrics.record(job.name, 'done', (job.finished_at - job.created_at).total_seconds())
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = f'{e.__class__.__name__}: {e}\n{traceback.format_exc(limit=5)}'
+        if job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.available_at = datetime.utcnow() + timedelta(seconds=RETRY_BASE * 2 ** (job.attempts - 1))
+            metrics.record(job.name, 'retry')
+        else:
+            job.status = FAILED
+            job.finished_at = datetime.utcnow()
+            metrics.record(job.name, 'failed')
+        db.session.commit()
+        if job.status == FAILED:
+            _cleanup(job)
+    finally:
+        stop_heartbeat.set()
+    return True
+
+
+def work(app, stop_event):
+    """工作循环：有任务就连续执行，没有则等待唤醒或轮询间隔"""
+    while not stop_event.is_set():
+        with app.app_context():
+            try:
+                ran = run_one()
+            except Exception:
+                app.logger.exception('任务执行器异常')
+                ran = False
+            finally:
+                db.session.remove()
+        if not ran:
+            broker.wait(POLL_INTERVAL)
+
+
+def start_workers(app, count):
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=work, args=(app, stop_event), name=f'task-worker-{i}', daemon=True)
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    _running.append((stop_event, threads))
+    return stop_event
+
+
+def stop_workers(timeout=30):
+    """优雅关闭：通知所有工作线程退出，等待正在执行的任务完成，返回是否全部按时退出"""
+    deadline = time.monotonic() + timeout
+    for stop_event, _ in _running:
+        stop_event.set()
+    broker.notify()
+    for _, threads in _running:
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+    finished = not any(t.is_alive() for _, threads in _running for t in threads)
+    _running.clear()
+    return finished
+
+
+def queue_depth():
+    return dict(db.session.query(Job.status, func.count(Job.id)).filter(Job.status.in_([QUEUED, RUNNING]))
+                .group_by(Job.status).all())
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.last_error.splitlines()[0] if job.last_error else None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def init_tasks(app):
+    count = int(app.config.get('TASK_WORKERS', os.environ.get('TASK_WORKERS', 2)))
+    if count and background.enabled(app):
+        start_workers(app, count)
+
+    @app.cli.command('run-worker')
+    def run_worker_command():
+        """在前台运行任务工作进程"""
+        threads = int(os.environ.get('WORKER_THREADS', 4))
+        stop_event = start_workers(app, threads)
+        print(f'任务工作进程已启动（{threads} 个线程），Ctrl+C 退出')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop_event.set()
+
+
+# 任务状态查询：提交者本人或管理员
+@tasks_bp.route('/<int:job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    user_id = g.user_id
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'msg': '任务不存在'}), 404
+    if job.user_id != user_id and g.role != 'admin':
+        return jsonify({'msg': '无权限'}), 403
+    return jsonify(job_to_dict(job))
+
+
+# 队列指标（仅管理员）
+@tasks_bp.route('/metrics', methods=['GET'])
+@role_required('admin')
+def job_metrics():
+    failed_total = db.session.query(func.count(Job.id)).filter(Job.status == FAILED).scalar()
+    return jsonify({'queue_depth': queue_depth(), 'failed_total': failed_total, 'worker': metrics.snapshot()})
@@ -1,47 +1,56 @@
-from flask import Blueprint, request, jsonify, session, render_template
+from flask import Blueprint, request, jsonify, g, render_template, Response, stream_with_context
 from models import db, User, MemberApplication, Movie, MovieEvent
+from cache import invalidate, stats as cache_stats, backend_name
+from pagination import keyset_page
+from tasks import enqueue
+from auth import current_user, revoke_sessions, role_required
+from serialization import USER_ADMIN, stream_array
+import catalog
+import site_stats
 from datetime import datetime
+import os
+import shutil
+import tempfile
 
 admin_bp = Blueprint('admin', __name__)
 
+# 会员管理每页条数
+MEMBERS_PER_PAGE = 50
+
 # 管理员首页
 @admin_bp.route('/dashboard', methods=['GET'])
+@role_required('admin')
 def admin_dashboard():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
+    user = current_user()
     
-    # 获取统计数据
-    pending_applications = MemberApplication.query.filter_by(status='pending').count()
-    total_users = User.query.count()
-    total_movies = Movie.query.count()
-    total_events = MovieEvent.query.count()
+    # 获取统计数据（增量维护的计数器，短时缓存）
+    stats = site_stats.summary()
     
     return render_template('admin_dashboard.html', 
                          user=user,
-                         pending_applications=pending_applications,
-                         total_users=total_users,
-                         total_movies=total_movies,
-                         total_events=total_events)
+                         pending_applications=stats['pending_applications'],
+                         total_users=stats['total_users'],
+                         total_movies=stats['total_movies'],
+                         total_events=stats['total_events'])
+
+# 统计数据API（仅管理员）
+@admin_bp.route('/api/stats', methods=['GET'])
+@role_required('admin')
+def api_stats():
+    days = min(request.args.get('days', 30, type=int), 365)
+    return jsonify(site_stats.summary(days=days))
 
 # 获取所有用户（仅管理员）
 @admin_bp.route('/users', methods=['GET'])
+@role_required('admin')
 def get_users():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
-    users = User.query.all()
-    return jsonify({'users': [{'id': u.id, 'username': u.username, 'role': u.role, 'nickname': u.nickname} for u in users]})
+    # 用户数不设上限，按 id 分批查询、流式输出
+    return stream_array('users', USER_ADMIN, USER_ADMIN.select(), User.id)
 
 # 设置用户角色（仅管理员）
 @admin_bp.route('/set_role', methods=['POST'])
+@role_required('admin')
 def set_role():
-    user_id = session.get('user_id')
-    admin = User.query.get(user_id)
-    if not admin or admin.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
     data = request.json
     uid = data.get('user_id')
     role = data.get('role')
@@ -50,27 +59,23 @@ def set_role():
         return jsonify({'msg': '用户不存在'}), 404
     user.role = role
     db.session.commit()
+    # 会话中缓存了角色，需重新登录才生效
+    revoke_sessions(user.id)
     return jsonify({'msg': '角色已更新'})
 
 # 入会申请列表
 @admin_bp.route('/applications', methods=['GET'])
+@role_required('admin')
 def get_applications():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
+    user = current_user()
     
     applications = MemberApplication.query.order_by(MemberApplication.created_at.desc()).all()
     return render_template('admin_applications.html', applications=applications, user=user)
 
 # 审核入会申请
 @admin_bp.route('/approve_application', methods=['POST'])
+@role_required('admin')
 def approve_application():
-    user_id = session.get('user_id')
-    admin = User.query.get(user_id)
-    if not admin or admin.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
-    
     data = request.json
     app_id = data.get('application_id')
     action = data.get('action')  # 'approve' or 'reject'
@@ -79,80 +84,94 @@ def approve_application():
     if not application:
         return jsonify({'msg': '申请不存在'}), 404
     
+    job = None
     if action == 'approve':
         application.status = 'approved'
-        # 创建用户账号
-        new_user = User(
-            username=application.username,
-            password='123456',  # 默认密码
-            role='member',
-            nickname=application.realname,
-            join_date=datetime.utcnow()
-        )
-        db.session.add(new_user)
+        # 创建用户账号（密码哈希较慢，交给后台任务）
+        job = enqueue('create_member_account', user_id=g.user_id, application_id=application.id)
     else:
         application.status = 'rejected'
     
     db.session.commit()
-    return jsonify({'msg': f'申请已{action}'})
+    invalidate('admin_stats')
+    return jsonify({'msg': f'申请已{action}', 'job_id': job.id if job else None})
 
 # 电影管理
 @admin_bp.route('/movies', methods=['GET'])
+@role_required('admin')
 def manage_movies():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
+    user = current_user()
     
-    movies = Movie.query.order_by(Movie.created_at.desc()).all()
-    return render_template('admin_movies.html', movies=movies, user=user)
+    # 只查询列表展示的列与简介摘要，按添加时间倒序分页
+    movies, next_cursor = catalog.admin_movie_page(request.args.get('cursor'))
+    return render_template('admin_movies.html', movies=movies, user=user, next_cursor=next_cursor)
 
 # 添加电影
 @admin_bp.route('/add_movie', methods=['POST'])
+@role_required('admin')
 def add_movie():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
-    data = request.form
-    movie = Movie(
-        title=data.get('title'),
-        original_title=data.get('original_title'),
-        director=data.get('director'),
-        actors=data.get('actors'),
-        genre=data.get('genre'),
-        release_year=data.get('release_year'),
-        country=data.get('country'),
-        duration=data.get('duration'),
-        rating=data.get('rating', 0.0),
-        poster_url=data.get('poster_url'),
-        description=data.get('description'),
-        trailer_url=data.get('trailer_url')
-    )
+    try:
+        movie = Movie(**catalog.coerce_movie(request.form))
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
     db.session.add(movie)
     db.session.commit()
+    invalidate('movies', 'admin_stats')
     return jsonify({'msg': '电影添加成功', 'id': movie.id})
 
+# 批量导入电影（CSV/JSONL 上传后交给后台任务，进度见 /tasks/<job_id>）
+@admin_bp.route('/import_movies', methods=['POST'])
+@role_required('admin')
+def import_movies():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'msg': '请选择文件'}), 400
+    fmt = request.form.get('format') or catalog.detect_format(upload.filename, None)
+    if fmt not in catalog.FORMATS:
+        return jsonify({'msg': '仅支持 CSV 或 JSONL 文件'}), 400
+    os.makedirs(catalog.import_dir(), exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=catalog.import_dir(), suffix='.' + fmt)
+    with os.fdopen(fd, 'wb') as out:
+        shutil.copyfileobj(upload.stream, out)
+    job = enqueue('import_movies', user_id=g.user_id, path=path, fmt=fmt)
+    db.session.commit()
+    return jsonify({'msg': '已开始导入', 'job_id': job.id}), 202
+
+# 导出电影目录（流式输出，不一次读入整张表）
+@admin_bp.route('/export_movies', methods=['GET'])
+@role_required('admin')
+def export_movies():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in catalog.FORMATS:
+        return jsonify({'msg': '仅支持 csv 或 jsonl'}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(catalog.export_movies(fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=movies.{fmt}'})
+
 # 活动管理
 @admin_bp.route('/events', methods=['GET'])
+@role_required('admin')
 def manage_events():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
+    user = current_user()
     
-    events = MovieEvent.query.order_by(MovieEvent.event_date.desc()).all()
-    movies = Movie.query.all()
-    return render_template('admin_events.html', events=events, movies=movies, user=user)
+    # 活动表单的电影选择器改用 /admin/api/movie_options 按输入查询，不再加载整个片库
+    events = db.session.query(
+        MovieEvent.id, MovieEvent.title, MovieEvent.event_type, MovieEvent.event_date, MovieEvent.location,
+        MovieEvent.current_participants, MovieEvent.max_participants, MovieEvent.status,
+        catalog.excerpt(MovieEvent.description)).order_by(MovieEvent.event_date.desc()).all()
+    return render_template('admin_events.html', events=events, user=user)
+
+# 活动表单的电影选择器（输入联想）
+@admin_bp.route('/api/movie_options', methods=['GET'])
+@role_required('admin')
+def movie_options():
+    limit = max(1, min(request.args.get('limit', catalog.OPTION_LIMIT, type=int), 50))
+    return jsonify({'movies': catalog.movie_options(request.args.get('q', ''), limit)})
 
 # 添加活动
 @admin_bp.route('/add_event', methods=['POST'])
+@role_required('admin')
 def add_event():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
-    
     data = request.json
     event = MovieEvent(
         title=data.get('title'),
@@ -165,27 +184,34 @@ def add_event():
     )
     db.session.add(event)
     db.session.commit()
+    invalidate('events', 'admin_stats')
     return jsonify({'msg': '活动添加成功', 'id': event.id})
 
 # 会员管理页面
 @admin_bp.route('/members', methods=['GET'])
+@role_required('admin')
 def manage_members():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
+    user = current_user()
     
-    # 获取所有会员，按加入时间排序
-    members = User.query.filter(User.role.in_(['member', 'admin'])).order_by(User.join_date.desc()).all()
+    # 按加入时间倒序分页展示会员
+    members, next_cursor = keyset_page(User.query.filter(User.role.in_(['member', 'admin'])),
+                                       User.join_date, User.id, request.args.get('cursor'), MEMBERS_PER_PAGE)
     
-    # 计算统计数据
-    total_members = len(members)
-    admin_count = len([m for m in members if m.role == 'admin'])
-    member_count = len([m for m in members if m.role == 'member'])
+    # 统计数据直接取计数器
+    users_by_role = site_stats.summary()['users_by_role']
+    admin_count = users_by_role.get('admin', 0)
+    member_count = users_by_role.get('member', 0)
     
     return render_template('admin_members.html', 
                          members=members, 
                          user=user,
-                         total_members=total_members,
+                         total_members=admin_count + member_count,
                          admin_count=admin_count,
-                         member_count=member_count) 
\ No newline at end of file
+                         member_count=member_count,
+                         next_cursor=next_cursor) 
+
+# 缓存命中率统计（仅管理员）
+@admin_bp.route('/cache_stats', methods=['GET'])
+@role_required('admin')
+def get_cache_stats():
+    return jsonify({'backend': backend_name(), 'stats': cache_stats.snapshot()})
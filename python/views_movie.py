@@ -1,92 +1,103 @@
-from flask import Blueprint, render_template, request, redirect, session, flash, jsonify
-from models import db, Movie, MovieReview, MovieEvent, EventRegistration, User
+from flask import Blueprint, render_template, request, redirect, session, flash, jsonify, g
+from models import db, Movie, MovieReview, MovieEvent, EventRegistration, User, Friendship
+from sqlalchemy.orm import joinedload, undefer
+from search import search_movies
+from ratings import STARS, record_review, rating_histogram
+from recommend import recommend_for
+from tasks import enqueue
+from auth import current_user, login_required, role_required
+import registration
+from bulk import MAX_OPS
+import catalog
+import rankings
+from cache import cached_view, invalidate
 from datetime import datetime
 
 movie_bp = Blueprint('movie', __name__)
 
+# 电影详情页展示的最新评论数
+REVIEWS_PER_PAGE = 50
+# 列表/搜索 JSON 中每部电影返回的字段（asgi.py 的异步接口与此保持一致）
+MOVIE_SUMMARY_FIELDS = ('id', 'title', 'director', 'genre', 'release_year', 'rating', 'poster_url')
+
+
+def _viewer_role():
+    """页面缓存按访问者身份区分：未登录 / 会员 / 管理员看到的按钮不同"""
+    return g.role if g.user_id else 'anonymous'
+
 # 电影列表与添加
 @movie_bp.route('/movies', methods=['GET', 'POST'])
+@cached_view(['movies'], vary=_viewer_role)
 def movie_list():
     if request.method == 'POST':
-        user_id = session.get('user_id')
-        user = User.query.get(user_id)
-        if not user or user.role != 'admin':
+        if g.role != 'admin':
             flash('无权限')
             return redirect('/movie/movies')
-        title = request.form.get('title')
-        director = request.form.get('director')
-        genre = request.form.get('genre')
-        release_year = request.form.get('release_year')
-        if title:
-            movie = Movie(title=title, director=director, genre=genre, release_year=release_year)
+        if request.form.get('title'):
+            fields = {f: request.form.get(f) for f in ('title', 'director', 'genre', 'release_year')}
+            try:
+                movie = Movie(**catalog.coerce_movie(fields))
+            except ValueError as e:
+                flash(f'添加失败：{e}')
+                return redirect('/movie/movies')
             db.session.add(movie)
             db.session.commit()
+            invalidate('movies', 'admin_stats')
             flash('添加电影成功！')
         return redirect('/movie/movies')
     page = request.args.get('page', 1, type=int)
+    # 列表只加载摘要字段，不读取简介等长文本
+    query = Movie.query.options(catalog.only(Movie, MOVIE_SUMMARY_FIELDS)).order_by(Movie.id)
+    if not request.accept_mimetypes.accept_html:
+        per_page = min(request.args.get('per_page', 12, type=int), 100)
+        movies = query.paginate(page=page, per_page=per_page, error_out=False)
+        return jsonify({'movies': [{f: getattr(m, f) for f in MOVIE_SUMMARY_FIELDS} for m in movies.items],
+                        'total': movies.total, 'page': page, 'per_page': per_page})
     per_page = 12
-    movies = Movie.query.paginate(page=page, per_page=per_page, error_out=False)
-    user = None
-    if session.get('user_id'):
-        user = User.query.get(session.get('user_id'))
+    movies = query.paginate(page=page, per_page=per_page, error_out=False)
+    user = current_user()
     return render_template('movies.html', movies=movies, user=user)
 
 # 管理员仪表板API：添加电影
 @movie_bp.route('/api/add_movie', methods=['POST'])
+@role_required('admin')
 def api_add_movie():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
-    data = request.json or request.form
-    movie = Movie(
-        title=data.get('title'),
-        original_title=data.get('original_title'),
-        director=data.get('director'),
-        actors=data.get('actors'),
-        genre=data.get('genre'),
-        release_year=data.get('release_year'),
-        country=data.get('country'),
-        duration=data.get('duration'),
-        rating=data.get('rating', 0.0),
-        poster_url=data.get('poster_url'),
-        description=data.get('description'),
-        trailer_url=data.get('trailer_url')
-    )
+    try:
+        movie = Movie(**catalog.coerce_movie(request.json or request.form))
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
     db.session.add(movie)
     db.session.commit()
+    invalidate('movies', 'admin_stats')
     return jsonify({'msg': '电影添加成功', 'id': movie.id})
 
 # 删除电影（仅管理员）
 @movie_bp.route('/delete_movie/<int:movie_id>', methods=['POST'])
+@role_required('admin', redirect_to='/movie/movies')
 def delete_movie(movie_id):
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        flash('无权限')
-        return redirect('/movie/movies')
     movie = Movie.query.get(movie_id)
     if movie:
         db.session.delete(movie)
         db.session.commit()
+        invalidate('movies', f'movie:{movie_id}', 'admin_stats')
         flash('删除电影成功！')
     return redirect('/movie/movies')
 
 # 电影详情与评论
 @movie_bp.route('/movie/<int:movie_id>', methods=['GET', 'POST'])
+@cached_view(lambda movie_id: [f'movie:{movie_id}'], vary=lambda: bool(session.get('user_id')))
 def movie_detail(movie_id):
-    movie = Movie.query.get_or_404(movie_id)
-    reviews = MovieReview.query.filter_by(movie_id=movie_id).order_by(MovieReview.created_at.desc()).all()
-    user = None
-    if session.get('user_id'):
-        user = User.query.get(session.get('user_id'))
+    movie = Movie.query.options(undefer(Movie.description)).filter_by(id=movie_id).first_or_404()
+    reviews = MovieReview.query.filter_by(movie_id=movie_id).order_by(MovieReview.created_at.desc()) \
+        .limit(REVIEWS_PER_PAGE).all()
+    user = current_user()
     if request.method == 'POST':
         if not user:
             flash('请先登录')
             return redirect('/login')
         rating = request.form.get('rating', type=int)
         review_text = request.form.get('review_text')
-        if not rating or not review_text:
+        if rating not in STARS or not review_text:
             flash('请填写完整的评论信息')
             return redirect(f'/movie/movie/{movie_id}')
         existing_review = MovieReview.query.filter_by(user_id=user.id, movie_id=movie_id).first()
@@ -95,22 +106,21 @@ def movie_detail(movie_id):
             return redirect(f'/movie/movie/{movie_id}')
         review = MovieReview(user_id=user.id, movie_id=movie_id, rating=rating, review_text=review_text)
         db.session.add(review)
-        all_reviews = MovieReview.query.filter_by(movie_id=movie_id).all()
-        if all_reviews:
-            avg_rating = sum(r.rating for r in all_reviews) / len(all_reviews)
-            movie.rating = round(avg_rating, 1)
+        record_review(movie, rating)
+        enqueue('refresh_movie_neighbors', user_id=user.id, movie_id=movie_id)
         db.session.commit()
+        invalidate('movies', f'movie:{movie_id}')
         flash('评论提交成功！')
         return redirect(f'/movie/movie/{movie_id}')
-    return render_template('movie_detail.html', movie=movie, reviews=reviews, user=user)
+    return render_template('movie_detail.html', movie=movie, reviews=reviews, user=user,
+                           histogram=rating_histogram(movie_id))
 
 # 活动列表与添加
 @movie_bp.route('/events', methods=['GET', 'POST'])
+@cached_view(['events'], vary=_viewer_role)
 def event_list():
     if request.method == 'POST':
-        user_id = session.get('user_id')
-        user = User.query.get(user_id)
-        if not user or user.role != 'admin':
+        if g.role != 'admin':
             flash('无权限')
             return redirect('/movie/events')
         title = request.form.get('title')
@@ -126,21 +136,18 @@ def event_list():
             event = MovieEvent(title=title, event_date=event_date, location=location)
             db.session.add(event)
             db.session.commit()
+            invalidate('events', 'admin_stats')
             flash('添加活动成功！')
         return redirect('/movie/events')
-    events = MovieEvent.query.filter_by(status='upcoming').order_by(MovieEvent.event_date).all()
-    user = None
-    if session.get('user_id'):
-        user = User.query.get(session.get('user_id'))
+    events = MovieEvent.query.options(undefer(MovieEvent.description)).filter_by(status='upcoming') \
+        .order_by(MovieEvent.event_date).all()
+    user = current_user()
     return render_template('events.html', events=events, user=user)
 
 # 管理员仪表板API：添加活动
 @movie_bp.route('/api/add_event', methods=['POST'])
+@role_required('admin')
 def api_add_event():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'msg': '无权限'}), 403
     data = request.json or request.form
     event = MovieEvent(
         title=data.get('title'),
@@ -153,64 +160,165 @@ def api_add_event():
     )
     db.session.add(event)
     db.session.commit()
+    invalidate('events', 'admin_stats')
     return jsonify({'msg': '活动添加成功', 'id': event.id})
 
 # 删除活动（仅管理员）
 @movie_bp.route('/delete_event/<int:event_id>', methods=['POST'])
+@role_required('admin', redirect_to='/movie/events')
 def delete_event(event_id):
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        flash('无权限')
-        return redirect('/movie/events')
     event = MovieEvent.query.get(event_id)
     if event:
         db.session.delete(event)
         db.session.commit()
+        invalidate('events', 'admin_stats')
         flash('删除活动成功！')
     return redirect('/movie/events')
 
 # 活动详情与报名
 @movie_bp.route('/event/<int:event_id>', methods=['GET', 'POST'])
 def event_detail(event_id):
-    event = MovieEvent.query.get_or_404(event_id)
+    event = MovieEvent.query.options(undefer(MovieEvent.description)).filter_by(id=event_id).first_or_404()
     movie = Movie.query.get(event.movie_id) if event.movie_id else None
-    registrations = EventRegistration.query.filter_by(event_id=event_id).all()
-    participants = [User.query.get(r.user_id) for r in registrations]
-    user = None
-    if session.get('user_id'):
-        user = User.query.get(session.get('user_id'))
+    registrations = EventRegistration.query.options(joinedload(EventRegistration.user)) \
+        .filter_by(event_id=event_id, status=registration.REGISTERED).all()
+    participants = [r.user for r in registrations if r.user]
+    user = current_user()
     if request.method == 'POST':
         if not user:
             flash('请先登录')
             return redirect('/login')
-        existing_registration = EventRegistration.query.filter_by(user_id=user.id, event_id=event_id).first()
-        if existing_registration:
+        result, reg = registration.register(user.id, event_id)
+        if result == 'already':
             flash('您已经报名参加这个活动了')
-            return redirect(f'/movie/event/{event_id}')
-        if event.current_participants >= event.max_participants:
-            flash('活动报名已满')
-            return redirect(f'/movie/event/{event_id}')
-        registration = EventRegistration(user_id=user.id, event_id=event_id)
-        db.session.add(registration)
-        event.current_participants += 1
-        db.session.commit()
-        flash('活动报名成功！')
+        elif result == 'closed':
+            flash('活动已停止报名')
+        elif result == registration.WAITLISTED:
+            flash(f'活动报名已满，您已进入候补名单（第 {registration.waitlist_position(reg)} 位）')
+        else:
+            flash('活动报名成功！')
         return redirect(f'/movie/event/{event_id}')
     return render_template('event_detail.html', event=event, movie=movie, participants=participants, user=user)
 
-# 电影搜索
+# 取消报名
+@movie_bp.route('/event/<int:event_id>/cancel', methods=['POST'])
+@login_required(redirect_to='/login')
+def cancel_registration(event_id):
+    user_id = g.user_id
+    registration.cancel(user_id, event_id)
+    flash('已取消报名')
+    return redirect(f'/movie/event/{event_id}')
+
+# 活动报名API：GET 查询状态，POST 报名，DELETE 取消
+@movie_bp.route('/api/event/<int:event_id>/registration', methods=['GET', 'POST', 'DELETE'])
+@login_required
+def api_event_registration(event_id):
+    user_id = g.user_id
+    event = MovieEvent.query.get(event_id)
+    if not event:
+        return jsonify({'msg': '活动不存在'}), 404
+    if request.method == 'POST':
+        result, reg = registration.register(user_id, event_id)
+        if result == 'closed':
+            return jsonify({'msg': '活动已停止报名', 'result': result}), 409
+    elif request.method == 'DELETE':
+        promoted = registration.cancel(user_id, event_id)
+        return jsonify({'msg': '已取消报名', 'promoted_registration_id': promoted,
+                        **registration.registration_summary(event)})
+    else:
+        reg = EventRegistration.query.filter_by(user_id=user_id, event_id=event_id).first()
+        result = reg.status if reg else None
+    status = reg.status if reg else None
+    return jsonify({
+        'result': result,
+        'status': status,
+        'waitlist_position': registration.waitlist_position(reg) if status == registration.WAITLISTED else None,
+        **registration.registration_summary(event)
+    })
+
+# 团体报名API：{"user_ids": [...]}，一个事务内报名并逐项返回结果；管理员可为任何人报名，其他用户只能为自己和好友报名
+@movie_bp.route('/api/event/<int:event_id>/registration/batch', methods=['POST'])
+@login_required
+def api_event_registration_batch(event_id):
+    user_id = g.user_id
+    event = MovieEvent.query.get(event_id)
+    if not event:
+        return jsonify({'msg': '活动不存在'}), 404
+    user_ids = (request.get_json(silent=True) or {}).get('user_ids')
+    if not isinstance(user_ids, list) or not user_ids or not all(type(u) is int for u in user_ids):
+        return jsonify({'msg': 'user_ids 应为非空整数数组'}), 400
+    if len(user_ids) > MAX_OPS:
+        return jsonify({'msg': f'单次最多 {MAX_OPS} 人'}), 400
+    known = set(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids))))
+    if g.role == 'admin':
+        allowed = known
+    else:
+        allowed = known & ({user_id} | set(db.session.scalars(db.select(Friendship.friend_id).where(
+            Friendship.user_id == user_id, Friendship.friend_id.in_(user_ids)))))
+    outcome = registration.register_many(event_id, [uid for uid in user_ids if uid in allowed])
+    results, seen = [], set()
+    for uid in user_ids:
+        if uid not in known:
+            result = 'not_found'
+        elif uid not in allowed:
+            result = 'forbidden'
+        else:
+            result = 'duplicate' if uid in seen else outcome[uid]
+            seen.add(uid)
+        results.append({'user_id': uid, 'result': result})
+    return jsonify({'results': results, **registration.registration_summary(event)})
+
+# 个性化推荐（读取离线计算的相似电影表）
+@movie_bp.route('/recommendations')
+def recommendations():
+    user = current_user()
+    if not user:
+        return jsonify({'msg': '请先登录'}), 401
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify({'movies': [
+        {'id': m.id, 'title': m.title, 'director': m.director, 'genre': m.genre,
+         'release_year': m.release_year, 'rating': m.rating, 'poster_url': m.poster_url,
+         'score': score, 'source': source}
+        for m, score, source in recommend_for(user, limit)
+    ]})
+
+# 排行榜（JSON，读取 rankings 物化的榜单，按名次取前 limit 名）
+def _board_response(board, limit):
+    limit = max(1, min(limit, rankings.BOARD_SIZE))
+    return jsonify({'board': board, 'movies': rankings.read_board(board, limit, MOVIE_SUMMARY_FIELDS)})
+
+
+@movie_bp.route('/trending')
+@cached_view(['rankings', 'movies'])
+def trending():
+    return _board_response(rankings.board_name('trending'), request.args.get('limit', 20, type=int))
+
+
+@movie_bp.route('/top')
+@cached_view(['rankings', 'movies'])
+def top():
+    window = request.args.get('window', 'month')
+    by = request.args.get('by', 'rating')
+    if window not in rankings.WINDOWS or by not in ('rating', 'reviews'):
+        return jsonify({'msg': f'window 取值 {"/".join(rankings.WINDOWS)}，by 取值 rating/reviews'}), 400
+    kind = 'top' if by == 'rating' else 'most_reviewed'
+    return _board_response(rankings.board_name(kind, window), request.args.get('limit', 20, type=int))
+
+# 电影搜索（全文索引，分页返回）
 @movie_bp.route('/search')
 def search():
     query = request.args.get('q', '')
     genre = request.args.get('genre', '')
-    year = request.args.get('year', '')
-    movies = Movie.query
-    if query:
-        movies = movies.filter(Movie.title.contains(query) | Movie.director.contains(query))
-    if genre:
-        movies = movies.filter(Movie.genre == genre)
-    if year:
-        movies = movies.filter(Movie.release_year == int(year))
-    movies = movies.order_by(Movie.rating.desc()).all()
-    return render_template('search_results.html', movies=movies, query=query, genre=genre, year=year) 
\ No newline at end of file
+    year = request.args.get('year', '', type=str)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    year = int(year) if year.isdigit() else None
+    pagination = search_movies(query, genre=genre, year=year, page=page, per_page=per_page,
+                               fields=MOVIE_SUMMARY_FIELDS)
+    if request.accept_mimetypes.accept_html:
+        return render_template('search_results.html', movies=pagination.items, pagination=pagination,
+                               query=query, genre=genre, year=year)
+    return jsonify({
+        'movies': [{f: getattr(m, f) for f in MOVIE_SUMMARY_FIELDS} for m in pagination.items],
+        'total': pagination.total, 'page': page, 'per_page': per_page
+    })
\ No newline at end of file
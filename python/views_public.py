@@ -1,8 +1,15 @@
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, jsonify, request, render_template, session
 from models import db, News
+from cache import cached_view, invalidate_on_commit
+from pagination import parse_limit
+from serialization import NEWS
+import favorites
 
 public_bp = Blueprint('public', __name__)
 
+# 新闻没有统一的写入口，任何增删改提交后都让新闻缓存失效
+invalidate_on_commit(News, ['news'])
+
 # 协会简介
 @public_bp.route('/about', methods=['GET'])
 def about():
@@ -18,6 +25,7 @@ def activities():
 
 # 资讯/新闻分页（API）
 @public_bp.route('/news', methods=['GET'])
+@cached_view(['news'], vary=lambda: bool(session.get('user_id')))
 def news():
     if request.accept_mimetypes.accept_html:
         # 浏览器访问时渲染页面
@@ -32,8 +40,8 @@ def news():
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 10))
     try:
-        pagination = News.query.order_by(News.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        news_list = [{'id': n.id, 'title': n.title, 'content': n.content, 'created_at': n.created_at} for n in pagination.items]
+        pagination = NEWS.query().order_by(News.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        news_list = NEWS.dump_all(pagination.items)
     except Exception as e:
         print(f"API查询新闻时出错: {e}")
         news_list = []
@@ -42,12 +50,23 @@ def news():
 
 # 新闻详情
 @public_bp.route('/news/<int:news_id>', methods=['GET'])
+@cached_view(['news'])
 def news_detail(news_id):
     try:
-        n = News.query.get(news_id)
+        n = NEWS.query().filter(News.id == news_id).first()
         if not n:
             return jsonify({'msg': '未找到新闻'}), 404
-        return jsonify({'id': n.id, 'title': n.title, 'content': n.content, 'created_at': n.created_at})
+        return jsonify(NEWS.dump(n))
     except Exception as e:
         print(f"查询新闻详情时出错: {e}")
-        return jsonify({'msg': '查询失败'}), 500 
\ No newline at end of file
+        return jsonify({'msg': '查询失败'}), 500 
+
+# 最多收藏排行（?type=movie|news|log），读取收藏计数表，缓存 60 秒
+@public_bp.route('/most_collected', methods=['GET'])
+@cached_view(['movies', 'news'], timeout=60)
+def most_collected():
+    item_type = request.args.get('type', 'movie')
+    if item_type not in favorites.ITEM_MODELS:
+        return jsonify({'msg': '不支持的类型'}), 400
+    limit = parse_limit(request.args.get('limit'))
+    return jsonify({'type': item_type, 'items': favorites.most_collected(item_type, limit)})
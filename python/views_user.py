@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify, session, redirect, flash
-from models import db, User, Friendship, Log, Photo, News, Collection
+from flask import Blueprint, request, jsonify, g, redirect, flash
+from models import db, User, Friendship, Log, Photo, News
+from sqlalchemy.orm import joinedload
+from pagination import keyset_page, parse_limit
 from werkzeug.security import generate_password_hash, check_password_hash
-import uuid
 import os
+import media
+import social
+import feed
+import favorites
+from bulk import parse_ops, split_ops, op_results
+from tasks import enqueue
+from auth import current_user, login_required, login_user, logout_user
+from cache import cached_view
+from serialization import LOG, PUBLIC_LOG, USER_PROFILE, USER_SUMMARY
 
 user_bp = Blueprint('user', __name__)
 
@@ -61,8 +71,7 @@ def login():
             flash('用户名或密码错误')
             return redirect('/login')
     
-    session['user_id'] = user.id
-    session['username'] = user.username
+    login_user(user)
     
     if not request.is_json:
         flash(f'欢迎回来，{user.nickname or user.username}！')
@@ -75,11 +84,9 @@ def login():
 
 # 个人资料
 @user_bp.route('/profile', methods=['GET', 'POST'])
+@login_required
 def profile():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
-    user = User.query.get(user_id)
+    user = current_user()
     if request.method == 'GET':
         return jsonify({'username': user.username, 'nickname': user.nickname, 'avatar': user.avatar, 'tags': user.tags})
     else:
@@ -91,13 +98,12 @@ def profile():
 
 # 好友管理
 @user_bp.route('/friends', methods=['GET', 'POST', 'DELETE'])
+@login_required
 def friends():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
+    user_id = g.user_id
     if request.method == 'GET':
-        fs = Friendship.query.filter_by(user_id=user_id).all()
-        friend_list = [User.query.get(f.friend_id).username for f in fs]
+        fs = Friendship.query.options(joinedload(Friendship.friend)).filter_by(user_id=user_id).all()
+        friend_list = [f.friend.username for f in fs if f.friend]
         return jsonify({'friends': friend_list})
     elif request.method == 'POST':
         data = request.json
@@ -105,9 +111,8 @@ def friends():
         friend = User.query.filter_by(username=friend_name).first()
         if not friend:
             return jsonify({'msg': '好友不存在'}), 404
-        if Friendship.query.filter_by(user_id=user_id, friend_id=friend.id).first():
+        if not social.add_friendship(user_id, friend.id):
             return jsonify({'msg': '已添加为好友'})
-        db.session.add(Friendship(user_id=user_id, friend_id=friend.id))
         db.session.commit()
         return jsonify({'msg': '添加好友成功'})
     elif request.method == 'DELETE':
@@ -116,35 +121,96 @@ def friends():
         friend = User.query.filter_by(username=friend_name).first()
         if not friend:
             return jsonify({'msg': '好友不存在'}), 404
-        fs = Friendship.query.filter_by(user_id=user_id, friend_id=friend.id).first()
-        if fs:
-            db.session.delete(fs)
+        if social.remove_friendship(user_id, friend.id):
             db.session.commit()
             return jsonify({'msg': '删除好友成功'})
         return jsonify({'msg': '未找到好友关系'})
 
+# 批量添加/删除好友：{"ops": [{"op": "add" | "remove", "friend_name": ...}, ...]}，一个事务内执行并逐项返回结果
+@user_bp.route('/friends/batch', methods=['POST'])
+@login_required
+def friends_batch():
+    user_id = g.user_id
+    try:
+        ops = parse_ops(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    names = {op.get('friend_name') for op in ops if isinstance(op.get('friend_name'), str)}
+    ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(names))) if names else {}
+
+    def key_of(op):
+        friend_id = ids.get(op.get('friend_name')) if isinstance(op.get('friend_name'), str) else None
+        if friend_id is None:
+            return None, 'not_found'
+        return (None, 'invalid') if friend_id == user_id else (friend_id, None)
+
+    entries, adds, removes = split_ops(ops, key_of)
+    created = social.add_friendships(user_id, adds)
+    removed = social.remove_friendships(user_id, removes)
+    db.session.commit()
+    return jsonify({'results': op_results(entries, created, removed)})
+
+# 好友推荐（好友的好友，按共同好友数排序）
+@user_bp.route('/suggestions', methods=['GET'])
+@login_required
+def suggestions():
+    user_id = g.user_id
+    ranked = social.suggestions_for(user_id, min(parse_limit(request.args.get('limit')), social.MAX_SUGGESTIONS))
+    users = {u.id: u for u in User.query.filter(User.id.in_([uid for uid, _ in ranked]))} if ranked else {}
+    return jsonify({'items': [
+        {'id': uid, 'username': users[uid].username, 'nickname': users[uid].nickname or users[uid].username,
+         'tags': users[uid].tags, 'mutual_friends': mutual}
+        for uid, mutual in ranked if uid in users
+    ]})
+
 # 日志发布
 @user_bp.route('/log', methods=['POST'])
+@login_required
 def post_log():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
+    user_id = g.user_id
     data = request.json
     content = data.get('content')
     visible = data.get('visible', True)
     log = Log(user_id=user_id, content=content, visible=visible)
     db.session.add(log)
+    feed.publish(log)
     db.session.commit()
     return jsonify({'msg': '日志发布成功'})
 
 # 日志列表
 @user_bp.route('/logs', methods=['GET'])
+@login_required
 def get_logs():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
-    logs = Log.query.filter_by(user_id=user_id).order_by(Log.created_at.desc()).all()
-    return jsonify({'logs': [{'content': l.content, 'visible': l.visible, 'created_at': l.created_at} for l in logs]})
+    user_id = g.user_id
+    logs, next_cursor = keyset_page(LOG.query().filter(Log.user_id == user_id), Log.created_at, Log.id,
+                                    request.args.get('cursor'), parse_limit(request.args.get('limit')))
+    return jsonify({'items': LOG.dump_all(logs), 'next_cursor': next_cursor})
+
+# 好友动态（关注对象的可见日志，按时间倒序游标分页）
+@user_bp.route('/feed', methods=['GET'])
+@login_required
+def get_feed():
+    user_id = g.user_id
+    logs, next_cursor = feed.read_feed(user_id, request.args.get('cursor'), parse_limit(request.args.get('limit')))
+    return jsonify({
+        'items': [{'id': l.id, 'content': l.content, 'created_at': l.created_at,
+                   'author': {'id': l.user_id, 'nickname': (l.user.nickname or l.user.username) if l.user else None}}
+                  for l in logs],
+        'next_cursor': next_cursor
+    })
+
+# 我的收藏（按收藏时间倒序游标分页，?type= 只看一类）；收藏变化或电影/新闻修改后缓存失效
+@user_bp.route('/collections', methods=['GET'])
+@login_required
+@cached_view(lambda: [favorites.namespace(g.user_id), 'movies', 'news'])
+def get_collections():
+    user_id = g.user_id
+    item_type = request.args.get('type') or None
+    if item_type and item_type not in favorites.ITEM_MODELS:
+        return jsonify({'msg': '不支持的收藏类型'}), 400
+    items, next_cursor = favorites.list_collections(user_id, item_type, request.args.get('cursor'),
+                                                    parse_limit(request.args.get('limit')))
+    return jsonify({'items': items, 'next_cursor': next_cursor})
 
 # 资料收藏（示例，实际可扩展）
 @user_bp.route('/collect', methods=['POST'])
@@ -154,87 +220,78 @@ def collect():
 
 # 上传会员照片
 @user_bp.route('/upload_photo', methods=['POST'])
+@login_required
 def upload_photo():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
+    user_id = g.user_id
     file = request.files.get('file')
     contest = request.form.get('contest', 'default')
     if not file:
         return jsonify({'msg': '未选择文件'}), 400
-    ext = os.path.splitext(file.filename)[-1]
-    rand_name = str(uuid.uuid4()) + ext
-    save_dir = os.path.join('static', 'uploads', contest)
-    os.makedirs(save_dir, exist_ok=True)
-    file.save(os.path.join(save_dir, rand_name))
-    photo = Photo(user_id=user_id, filename=rand_name, realname=file.filename, contest=contest)
+    if os.path.splitext(file.filename)[-1].lower() not in media.ALLOWED_EXTENSIONS:
+        return jsonify({'msg': '仅支持图片文件'}), 400
+    # 流式写入内容寻址存储，相同内容只保存一份
+    sha256, ext, size = media.store_upload(file)
+    stored_name = sha256 + ext
+    existing = Photo.query.filter_by(sha256=sha256).first()
+    photo = Photo(user_id=user_id, filename=stored_name, realname=file.filename, contest=contest,
+                  sha256=sha256, size=size)
+    if existing:
+        photo.width, photo.height, photo.has_thumbnail = existing.width, existing.height, existing.has_thumbnail
     db.session.add(photo)
+    job = None if photo.has_thumbnail else enqueue('process_photo', user_id=user_id, sha256=sha256, ext=ext)
     db.session.commit()
-    return jsonify({'msg': '上传成功', 'filename': rand_name})
+    return jsonify({'msg': '上传成功', 'filename': stored_name, 'id': photo.id, 'url': photo.url,
+                    'job_id': job.id if job else None})
 
 # 访问好友空间
 @user_bp.route('/friend_space/<int:friend_id>', methods=['GET'])
+@login_required
 def friend_space(friend_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
-    friend = User.query.get(friend_id)
+    friend = USER_PROFILE.query().filter(User.id == friend_id).first()
     if not friend:
         return jsonify({'msg': '好友不存在'}), 404
-    logs = Log.query.filter_by(user_id=friend_id, visible=True).order_by(Log.created_at.desc()).all()
+    logs, next_cursor = keyset_page(PUBLIC_LOG.query().filter(Log.user_id == friend_id, Log.visible == True),
+                                    Log.created_at, Log.id,
+                                    request.args.get('cursor'), parse_limit(request.args.get('limit')))
     return jsonify({
-        'friend': {
-            'id': friend.id,
-            'username': friend.username,
-            'nickname': friend.nickname,
-            'avatar': friend.avatar,
-            'tags': friend.tags
-        },
-        'logs': [{'content': l.content, 'created_at': l.created_at} for l in logs]
+        'friend': USER_PROFILE.dump(friend),
+        'items': PUBLIC_LOG.dump_all(logs),
+        'next_cursor': next_cursor
     })
 
 # 退出登录
 @user_bp.route('/logout', methods=['GET'])
 def logout():
-    session.pop('user_id', None)
-    session.pop('username', None)
+    logout_user()
     flash('已成功退出登录')
     return redirect('/')
 
 # 获取用户列表（用于好友搜索）
 @user_bp.route('/users', methods=['GET'])
+@login_required
 def get_users():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
-    
-    # 获取所有用户，排除自己
-    users = User.query.filter(User.id != user_id).all()
-    user_list = []
-    
-    for user in users:
-        # 检查是否已经是好友
-        is_friend = Friendship.query.filter_by(user_id=user_id, friend_id=user.id).first() is not None
-        
-        user_list.append({
-            'id': user.id,
-            'username': user.username,
-            'nickname': user.nickname or user.username,
-            'tags': user.tags,
-            'is_friend': is_friend
-        })
+    user_id = g.user_id
     
-    return jsonify({'users': user_list})
+    # 按加入时间倒序分页，排除自己，支持按用户名/昵称在服务端筛选；只查询列表字段与游标列
+    query = USER_SUMMARY.query(User.join_date).filter(User.id != user_id)
+    keyword = request.args.get('q', '').strip()
+    if keyword:
+        query = query.filter(User.username.contains(keyword) | User.nickname.contains(keyword))
+    users, next_cursor = keyset_page(query, User.join_date, User.id,
+                                     request.args.get('cursor'), parse_limit(request.args.get('limit')))
+    # 一次查出本页用户中的好友，避免逐个用户查询好友关系
+    friend_ids = {fid for (fid,) in db.session.query(Friendship.friend_id).filter(
+        Friendship.user_id == user_id, Friendship.friend_id.in_([u.id for u in users]))}
+    user_list = [dict(USER_SUMMARY.dump(u), is_friend=u.id in friend_ids) for u in users]
+
+    return jsonify({'items': user_list, 'next_cursor': next_cursor})
 
 # --- Form-based Endpoints (for Templates) ---
 
 @user_bp.route('/profile/update', methods=['POST'])
+@login_required(redirect_to='/login')
 def update_profile_form():
-    user_id = session.get('user_id')
-    if not user_id:
-        return redirect('/login')
-    
-    user = User.query.get(user_id)
+    user = current_user()
     user.nickname = request.form.get('nickname')
     user.tags = request.form.get('tags')
     db.session.commit()
@@ -242,10 +299,9 @@ def update_profile_form():
     return redirect('/dashboard')
 
 @user_bp.route('/friend/add', methods=['POST'])
+@login_required(redirect_to='/login')
 def add_friend_form():
-    user_id = session.get('user_id')
-    if not user_id:
-        return redirect('/login')
+    user_id = g.user_id
 
     friend_name = request.form.get('friend_name')
     friend = User.query.filter_by(username=friend_name).first()
@@ -258,28 +314,22 @@ def add_friend_form():
         flash('不能添加自己为好友')
         return redirect('/dashboard')
     
-    existing_friendship = Friendship.query.filter_by(user_id=user_id, friend_id=friend.id).first()
-    if existing_friendship:
+    if not social.add_friendship(user_id, friend.id):
         flash('已经是好友了')
         return redirect('/dashboard')
     
-    friendship = Friendship(user_id=user_id, friend_id=friend.id)
-    db.session.add(friendship)
     db.session.commit()
     flash(f'已添加 {friend.nickname or friend.username} 为好友')
     return redirect('/dashboard')
 
 @user_bp.route('/friend/remove', methods=['POST'])
+@login_required(redirect_to='/login')
 def remove_friend_form():
-    user_id = session.get('user_id')
-    if not user_id:
-        return redirect('/login')
+    user_id = g.user_id
 
-    friend_id = request.form.get('friend_id')
-    friendship = Friendship.query.filter_by(user_id=user_id, friend_id=friend_id).first()
+    friend_id = request.form.get('friend_id', type=int)
     
-    if friendship:
-        db.session.delete(friendship)
+    if friend_id and social.remove_friendship(user_id, friend_id):
         db.session.commit()
         flash('已删除好友')
     else:
@@ -288,36 +338,60 @@ def remove_friend_form():
     return redirect('/dashboard')
 
 @user_bp.route('/log/post_form', methods=['POST'])
+@login_required(redirect_to='/login')
 def post_log_form():
-    user_id = session.get('user_id')
-    if not user_id:
-        return redirect('/login')
+    user_id = g.user_id
 
     content = request.form.get('content')
     if not content:
         flash('日志内容不能为空')
         return redirect('/dashboard')
     
-        log = Log(user_id=user_id, content=content, visible=True)
-        db.session.add(log)
-        db.session.commit()
+    log = Log(user_id=user_id, content=content, visible=True)
+    db.session.add(log)
+    feed.publish(log)
+    db.session.commit()
     flash('日志发布成功')
     return redirect('/dashboard')
 
 @user_bp.route('/collect/<item_type>/<int:item_id>', methods=['POST'])
+@login_required
 def collect_item(item_type, item_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'msg': '未登录'}), 401
-    
-    # 检查是否已收藏
-    existing = Collection.query.filter_by(user_id=user_id, item_type=item_type, item_id=item_id).first()
-    if existing:
+    user_id = g.user_id
+    if item_type not in favorites.ITEM_MODELS:
+        return jsonify({'msg': '不支持的收藏类型'}), 400
+    if not favorites.existing_items(user_id, [(item_type, item_id)]):
+        return jsonify({'msg': '收藏对象不存在'}), 404
+    # 唯一索引去重，已收藏时不插入
+    if not favorites.collect(user_id, [(item_type, item_id)]):
         return jsonify({'msg': '已收藏'})
-    
-        collection = Collection(user_id=user_id, item_type=item_type, item_id=item_id)
-        db.session.add(collection)
-        db.session.commit()
+    db.session.commit()
     return jsonify({'msg': '收藏成功'})
 
+# 批量收藏/取消收藏：{"ops": [{"op": "add" | "remove", "item_type": ..., "item_id": ...}, ...]}
+@user_bp.route('/collect/batch', methods=['POST'])
+@login_required
+def collect_batch():
+    user_id = g.user_id
+    try:
+        ops = parse_ops(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    items = {(op.get('item_type'), op.get('item_id')) for op in ops
+             if op.get('item_type') in favorites.ITEM_MODELS and type(op.get('item_id')) is int}
+    found = favorites.existing_items(user_id, items)
+
+    def key_of(op):
+        key = (op.get('item_type'), op.get('item_id'))
+        if key not in items:
+            return None, 'invalid'
+        # 取消收藏不要求对象仍然存在
+        return (key, None) if key in found or op.get('op') == 'remove' else (None, 'not_found')
+
+    entries, adds, removes = split_ops(ops, key_of)
+    created = favorites.collect(user_id, adds)
+    removed = favorites.uncollect(user_id, removes)
+    db.session.commit()
+    return jsonify({'results': op_results(entries, created, removed)})
+
 # ... existing code ... 
\ No newline at end of file